@@ -61,6 +61,23 @@ lossless = {converter_lossless_str}
 [deduplicator]
 # 查重文件夹/文件名解析正则
 comic_dir_regex = '''{deduplicator.comic_dir_regex}'''
+# 封面查重时预先解码与预处理的封面数量 (推理期间后台继续读取后续封面)
+# 内置模型每次只推理一张封面；换用动态批大小的模型时，该值同时是单次推理的上限
+cover_batch_size = {deduplicator.cover_batch_size}
+# 是否缓存封面特征 (未变化的文件无需重新提取封面)
+enable_cover_cache = {dedupe_enable_cover_cache_str}
+# 封面数量达到该值时使用近似比对 (随机投影分桶)，设置为 0 则始终精确比对
+cover_approx_threshold = {deduplicator.cover_approx_threshold}
+# 封面哈希与内页抽样模式的最大汉明距离 (0 - 32，越大越宽松)
+phash_max_distance = {deduplicator.phash_max_distance}
+# 模糊文件名模式的相似度阈值 (1 - 100，越小越宽松)
+fuzzy_name_threshold = {deduplicator.fuzzy_name_threshold}
+# 封面查重前是否先比对 zip/cbz 中央目录 (完全相同的归档直接归组，只分析其中一个)
+enable_zip_prefilter = {dedupe_enable_zip_prefilter_str}
+# 书库目录 (与书库比对时增量更新指纹索引，新增内容只与索引比对)
+library_dir = '''{deduplicator.library_dir}'''
+# 本机书库名称 (导出指纹时使用，导入时据此跳过本机条目；新建书库索引时记录，留空则使用计算机名)
+library_name = '''{deduplicator.library_name}'''
 
 [extensions]
 # 需要转换的格式
@@ -82,11 +99,38 @@ system_junk = {ext_junk}
 enable_ad_scan = {scanner_enable_ad_str}
 # 是否开启压缩包扫描
 enable_archive_scan = {scanner_enable_archive_str}
+# 是否启用扫描索引 (增量扫描，跳过未变化的文件夹)
+enable_scan_index = {scanner_enable_index_str}
+# 是否缓存二维码检测结果 (相同内容的图片不再重复检测)
+enable_qr_cache = {scanner_enable_qr_cache_str}
+# 是否在二维码检测前进行轮廓预筛 (只有疑似二维码的图片才交给检测模型)
+enable_qr_prefilter = {scanner_enable_qr_prefilter_str}
+# 预筛审计模式 (被预筛拒绝的图片仍交给检测模型，统计预筛漏检数，会变慢)
+qr_prefilter_audit = {scanner_qr_prefilter_audit_str}
+# 是否记录已确认广告页的感知哈希 (相似图片直接判定为广告，无需识别二维码)
+enable_ad_blocklist = {scanner_enable_ad_blocklist_str}
+# 广告检测并发数 (多个文件夹同时检测)
+# 设置为 0 则自动使用 CPU 核心数的 75%
+ad_scan_workers = {scanner.ad_scan_workers}
+# 每个文件夹同时检测的末尾页数 (并行推测检测，1 则逐页检测)
+ad_tail_pages = {scanner.ad_tail_pages}
+# 压缩包清理并发数
+# 设置为 0 则自动 (最多 4 个，避免磁盘争用)
+archive_workers = {scanner.archive_workers}
+# 压缩包清理可占用的临时空间上限 (MB)
+# 设置为 0 则使用临时目录剩余空间的 90%
+archive_temp_budget_mb = {scanner.archive_temp_budget_mb}
 # 二维码白名单 (包含这些域名的二维码不视为广告)
 qr_whitelist = {scanner_qr}
 """
 
 
+def get_user_config_dir() -> Path:
+    """用户配置目录 (~/.config/koma 或 $XDG_CONFIG_HOME/koma)"""
+    xdg_home = os.environ.get("XDG_CONFIG_HOME")
+    return Path(xdg_home) / "koma" if xdg_home else Path.home() / ".config" / "koma"
+
+
 @dataclass
 class AppConfig:
     height: int = 800
@@ -139,12 +183,39 @@ class ConverterConfig:
 @dataclass
 class DeduplicatorConfig:
     comic_dir_regex: str = DEFAULT_COMIC_REGEX
+    cover_batch_size: int = 32
+    enable_cover_cache: bool = True
+    cover_approx_threshold: int = 200_000
+    phash_max_distance: int = 8
+    fuzzy_name_threshold: int = 70
+    enable_zip_prefilter: bool = True
+    library_dir: str = ""
+    library_name: str = ""
 
     def __post_init__(self):
         try:
             re.compile(self.comic_dir_regex)
         except re.error:
             self.comic_dir_regex = DEFAULT_COMIC_REGEX
+        if not isinstance(self.cover_batch_size, int) or self.cover_batch_size < 1:
+            self.cover_batch_size = 32
+        if (
+            not isinstance(self.cover_approx_threshold, int)
+            or self.cover_approx_threshold < 0
+        ):
+            self.cover_approx_threshold = 0
+        if not isinstance(self.phash_max_distance, int) or not (
+            0 <= self.phash_max_distance <= 32
+        ):
+            self.phash_max_distance = 8
+        if not isinstance(self.library_dir, str):
+            self.library_dir = ""
+        if not isinstance(self.library_name, str):
+            self.library_name = ""
+        if not isinstance(self.fuzzy_name_threshold, int) or not (
+            1 <= self.fuzzy_name_threshold <= 100
+        ):
+            self.fuzzy_name_threshold = 70
 
 
 @dataclass
@@ -207,6 +278,15 @@ class ExtensionsConfig:
 class ScannerConfig:
     enable_ad_scan: bool = False
     enable_archive_scan: bool = False
+    enable_scan_index: bool = True
+    enable_qr_cache: bool = True
+    enable_qr_prefilter: bool = True
+    qr_prefilter_audit: bool = False
+    enable_ad_blocklist: bool = True
+    ad_scan_workers: int = 0
+    ad_tail_pages: int = 3
+    archive_workers: int = 0
+    archive_temp_budget_mb: int = 0
     qr_whitelist: list[str] = field(
         default_factory=lambda: [
             "bilibili.com",
@@ -247,6 +327,34 @@ class ScannerConfig:
         ]
     )
 
+    def __post_init__(self):
+        if not isinstance(self.ad_scan_workers, int) or self.ad_scan_workers < 0:
+            self.ad_scan_workers = 0
+        if not isinstance(self.ad_tail_pages, int) or self.ad_tail_pages < 1:
+            self.ad_tail_pages = 1
+        if not isinstance(self.archive_workers, int) or self.archive_workers < 0:
+            self.archive_workers = 0
+        if (
+            not isinstance(self.archive_temp_budget_mb, int)
+            or self.archive_temp_budget_mb < 0
+        ):
+            self.archive_temp_budget_mb = 0
+
+    @property
+    def actual_ad_scan_workers(self) -> int:
+        """计算广告检测实际使用的线程数"""
+        if self.ad_scan_workers > 0:
+            return self.ad_scan_workers
+        count = os.cpu_count() or 4
+        return max(1, int(count * 0.75))
+
+    @property
+    def actual_archive_workers(self) -> int:
+        """计算压缩包清理实际使用的线程数"""
+        if self.archive_workers > 0:
+            return self.archive_workers
+        return max(1, min(4, os.cpu_count() or 1))
+
 
 @dataclass
 class GlobalConfig:
@@ -274,13 +382,8 @@ class ConfigManager:
         else:
             app_dir = Path(__file__).parent.parent
 
-        xdg_home = os.environ.get("XDG_CONFIG_HOME")
-        user_config_dir = (
-            Path(xdg_home) / "koma" if xdg_home else Path.home() / ".config" / "koma"
-        )
-
         candidates = [
-            user_config_dir / filename,
+            get_user_config_dir() / filename,
             app_dir / filename,
             Path.cwd() / filename,
         ]
@@ -328,10 +431,32 @@ class ConfigManager:
             converter=cfg.converter,
             converter_lossless_str="true" if cfg.converter.lossless else "false",
             deduplicator=cfg.deduplicator,
+            dedupe_enable_cover_cache_str="true"
+            if cfg.deduplicator.enable_cover_cache
+            else "false",
+            dedupe_enable_zip_prefilter_str="true"
+            if cfg.deduplicator.enable_zip_prefilter
+            else "false",
+            scanner=cfg.scanner,
             scanner_enable_ad_str="true" if cfg.scanner.enable_ad_scan else "false",
             scanner_enable_archive_str="true"
             if cfg.scanner.enable_archive_scan
             else "false",
+            scanner_enable_index_str="true"
+            if cfg.scanner.enable_scan_index
+            else "false",
+            scanner_enable_qr_cache_str="true"
+            if cfg.scanner.enable_qr_cache
+            else "false",
+            scanner_enable_qr_prefilter_str="true"
+            if cfg.scanner.enable_qr_prefilter
+            else "false",
+            scanner_qr_prefilter_audit_str="true"
+            if cfg.scanner.qr_prefilter_audit
+            else "false",
+            scanner_enable_ad_blocklist_str="true"
+            if cfg.scanner.enable_ad_blocklist
+            else "false",
             ext_convert=fmt_list(cfg.extensions.convert),
             ext_passthrough=fmt_list(cfg.extensions.passthrough),
             ext_archive=fmt_list(cfg.extensions.archive),
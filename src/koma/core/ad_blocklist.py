@@ -0,0 +1,140 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from koma.config import get_user_config_dir
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_FILENAME = "ad_blocklist.db"
+
+# 感知哈希的最大汉明距离 (64 位)
+MAX_DISTANCE = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ad_hashes (
+    hash TEXT PRIMARY KEY,
+    urls TEXT NOT NULL,
+    source TEXT NOT NULL,
+    added_at REAL NOT NULL
+);
+"""
+
+
+class AdBlocklist:
+    """
+    已确认广告页的感知哈希库
+
+    二维码检测确认广告后自动学习，之后相似的图片无需解码二维码即可判定，
+    二维码无法识别的重复广告页同样能被识别。
+    同时记录当时解码出的链接，白名单变化后已加入白名单的条目自动失效。
+    """
+
+    def __init__(self, db_path: Path | None = None, max_distance: int = MAX_DISTANCE):
+        """
+        初始化广告图库
+
+        Args:
+            db_path: 数据库路径，默认位于用户配置目录
+            max_distance: 判定相似的最大汉明距离
+        """
+        self.db_path = (
+            Path(db_path) if db_path else get_user_config_dir() / BLOCKLIST_FILENAME
+        )
+        self.max_distance = max_distance
+        self._conn: sqlite3.Connection | None = None
+        # 其他连接修改数据库后该值变化，据此重新加载内存中的哈希
+        self._data_version = 0
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._urls: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "AdBlocklist":
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._load()
+
+    def _load(self):
+        # 哈希常驻内存，查询只做一次向量化的异或 + 位计数
+        self._data_version = self._current_version()
+        rows = self._conn.execute("SELECT hash, urls FROM ad_hashes").fetchall()  # type: ignore
+        self._hashes = np.array([int(h, 16) for h, _ in rows], dtype=np.uint64)
+        self._urls = [json.loads(urls) for _, urls in rows]
+
+    def _current_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]  # type: ignore
+
+    def _sync(self):
+        """打开数据库，其他连接 (如设置界面清空图库) 修改过时重新加载"""
+        self._open()
+        if self._current_version() != self._data_version:
+            self._load()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def match(self, page_hash: int) -> list[list[str]]:
+        """返回距离不超过阈值的条目记录的链接，按距离由近到远"""
+        with self._lock:
+            self._sync()
+            if not len(self._hashes):
+                return []
+            distances = np.bitwise_count(self._hashes ^ np.uint64(page_hash))
+            hits = np.flatnonzero(distances <= self.max_distance)
+            order = hits[np.argsort(distances[hits], kind="stable")]
+            return [self._urls[i] for i in order]
+
+    def add(self, page_hash: int, urls: list[str], source: str = ""):
+        with self._lock:
+            self._open()
+            key = f"{page_hash:016x}"
+            cur = self._conn.execute(  # type: ignore
+                "INSERT OR IGNORE INTO ad_hashes (hash, urls, source, added_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(urls), source, time.time()),
+            )
+            self._conn.commit()  # type: ignore
+            if cur.rowcount:
+                self._hashes = np.append(self._hashes, np.uint64(page_hash))
+                self._urls.append(list(urls))
+
+    def count(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._hashes)
+
+    def clear(self):
+        """清空广告图库"""
+        with self._lock:
+            self._open()
+            self._conn.execute("DELETE FROM ad_hashes")  # type: ignore
+            self._conn.commit()  # type: ignore
+            self._hashes = np.empty(0, dtype=np.uint64)
+            self._urls = []
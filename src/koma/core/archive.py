@@ -2,11 +2,13 @@ import io
 import logging
 import os
 import shutil
+import struct
 import subprocess
 import sys
 import zipfile
+from collections.abc import Collection
 from pathlib import Path
-from typing import Literal
+from typing import BinaryIO, Literal, NamedTuple
 
 from natsort import natsorted
 from PIL import Image
@@ -17,6 +19,37 @@ logger = logging.getLogger(__name__)
 
 type CompressionLevel = Literal["normal", "store"]
 
+ZIP_SUFFIXES = (".zip", ".cbz")
+
+# zip 结构 (APPNOTE 4.3)
+_CD_STRUCT = struct.Struct("<4s4B4HL2L5H2L")
+_CD_SIGNATURE = b"PK\x01\x02"
+_CD_OFFSET_FIELD = 18
+_EOCD_STRUCT = struct.Struct("<4s4H2LH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_EOCD64_STRUCT = struct.Struct("<4sQ2H2L4Q")
+_EOCD64_SIGNATURE = b"PK\x06\x06"
+_EOCD64_LOCATOR_STRUCT = struct.Struct("<4sLQL")
+_EOCD64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EXTRA_ID = 0x0001
+_ZIP64_VERSION = 45
+_ZIP32_LIMIT = 0xFFFFFFFF
+_ZIP_COUNT_LIMIT = 0xFFFF
+_ZIP_UTF8_FLAG = 0x800
+# 读取中央目录时先读取的文件尾长度，通常一次即可覆盖结束记录与整个中央目录
+ZIP_TAIL_SIZE = 16 * 1024
+
+# 原样复制时的读写块大小
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveMember(NamedTuple):
+    name: str
+    size: int
+    is_dir: bool = False
+    # 目录中记录的 CRC32，未记录时为 None
+    crc: int | None = None
+
 
 class ArchiveHandler:
     def __init__(self, config: ExtensionsConfig):
@@ -68,7 +101,7 @@ class ArchiveHandler:
         try:
             if self.seven_zip:
                 success = self._extract_7z(archive_path, container_dir)
-            elif archive_path.suffix.lower() in [".zip", ".cbz"]:
+            elif archive_path.suffix.lower() in ZIP_SUFFIXES:
                 success = self._extract_zipfile(archive_path, container_dir)
             else:
                 logger.error(f"无法处理格式 {archive_path.suffix} (未找到 7-Zip)")
@@ -124,25 +157,31 @@ class ArchiveHandler:
         logger.info(f"使用 Python 原生打包: {output_path.name} (Level: {level})")
         return self._pack_zipfile(source_dir, output_path, compression_arg)
 
-    def extract_cover(self, archive_path: Path) -> Image.Image | None:
-        """从归档文件中提取封面"""
-        if archive_path.suffix.lower() in [".zip", ".cbz"]:
+    def list_members(self, archive_path: Path) -> list[ArchiveMember] | None:
+        """
+        读取归档成员列表 (不解压)
+
+        zip/cbz 仅读取中央目录，其他格式通过 `7z l -slt` 列出。
+        无法读取时返回 None。
+        """
+        if archive_path.suffix.lower() in ZIP_SUFFIXES:
+            try:
+                members = self._read_zip_directory(archive_path)
+                if members is not None:
+                    return members
+            except (OSError, struct.error, UnicodeDecodeError) as e:
+                logger.debug(f"读取中央目录失败 {archive_path.name}: {e}")
+
             try:
                 with zipfile.ZipFile(archive_path, "r") as zf:
-                    images = natsorted(
-                        [
-                            name
-                            for name in zf.namelist()
-                            if not name.endswith("/")
-                            and Path(name).suffix.lower()
-                            in self.config.all_supported_img
-                        ]
-                    )
-                    if images:
-                        with zf.open(images[0]) as f:
-                            return Image.open(f).copy()
+                    return [
+                        ArchiveMember(
+                            info.filename, info.file_size, info.is_dir(), info.CRC
+                        )
+                        for info in zf.infolist()
+                    ]
             except Exception as e:
-                logger.debug(f"原生 zipfile 提取封面失败 {archive_path.name}: {e}")
+                logger.debug(f"原生 zipfile 读取目录失败 {archive_path.name}: {e}")
 
         if not self.seven_zip:
             return None
@@ -160,37 +199,343 @@ class ArchiveHandler:
             if list_res.returncode != 0:
                 return None
 
-            paths = []
-            for line in list_res.stdout.splitlines():
-                if line.startswith("Path = "):
-                    paths.append(line.split(" = ", 1)[1])
-
-            images = natsorted(
-                [
-                    n
-                    for n in paths
-                    if Path(n).suffix.lower() in self.config.all_supported_img
-                ]
-            )
+            return self._parse_7z_listing(list_res.stdout)
 
-            if not images:
-                return None
+        except Exception as e:
+            logger.debug(f"7-Zip 读取目录失败 {archive_path.name}: {e}")
+            return None
 
-            target_file = images[0]
+    def read_member(self, archive_path: Path, member: str) -> bytes | None:
+        """读取单个归档成员到内存 (不落盘)"""
+        if archive_path.suffix.lower() in ZIP_SUFFIXES:
+            try:
+                with zipfile.ZipFile(archive_path, "r") as zf:
+                    return zf.read(member)
+            except Exception as e:
+                logger.debug(f"原生 zipfile 读取失败 {archive_path.name}: {e}")
+
+        if not self.seven_zip:
+            return None
 
-            ext_cmd = [self.seven_zip, "e", str(archive_path), target_file, "-so"]
+        try:
+            ext_cmd = [self.seven_zip, "e", str(archive_path), member, "-so"]
             ext_res = subprocess.run(
                 ext_cmd, capture_output=True, creationflags=self._get_creation_flags()
             )
 
             if ext_res.returncode == 0 and ext_res.stdout:
-                return Image.open(io.BytesIO(ext_res.stdout)).copy()
+                return ext_res.stdout
 
         except Exception as e:
-            logger.debug(f"7-Zip 提取封面失败 {archive_path.name}: {e}")
+            logger.debug(f"7-Zip 读取失败 {archive_path.name}: {e}")
 
         return None
 
+    def read_members(
+        self, archive_path: Path, members: Collection[str]
+    ) -> dict[str, bytes]:
+        """读取多个归档成员到内存 (不落盘)，读取失败的成员不出现在结果中"""
+        if archive_path.suffix.lower() in ZIP_SUFFIXES:
+            try:
+                with zipfile.ZipFile(archive_path, "r") as zf:
+                    names = set(zf.namelist())
+                    return {m: zf.read(m) for m in members if m in names}
+            except Exception as e:
+                logger.debug(f"原生 zipfile 读取失败 {archive_path.name}: {e}")
+
+        result = {}
+        for member in members:
+            data = self.read_member(archive_path, member)
+            if data is not None:
+                result[member] = data
+        return result
+
+    def strip_members(
+        self, archive_path: Path, output_path: Path, drop: Collection[str]
+    ) -> bool:
+        """
+        从 zip/cbz 中移除指定成员，写出新归档
+
+        其余成员的本地头和压缩数据按字节原样复制，中央目录记录同样原样保留，
+        仅修正本地头偏移，因此不会解压、重新压缩，也不需要临时目录，
+        文件名编码、时间戳及扩展字段均保持不变。
+
+        Args:
+            archive_path: 源归档 (仅支持 zip/cbz)
+            output_path: 输出路径，先写入同目录的临时文件再改名
+            drop: 需要移除的成员名 (与成员列表中的名称一致)，
+                任一成员不存在时视为失败，不写出归档
+        """
+        if archive_path.suffix.lower() not in ZIP_SUFFIXES:
+            logger.error(f"仅 zip/cbz 支持直接移除成员: {archive_path.name}")
+            return False
+
+        drop = set(drop)
+        temp_path = output_path.with_name(f".{output_path.name}.koma_tmp")
+        try:
+            with zipfile.ZipFile(archive_path, "r") as zf:
+                infos = zf.infolist()
+                start_dir = zf.start_dir
+                comment = zf.comment
+
+            missing = drop - {info.filename for info in infos}
+            if missing:
+                raise KeyError(f"成员不存在: {', '.join(sorted(missing))}")
+
+            # 每个成员的数据区 (本地头 + 压缩数据 + 数据描述符) 截止到下一个成员
+            offsets = sorted({info.header_offset for info in infos} | {start_dir})
+            span_end = {off: offsets[i + 1] for i, off in enumerate(offsets[:-1])}
+
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(archive_path, "rb") as src, open(temp_path, "wb") as dst:
+                new_offsets: dict[int, int] = {}
+                for info in sorted(infos, key=lambda i: i.header_offset):
+                    if info.filename in drop or info.header_offset in new_offsets:
+                        continue
+                    new_offsets[info.header_offset] = dst.tell()
+                    src.seek(info.header_offset)
+                    self._copy_bytes(
+                        src, dst, span_end[info.header_offset] - info.header_offset
+                    )
+
+                # 中央目录按原顺序逐条复制
+                cd_start = dst.tell()
+                count = 0
+                src.seek(start_dir)
+                for info in infos:
+                    record = self._read_cd_record(src)
+                    if info.filename in drop:
+                        continue
+                    dst.write(
+                        self._patch_cd_offset(record, new_offsets[info.header_offset])
+                    )
+                    count += 1
+
+                self._write_end_records(
+                    dst, cd_start, dst.tell() - cd_start, count, comment
+                )
+
+            # 仅校验目录结构，不解压数据
+            with zipfile.ZipFile(temp_path, "r") as zf:
+                if len(zf.infolist()) != count:
+                    raise zipfile.BadZipFile("成员数量不一致")
+
+            os.replace(temp_path, output_path)
+            return True
+
+        except Exception as e:
+            logger.error(f"移除归档成员失败 {archive_path.name}: {e}")
+            temp_path.unlink(missing_ok=True)
+            return False
+
+    def extract_cover(
+        self, archive_path: Path, size: tuple[int, int] | None = None
+    ) -> Image.Image | None:
+        """
+        从归档文件中提取封面
+
+        Args:
+            archive_path: 归档文件路径
+            size: 目标尺寸，JPEG 封面在解码时直接缩小到不小于该尺寸
+        """
+        members = self.list_members(archive_path)
+        if not members:
+            return None
+
+        images = natsorted(
+            [
+                m.name
+                for m in members
+                if not m.is_dir
+                and Path(m.name).suffix.lower() in self.config.all_supported_img
+            ]
+        )
+        if not images:
+            return None
+
+        data = self.read_member(archive_path, images[0])
+        if not data:
+            return None
+
+        try:
+            img = Image.open(io.BytesIO(data))
+            if size:
+                img.draft(img.mode, size)
+            return img.copy()
+        except Exception as e:
+            logger.debug(f"封面解码失败 {archive_path.name}: {e}")
+            return None
+
+    def _parse_7z_listing(self, output: str) -> list[ArchiveMember]:
+        """解析 `7z l -slt` 输出，跳过描述归档本身的头部记录"""
+        records: list[dict[str, str]] = []
+        for line in output.splitlines():
+            key, sep, value = line.partition(" = ")
+            if not sep:
+                continue
+            if key == "Path":
+                records.append({})
+            if records:
+                records[-1][key] = value
+
+        members = []
+        for rec in records:
+            if "Type" in rec:
+                continue
+            try:
+                size = int(rec.get("Size") or 0)
+            except ValueError:
+                size = 0
+            is_dir = rec.get("Folder") == "+" or rec.get("Attributes", "").startswith(
+                "D"
+            )
+            try:
+                crc = int(rec["CRC"], 16) if rec.get("CRC") else None
+            except ValueError:
+                crc = None
+            members.append(ArchiveMember(rec["Path"], size, is_dir, crc))
+        return members
+
+    @staticmethod
+    def _read_zip_directory(archive_path: Path) -> list[ArchiveMember] | None:
+        """
+        直接解析 zip 中央目录
+
+        从文件尾读取一块数据定位结束记录，中央目录通常也在这块数据内，
+        无需再次寻址。zip64 或结构异常时返回 None，由 zipfile 处理。
+        """
+        with open(archive_path, "rb") as f:
+            file_size = f.seek(0, os.SEEK_END)
+            tail_start = max(0, file_size - ZIP_TAIL_SIZE)
+            f.seek(tail_start)
+            tail = f.read()
+
+            eocd_pos = tail.rfind(_EOCD_SIGNATURE)
+            if eocd_pos < 0 or eocd_pos + _EOCD_STRUCT.size > len(tail):
+                # 注释过长，交给 zipfile 搜索
+                return None
+            _, _, _, _, count, cd_size, cd_offset, _ = _EOCD_STRUCT.unpack_from(
+                tail, eocd_pos
+            )
+            if count == _ZIP_COUNT_LIMIT or _ZIP32_LIMIT in (cd_size, cd_offset):
+                return None
+
+            # 以结束记录位置反推中央目录起点，兼容前置数据
+            cd_start = tail_start + eocd_pos - cd_size
+            if cd_start < 0:
+                return None
+            if cd_start >= tail_start:
+                directory = tail[cd_start - tail_start : eocd_pos]
+            else:
+                f.seek(cd_start)
+                directory = f.read(cd_size)
+
+        members = []
+        pos = 0
+        for _ in range(count):
+            if directory[pos : pos + 4] != _CD_SIGNATURE:
+                return None
+            fields = _CD_STRUCT.unpack_from(directory, pos)
+            flags, crc, size = fields[5], fields[9], fields[11]
+            name_len, extra_len, comment_len = fields[12:15]
+            if size == _ZIP32_LIMIT:
+                return None
+
+            start = pos + _CD_STRUCT.size
+            raw_name = directory[start : start + name_len]
+            name = raw_name.decode("utf-8" if flags & _ZIP_UTF8_FLAG else "cp437")
+            # 与 zipfile 一致地规范化 (截断 NUL、替换系统路径分隔符)，成员名可直接用于读取
+            name = zipfile.ZipInfo(name).filename
+            members.append(ArchiveMember(name, size, name.endswith("/"), crc))
+            pos = start + name_len + extra_len + comment_len
+        return members
+
+    @staticmethod
+    def _copy_bytes(src: BinaryIO, dst: BinaryIO, length: int):
+        while length > 0:
+            chunk = src.read(min(COPY_CHUNK_SIZE, length))
+            if not chunk:
+                raise zipfile.BadZipFile("成员数据被截断")
+            dst.write(chunk)
+            length -= len(chunk)
+
+    @staticmethod
+    def _read_cd_record(src: BinaryIO) -> bytes:
+        header = src.read(_CD_STRUCT.size)
+        if len(header) != _CD_STRUCT.size or header[:4] != _CD_SIGNATURE:
+            raise zipfile.BadZipFile("中央目录记录损坏")
+        fields = _CD_STRUCT.unpack(header)
+        return header + src.read(fields[12] + fields[13] + fields[14])
+
+    @staticmethod
+    def _patch_cd_offset(record: bytes, offset: int) -> bytes:
+        """修正中央目录记录中的本地头偏移 (含 zip64 扩展字段)"""
+        fields = list(_CD_STRUCT.unpack_from(record))
+        if fields[_CD_OFFSET_FIELD] != _ZIP32_LIMIT:
+            # 成员只会前移，新偏移不会超出 32 位
+            fields[_CD_OFFSET_FIELD] = offset
+            return _CD_STRUCT.pack(*fields) + record[_CD_STRUCT.size :]
+
+        name_len, extra_len = fields[12], fields[13]
+        extra_start = _CD_STRUCT.size + name_len
+        extra = bytearray(record[extra_start : extra_start + extra_len])
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, size = struct.unpack_from("<HH", extra, pos)
+            if tag == _ZIP64_EXTRA_ID:
+                # zip64 扩展字段依次包含：原始大小、压缩大小、本地头偏移
+                field_pos = pos + 4
+                if fields[11] == _ZIP32_LIMIT:
+                    field_pos += 8
+                if fields[10] == _ZIP32_LIMIT:
+                    field_pos += 8
+                struct.pack_into("<Q", extra, field_pos, offset)
+                return (
+                    record[:extra_start]
+                    + bytes(extra)
+                    + record[extra_start + extra_len :]
+                )
+            pos += 4 + size
+        raise zipfile.BadZipFile("缺少 zip64 扩展字段")
+
+    @staticmethod
+    def _write_end_records(
+        dst: BinaryIO, cd_start: int, cd_size: int, count: int, comment: bytes
+    ):
+        if (
+            count >= _ZIP_COUNT_LIMIT
+            or cd_start >= _ZIP32_LIMIT
+            or cd_size >= _ZIP32_LIMIT
+        ):
+            eocd64_pos = dst.tell()
+            dst.write(
+                _EOCD64_STRUCT.pack(
+                    _EOCD64_SIGNATURE,
+                    _EOCD64_STRUCT.size - 12,
+                    _ZIP64_VERSION,
+                    _ZIP64_VERSION,
+                    0,
+                    0,
+                    count,
+                    count,
+                    cd_size,
+                    cd_start,
+                )
+            )
+            dst.write(
+                _EOCD64_LOCATOR_STRUCT.pack(_EOCD64_LOCATOR_SIGNATURE, 0, eocd64_pos, 1)
+            )
+            count = min(count, _ZIP_COUNT_LIMIT)
+            cd_size = min(cd_size, _ZIP32_LIMIT)
+            cd_start = min(cd_start, _ZIP32_LIMIT)
+
+        dst.write(
+            _EOCD_STRUCT.pack(
+                _EOCD_SIGNATURE, 0, 0, count, count, cd_size, cd_start, len(comment)
+            )
+        )
+        dst.write(comment)
+
     def _extract_7z(self, archive_path: Path, output_dir: Path) -> bool:
         cmd = [self.seven_zip, "x", str(archive_path), f"-o{output_dir}", "-y", "-aoa"]
         return self._run_subprocess(cmd)
@@ -0,0 +1,463 @@
+import itertools
+import re
+
+import numpy as np
+
+# 分块矩阵乘法的块边长，每块相似度矩阵约 16 MB (float32)
+BLOCK_SIZE = 2048
+
+# 近似索引：随机超平面哈希表数量与期望的平均桶大小
+LSH_TABLES = 16
+LSH_BUCKET_SIZE = 64
+
+# 多索引哈希：64 位哈希切分的段数与每段位数
+HASH_CHUNKS = 4
+HASH_CHUNK_BITS = 16
+
+# 文本模糊匹配：MinHash 分段数与每段行数 (共 BANDS * ROWS 个哈希函数)
+MINHASH_BANDS = 10
+MINHASH_ROWS = 4
+# 单个桶内每个条目最多与其后多少个条目配对
+MAX_BUCKET_PAIRS = 64
+# 签名一致比例低于 阈值 * 该系数 的候选直接排除
+MINHASH_ESTIMATE_RATIO = 0.5
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+class DisjointSet:
+    """并查集 (按大小合并 + 路径减半)"""
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def groups(self) -> list[list[int]]:
+        """元素数大于 1 的分组，组内及组间均按最小下标排序"""
+        members: dict[int, list[int]] = {}
+        for i in range(len(self.parent)):
+            members.setdefault(self.find(i), []).append(i)
+        return [g for g in members.values() if len(g) > 1]
+
+
+def link_similar(
+    vectors: np.ndarray,
+    threshold: float,
+    dsu: DisjointSet | None = None,
+    index: np.ndarray | None = None,
+    block_size: int = BLOCK_SIZE,
+) -> DisjointSet:
+    """
+    精确比对：分块计算两两点积，不低于阈值的配对合并到同一组
+
+    Args:
+        vectors: 已归一化的特征矩阵 (N, D)
+        threshold: 余弦相似度阈值
+        dsu: 合并到已有的并查集
+        index: vectors 每一行在 dsu 中的下标，默认为行号
+        block_size: 分块边长
+    """
+    n = len(vectors)
+    if dsu is None:
+        dsu = DisjointSet(n)
+
+    for i in range(0, n, block_size):
+        block = vectors[i : i + block_size]
+        for j in range(i, n, block_size):
+            sims = block @ vectors[j : j + block_size].T
+            rows, cols = np.nonzero(sims >= threshold)
+            rows += i
+            cols += j
+            # 只取上三角，跳过自身
+            upper = rows < cols
+            rows, cols = rows[upper], cols[upper]
+            if index is not None:
+                rows, cols = index[rows], index[cols]
+            for a, b in zip(rows.tolist(), cols.tolist(), strict=True):
+                dsu.union(a, b)
+
+    return dsu
+
+
+def link_similar_approx(
+    vectors: np.ndarray,
+    threshold: float,
+    n_tables: int = LSH_TABLES,
+    seed: int = 0,
+) -> DisjointSet:
+    """
+    近似比对：随机超平面哈希分桶，只在同一个桶内精确比对
+
+    多张哈希表取并集，相似度越高的配对被至少一张表分到同一桶的概率越大。
+    适用于数十万以上的条目，可能遗漏接近阈值的配对。
+    """
+    n, dim = vectors.shape
+    dsu = DisjointSet(n)
+    n_bits = int(np.clip(np.log2(max(n, 1) / LSH_BUCKET_SIZE), 1, 32))
+    weights = np.left_shift(np.uint64(1), np.arange(n_bits, dtype=np.uint64))
+    rng = np.random.default_rng(seed)
+
+    for _ in range(n_tables):
+        planes = rng.standard_normal((dim, n_bits)).astype(vectors.dtype)
+        keys = ((vectors @ planes) > 0).astype(np.uint64) @ weights
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) > 1:
+                link_similar(vectors[bucket], threshold, dsu, bucket)
+
+    return dsu
+
+
+def _flip_masks(bits: int, radius: int) -> np.ndarray:
+    """bits 位内翻转不超过 radius 位的全部掩码"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for combo in itertools.combinations(range(bits), r):
+            masks.append(sum(1 << b for b in combo))
+    return np.array(masks, dtype=np.intp)
+
+
+def _hash_chunks(hashes: np.ndarray, k: int) -> np.ndarray:
+    """第 k 段 16 位取值"""
+    chunk_mask = np.uint64((1 << HASH_CHUNK_BITS) - 1)
+    return ((hashes >> np.uint64(k * HASH_CHUNK_BITS)) & chunk_mask).astype(np.intp)
+
+
+def _bucket_table(chunks: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """按段值分桶：排序后的下标、每个取值的起始位置与数量"""
+    order = np.argsort(chunks, kind="stable")
+    sizes = np.bincount(chunks, minlength=1 << HASH_CHUNK_BITS)
+    return order, np.cumsum(sizes) - sizes, sizes
+
+
+def _probe_buckets(
+    table: tuple[np.ndarray, np.ndarray, np.ndarray],
+    sources: np.ndarray,
+    probe: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """展开 (查询, 候选) 配对：sources[i] 与段值为 probe[i] 的桶内全部条目"""
+    order, starts, sizes = table
+    counts = sizes[probe]
+    total = counts.sum()
+    if not total:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty
+
+    queries = np.repeat(sources, counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    candidates = order[np.repeat(starts[probe], counts) + offsets]
+    return queries, candidates
+
+
+def hamming_pairs(hashes: np.ndarray, max_distance: int) -> np.ndarray:
+    """
+    多索引哈希：找出汉明距离不超过阈值的全部 64 位哈希对
+
+    哈希按 16 位切成 4 段，距离不超过 d 的两个哈希至少有一段
+    相差不超过 d // 4 位。每段按取值分桶后用翻转掩码直接定位候选桶，
+    再用完整哈希的位计数确认。
+
+    Args:
+        hashes: uint64 哈希数组
+        max_distance: 最大汉明距离
+
+    Returns:
+        形状为 (m, 2) 的下标对，每对 i < j 且不重复
+    """
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    n = len(hashes)
+    masks = _flip_masks(HASH_CHUNK_BITS, max_distance // HASH_CHUNKS)
+    found: list[np.ndarray] = []
+
+    for k in range(HASH_CHUNKS):
+        chunks = _hash_chunks(hashes, k)
+        table = _bucket_table(chunks)
+
+        for mask in masks:
+            probe = chunks ^ mask
+            # 两端互为候选，只从段值较小的一端查询
+            sources = np.flatnonzero(probe > chunks) if mask else np.arange(n)
+            queries, candidates = _probe_buckets(table, sources, probe[sources])
+            if not len(queries):
+                continue
+
+            if not mask:
+                keep = queries < candidates
+                queries, candidates = queries[keep], candidates[keep]
+            distances = np.bitwise_count(hashes[queries] ^ hashes[candidates])
+            near = distances <= max_distance
+            lo = np.minimum(queries[near], candidates[near])
+            hi = np.maximum(queries[near], candidates[near])
+            found.append(lo.astype(np.int64) * n + hi)
+
+    if not found:
+        return np.empty((0, 2), dtype=np.intp)
+    # 多个分段可能找到同一对
+    codes = np.unique(np.concatenate(found))
+    return np.stack([codes // n, codes % n], axis=1).astype(np.intp)
+
+
+class HammingIndex:
+    """
+    多索引哈希表：查询与给定哈希汉明距离不超过阈值的已索引哈希
+
+    分段方式与 hamming_pairs 相同，桶表只在构建时计算一次，
+    每次查询只访问翻转掩码命中的桶，不扫描全部哈希。
+    """
+
+    def __init__(self, hashes: np.ndarray):
+        self.hashes = np.asarray(hashes, dtype=np.uint64)
+        self._tables = [
+            _bucket_table(_hash_chunks(self.hashes, k)) for k in range(HASH_CHUNKS)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def query(self, queries: np.ndarray, max_distance: int) -> np.ndarray:
+        """
+        Args:
+            queries: uint64 查询哈希数组
+            max_distance: 最大汉明距离
+
+        Returns:
+            形状为 (m, 2) 的 (查询下标, 已索引哈希下标) 对，不重复
+        """
+        queries = np.asarray(queries, dtype=np.uint64)
+        n = len(self.hashes)
+        sources = np.arange(len(queries))
+        masks = _flip_masks(HASH_CHUNK_BITS, max_distance // HASH_CHUNKS)
+        found: list[np.ndarray] = []
+
+        for k, table in enumerate(self._tables):
+            chunks = _hash_chunks(queries, k)
+            for mask in masks:
+                q, candidates = _probe_buckets(table, sources, chunks ^ mask)
+                if not len(q):
+                    continue
+                distances = np.bitwise_count(queries[q] ^ self.hashes[candidates])
+                near = distances <= max_distance
+                found.append(q[near].astype(np.int64) * n + candidates[near])
+
+        if not found:
+            return np.empty((0, 2), dtype=np.intp)
+        codes = np.unique(np.concatenate(found))
+        return np.stack([codes // n, codes % n], axis=1).astype(np.intp)
+
+
+def link_hamming(
+    hashes: np.ndarray,
+    max_distance: int,
+    dsu: DisjointSet | None = None,
+) -> DisjointSet:
+    """
+    汉明距离不超过阈值的 64 位哈希合并到同一组
+
+    Args:
+        hashes: uint64 哈希数组
+        max_distance: 最大汉明距离
+        dsu: 合并到已有的并查集
+    """
+    if dsu is None:
+        dsu = DisjointSet(len(hashes))
+    for a, b in hamming_pairs(hashes, max_distance).tolist():
+        dsu.union(a, b)
+    return dsu
+
+
+def link_shared_hashes(
+    owners: np.ndarray,
+    hashes: np.ndarray,
+    max_distance: int,
+    min_shared: int,
+    dsu: DisjointSet | None = None,
+) -> DisjointSet:
+    """
+    按相近哈希的数量合并哈希所属的对象 (如作品及其抽样页面)
+
+    两个对象中各自至少有 min_shared 个哈希能在对方找到距离不超过阈值的哈希时
+    合并。同一对象内部的相近哈希不计数，一个哈希匹配对方多个哈希也只计一次。
+
+    Args:
+        owners: 每个哈希所属对象的下标 (0 .. k-1)
+        hashes: uint64 哈希数组，与 owners 等长
+        max_distance: 最大汉明距离
+        min_shared: 至少匹配的哈希数量
+        dsu: 合并到已有的并查集
+    """
+    owners = np.asarray(owners, dtype=np.int64)
+    k = int(owners.max()) + 1 if len(owners) else 0
+    if dsu is None:
+        dsu = DisjointSet(k)
+
+    pairs = hamming_pairs(hashes, max_distance)
+    a, b = owners[pairs[:, 0]], owners[pairs[:, 1]]
+    cross = a != b
+    # 有向记录：哪个哈希在哪个对象中找到了匹配
+    sources = np.concatenate([pairs[cross, 0], pairs[cross, 1]])
+    targets = np.concatenate([b[cross], a[cross]])
+    hits = np.unique(sources.astype(np.int64) * k + targets)
+    directed = owners[hits // k] * k + hits % k
+    codes, counts = np.unique(directed, return_counts=True)
+
+    matched = dict(zip(codes.tolist(), counts.tolist(), strict=True))
+    for code, count in matched.items():
+        x, y = divmod(code, k)
+        if x < y and min(count, matched.get(y * k + x, 0)) >= min_shared:
+            dsu.union(x, y)
+    return dsu
+
+
+def _pad(text: str, n: int) -> str:
+    return f" {text} ".ljust(n)
+
+
+def _ngrams(text: str, n: int) -> frozenset[str]:
+    padded = _pad(text, n)
+    return frozenset(padded[i : i + n] for i in range(len(padded) - n + 1))
+
+
+def _gram_hashes(texts: list[str], n: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    向量化计算全部文本的 n-gram 哈希
+
+    Returns:
+        (按文本顺序排列的 32 位 gram 哈希, 每个文本第一个 gram 的下标)
+    """
+    padded = [_pad(t, n) for t in texts]
+    lengths = np.fromiter((len(p) for p in padded), dtype=np.intp, count=len(padded))
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32)
+
+    # 以每个位置开头的 n 个字符合成一个哈希
+    total = len(codes)
+    mixed = np.zeros(total - n + 1, dtype=np.uint64)
+    for offset in range(n):
+        mixed = (mixed ^ codes[offset : total - n + 1 + offset]) * _MIX
+    hashed = mixed >> np.uint64(32)
+
+    # 只保留不跨越文本边界的 gram
+    text_starts = np.cumsum(lengths) - lengths
+    counts = lengths - n + 1
+    owners = np.repeat(text_starts, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return hashed[owners + offsets], np.cumsum(counts) - counts
+
+
+def _minhash(texts: list[str], n: int, n_perm: int, seed: int) -> np.ndarray:
+    """每个文本 n-gram 集合的 MinHash 签名 (N, n_perm)"""
+    flat, starts = _gram_hashes(texts, n)
+
+    # 乘法移位哈希族：(x ^ b) * a 取高 32 位，a 为奇数
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, n_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 1 << 32, n_perm, dtype=np.uint64)
+    shift = np.uint64(32)
+
+    signatures = np.empty((len(texts), n_perm), dtype=np.uint32)
+    for k in range(n_perm):
+        hashed = ((flat ^ b[k]) * a[k]) >> shift
+        signatures[:, k] = np.minimum.reduceat(hashed, starts)
+    return signatures
+
+
+def link_similar_texts(
+    texts: list[str],
+    threshold: float,
+    ngram: int = 3,
+    seed: int = 0,
+    dsu: DisjointSet | None = None,
+) -> DisjointSet:
+    """
+    文本模糊匹配：字符 n-gram 的 Jaccard 相似度不低于阈值时合并
+
+    MinHash LSH 分桶产生候选，只对候选做精确比较，不会比较全部配对。
+    文本中的数字序列 (卷号、话数等) 不一致时不合并。
+
+    Args:
+        texts: 已归一化的文本
+        threshold: Jaccard 相似度阈值 (0 - 1)
+        ngram: 字符 n-gram 长度
+        dsu: 合并到已有的并查集
+    """
+    n = len(texts)
+    if dsu is None:
+        dsu = DisjointSet(n)
+    if n < 2:
+        return dsu
+
+    signatures = _minhash(texts, ngram, MINHASH_BANDS * MINHASH_ROWS, seed)
+    pairs = _candidate_pairs(signatures)
+
+    # 签名一致的比例是 Jaccard 相似度的估计，先排除明显不相似的候选
+    if len(pairs):
+        agreement = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+        pairs = pairs[agreement >= threshold * MINHASH_ESTIMATE_RATIO]
+
+    grams: dict[int, frozenset[str]] = {}
+    numbers: dict[int, tuple[int, ...]] = {}
+
+    def features(i: int) -> tuple[frozenset[str], tuple[int, ...]]:
+        # n-gram 集合与数字序列只对候选文本按需计算
+        if i not in grams:
+            grams[i] = _ngrams(texts[i], ngram)
+            numbers[i] = tuple(int(d) for d in _DIGITS_RE.findall(texts[i]))
+        return grams[i], numbers[i]
+
+    for i, j in pairs.tolist():
+        if dsu.find(i) == dsu.find(j):
+            continue
+        a, nums_a = features(i)
+        b, nums_b = features(j)
+        if nums_a != nums_b:
+            continue
+        inter = len(a & b)
+        if inter >= threshold * (len(a) + len(b) - inter):
+            dsu.union(i, j)
+
+    return dsu
+
+
+def _candidate_pairs(signatures: np.ndarray) -> np.ndarray:
+    """任意一段签名完全相同的去重配对 (i < j)"""
+    n = len(signatures)
+    found = []
+    for band in range(MINHASH_BANDS):
+        rows = signatures[:, band * MINHASH_ROWS : (band + 1) * MINHASH_ROWS]
+        keys = np.zeros(n, dtype=np.uint64)
+        for col in rows.T:
+            keys = (keys ^ col) * _MIX
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # 同一个桶在排序后连续，相距 d 的两个位置键相同即为桶内配对
+        for d in range(1, MAX_BUCKET_PAIRS + 1):
+            same = np.flatnonzero(sorted_keys[d:] == sorted_keys[:-d])
+            if not len(same):
+                break
+            found.append(np.stack([order[same], order[same + d]], axis=1))
+
+    if not found:
+        return np.empty((0, 2), dtype=np.intp)
+    pairs = np.concatenate(found)
+    codes = np.unique(pairs.min(axis=1) * n + pairs.max(axis=1))
+    return np.stack([codes // n, codes % n], axis=1)
@@ -194,7 +194,7 @@ class Converter:
                 target_file = target_folder / (file_path.stem + self.cmd_gen.get_ext())
 
                 # 使用 ImageProcessor 分析图片属性 (动图/灰度)
-                img_info = self.image_processor.analyze(file_path)
+                img_info = self.image_processor.inspect(file_path)
 
                 # 生成 FFmpeg 命令行
                 cmd = self.cmd_gen.generate(
@@ -1,8 +1,15 @@
+import functools
+import hashlib
+import io
+import itertools
 import logging
+import os
 import re
 import sys
-from collections import defaultdict
-from collections.abc import Callable
+import zlib
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import NamedTuple
 
@@ -12,29 +19,110 @@ from natsort import natsorted
 from PIL import Image
 
 from koma.config import DeduplicatorConfig, ExtensionsConfig
-from koma.core.archive import ArchiveHandler
+from koma.core.archive import ZIP_SUFFIXES, ArchiveHandler
+from koma.core.clustering import (
+    DisjointSet,
+    hamming_pairs,
+    link_hamming,
+    link_shared_hashes,
+    link_similar,
+    link_similar_approx,
+    link_similar_texts,
+)
+from koma.core.embedding_cache import EmbeddingCache
+from koma.core.image_hash import phash
+from koma.core.library_index import LibraryEntry, LibraryIndex
+from koma.core.qr_cache import quick_key_of_file
+from koma.core.walker import walk_tree
 
 logger = logging.getLogger(__name__)
 
+# 模糊文件名：卷号标记 (Vol.1、No.1、#1、第1巻) 统一为数字
+_VOLUME_RE = re.compile(r"(?:\b(?:vol|no)\.?|#)\s*(?=\d)")
+_CJK_VOLUME_RE = re.compile(r"第\s*(\d+)\s*[巻卷話话集部]")
+_DIGITS_RE = re.compile(r"\d+")
+_PUNCT_RE = re.compile(r"[\W_]+")
+_PATH_SEP_RE = re.compile(r"[\\/]")
+
+# 封面模型输入尺寸
+COVER_SIZE = 224
+
+# ImageNet 归一化参数 (RGB)
+_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+# 感知哈希模式封面解码的目标尺寸
+PHASH_DECODE_SIZE = 128
+
+# 内页抽样模式：抽样位置 (页码百分位)，每个位置连续取几页以容忍页数差异
+PAGE_SAMPLE_POINTS = (0.2, 0.35, 0.5, 0.65, 0.8)
+PAGE_SAMPLE_SPAN = 2
+# 两部作品至少有几页互相匹配才视为相同
+MIN_MATCHED_PAGES = 3
+
+# 更新书库索引时每批写入的条目数
+LIBRARY_COMMIT_SIZE = 500
+
+# 计算文件 CRC32 的读取块大小
+CRC_CHUNK_SIZE = 1024 * 1024
+
+# 缩放时先按整数倍快速缩小，再做精确重采样
+REDUCING_GAP = 3.0
+
+# 封面解码与预处理的线程数
+PREPROCESS_WORKERS = min(8, os.cpu_count() or 1)
+
 
 class DuplicateItem(NamedTuple):
     path: Path
     is_archive: bool
+    # 来自导入的其他书库时为书库名称，路径不在本机
+    collection: str = ""
+    # 书库比对中匹配到的书库条目，智能选择时不会被勾选
+    in_library: bool = False
+
+
+class _Page(NamedTuple):
+    size: int
+    crc: int | None
+    # 文件夹中的图片路径，归档成员为 None
+    path: Path | None = None
+
+
+@functools.cache
+def _model_digest(model_path: Path) -> str:
+    """模型文件 (含外部权重) 的内容指纹"""
+    h = hashlib.blake2b(digest_size=16)
+    for p in (model_path, model_path.with_name(model_path.name + ".data")):
+        if p.exists():
+            h.update(p.read_bytes())
+    return h.hexdigest()
 
 
 class Deduplicator:
-    def __init__(self, ext_config: ExtensionsConfig, dedupe_config: DeduplicatorConfig):
+    def __init__(
+        self,
+        ext_config: ExtensionsConfig,
+        dedupe_config: DeduplicatorConfig,
+        embedding_cache: EmbeddingCache | None = None,
+        library_index: LibraryIndex | None = None,
+    ):
         """
         初始化查重器
 
         Args:
             ext_config: 扩展名配置
             dedupe_config: 查重配置
+            embedding_cache: 封面特征缓存，未变化的文件无需重新提取封面
+            library_index: 书库指纹索引，用于新增内容与书库比对
         """
         self.ext_config = ext_config
         self.config = dedupe_config
+        self.embedding_cache = embedding_cache
+        self.library_index = library_index
         self.archive_handler = ArchiveHandler(self.ext_config)
         self.ort_session = None
+        self.model_key = ""
 
         try:
             self.title_re = re.compile(self.config.comic_dir_regex)
@@ -61,14 +149,44 @@ class Deduplicator:
         self.ort_session = ort.InferenceSession(
             str(model_path), providers=["CPUExecutionProvider"]
         )
+        self.model_key = _model_digest(model_path)
+
+    def _batch_limit(self) -> int:
+        """单次推理的最大批大小，模型输入为固定批大小时以模型为准"""
+        batch_size = self.config.cover_batch_size
+        dim = self.ort_session.get_inputs()[0].shape[0]  # type: ignore
+        if isinstance(dim, int) and dim > 0:
+            return min(batch_size, dim)
+        return batch_size
 
     def run(
         self,
         input_paths: list[Path],
-        mode: str = "filename",  # "filename" 或 "cover"
+        # "filename"、"fuzzy"、"content"、"cover"、"phash"、"pages" 或 "hybrid"
+        mode: str = "filename",
         similarity_threshold: int = 85,
         progress_callback: Callable[[int, int, str], None] | None = None,
     ) -> dict[str, list[DuplicateItem]]:
+        all_items = self._collect_items(input_paths, progress_callback)
+        if not all_items:
+            return {}
+
+        # 解码封面代价较高，先用 zip 中央目录确认完全相同的归档
+        copies = {}
+        if mode in ("cover", "phash", "pages") and self.config.enable_zip_prefilter:
+            copies, all_items = self._prefilter_zips(all_items, progress_callback)
+
+        results = self._run_mode(
+            all_items, mode, similarity_threshold, progress_callback
+        )
+        return self._merge_copies(results, copies) if copies else results
+
+    def _collect_items(
+        self,
+        input_paths: Iterable[Path],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> list[DuplicateItem]:
+        """收集作品：没有子目录的文件夹以及归档文件"""
         all_items: list[DuplicateItem] = []
         archive_exts = self.ext_config.archive | self.ext_config.document
 
@@ -77,29 +195,258 @@ class Deduplicator:
             if not root.exists():
                 continue
 
-            for dirpath, dirnames, filenames in root.walk():
-                dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-                current_dir = Path(dirpath)
+            for entry in walk_tree(root):
+                current_dir = entry.root
 
                 if progress_callback:
                     progress_callback(0, 0, f"扫描收集目录中: {current_dir.name[:27]}")
 
-                if not dirnames:
+                if not entry.dirs:
                     all_items.append(DuplicateItem(current_dir, is_archive=False))
 
-                for f in filenames:
-                    f_path = current_dir / f
-                    if f_path.suffix.lower() in archive_exts:
-                        all_items.append(DuplicateItem(f_path, is_archive=True))
+                for f in entry.files:
+                    if os.path.splitext(f.name)[1].lower() in archive_exts:
+                        all_items.append(
+                            DuplicateItem(current_dir / f.name, is_archive=True)
+                        )
 
-        if not all_items:
-            return {}
+        return all_items
+
+    def update_library(
+        self,
+        library_paths: list[Path],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> int:
+        """
+        增量更新书库索引
+
+        只为新增或大小、修改时间变化的条目计算指纹，已删除的条目从索引移除。
+
+        Returns:
+            重新计算指纹的条目数
+        """
+        library = self._require_library()
+        changed: list[DuplicateItem] = []
+        for root in library_paths:
+            root = Path(root).absolute()
+            if not root.exists():
+                continue
+            stamps = library.stamps(root)
+            seen = set()
+            for item in self._collect_items([root], progress_callback):
+                key = self._cache_key(item.path)
+                if key is None:
+                    continue
+                seen.add(key[0])
+                if stamps.get(key[0]) != key[1:]:
+                    changed.append(item)
+            library.remove_many(stamps.keys() - seen)
+
+        total = len(changed)
+        batch: list[LibraryEntry] = []
+        results = self._map_ordered(
+            self._library_entry, changed, PREPROCESS_WORKERS * 4
+        )
+        for i, (item, entry) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"更新书库索引: {item.path.name[:25]}...")
+            if entry is not None:
+                batch.append(entry)
+            if len(batch) >= LIBRARY_COMMIT_SIZE:
+                library.put_many(batch)
+                batch = []
+        library.put_many(batch)
+
+        logger.info(f"书库索引已更新 {total} 项，共 {library.count()} 项")
+        return total
+
+    def check_library(
+        self,
+        input_paths: list[Path],
+        mode: str = "filename",
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> dict[str, list[DuplicateItem]]:
+        """
+        将新增内容与书库索引比对，只计算新增内容的指纹
+
+        "content" 比对 zip/cbz 目录摘要；"filename"、"fuzzy" 比对文件名键；
+        其余基于封面的模式比对封面感知哈希。
+        每组至少包含一个新增条目，书库内部的重复不在结果中。
+        """
+        library = self._require_library()
+        items = [
+            DuplicateItem(item.path.absolute(), item.is_archive)
+            for item in self._collect_items(input_paths, progress_callback)
+        ]
+        if mode in ("filename", "fuzzy"):
+            kind, feature, label = "name", self._filename_key, "书库同名"
+        elif mode == "content":
+            kind, feature, label = "signature", self._zip_signature, "书库相同内容"
+        else:
+            kind, feature, label = "phash", self._load_phash, "书库相似封面"
+
+        total = len(items)
+        features = []
+        results = self._map_ordered(feature, items, PREPROCESS_WORKERS * 4)
+        for i, (item, value) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"比对书库: {item.path.name[:25]}...")
+            features.append(value)
+
+        # 新增条目在前，书库中匹配到的条目依次追加
+        nodes = list(items)
+        node_index = {item.path: i for i, item in enumerate(nodes)}
+        links: list[tuple[int, int]] = []
+
+        def add_node(entry: LibraryEntry) -> int:
+            path = Path(entry.path)
+            if path not in node_index:
+                node_index[path] = len(nodes)
+                nodes.append(DuplicateItem(path, entry.is_archive, in_library=True))
+            return node_index[path]
+
+        if kind == "phash":
+            distance = self.config.phash_max_distance
+            valid = [i for i, value in enumerate(features) if value is not None]
+            hashes = np.array([features[i] for i in valid], dtype=np.uint64)
+            for q, entry in library.find_near_phash(hashes.tolist(), distance):
+                links.append((valid[q], add_node(entry)))
+            for a, b in hamming_pairs(hashes, distance).tolist():
+                links.append((valid[a], valid[b]))
+        else:
+            by_value: dict = defaultdict(list)
+            for i, value in enumerate(features):
+                if value:
+                    by_value[value].append(i)
+            if kind == "name":
+                found = library.find_by_name(by_value)
+            else:
+                found = library.find_by_signature(by_value)
+            for entry in found:
+                value = entry.name_key if kind == "name" else entry.signature
+                links.append((by_value[value][0], add_node(entry)))
+            for indices in by_value.values():
+                links.extend((indices[0], j) for j in indices[1:])
+
+        dsu = DisjointSet(len(nodes))
+        for a, b in links:
+            dsu.union(a, b)
+        # 分组按最小下标排序，首个元素是新增条目即说明组内含新增内容
+        groups = [
+            [nodes[k] for k in group] for group in dsu.groups() if group[0] < total
+        ]
+
+        if progress_callback:
+            progress_callback(total, total, "书库比对完成")
+
+        return self._format_results(self._group_items(groups, label))
+
+    def match_collections(
+        self,
+        mode: str = "filename",
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> dict[str, list[DuplicateItem]]:
+        """
+        在本机书库索引与导入的其他书库之间查重，直接使用索引中的指纹，不扫描文件
+
+        比对方式与 check_library 相同。只返回跨越两个及以上书库的分组。
+        """
+        library = self._require_library()
+        if progress_callback:
+            progress_callback(0, 0, "读取书库指纹...")
+        entries = library.entries()
+
+        if mode in ("filename", "fuzzy"):
+            groups = self._group_entries(entries, lambda e: e.name_key)
+        elif mode == "content":
+            groups = self._group_entries(entries, lambda e: e.signature)
+        else:
+            with_hash = [e for e in entries if e.phash is not None]
+            hashes = np.array([e.phash for e in with_hash], dtype=np.uint64)
+            dsu = link_hamming(hashes, self.config.phash_max_distance)
+            groups = [[with_hash[k] for k in group] for group in dsu.groups()]
 
+        cross = [
+            [DuplicateItem(Path(e.path), e.is_archive, e.collection) for e in group]
+            for group in groups
+            if len({e.collection for e in group}) > 1
+        ]
+
+        if progress_callback:
+            progress_callback(1, 1, "跨书库比对完成")
+
+        return self._format_results(self._group_items(cross, "跨书库"))
+
+    @staticmethod
+    def _group_entries(
+        entries: list[LibraryEntry], key: Callable[[LibraryEntry], object]
+    ) -> list[list[LibraryEntry]]:
+        groups = defaultdict(list)
+        for entry in entries:
+            value = key(entry)
+            if value:
+                groups[value].append(entry)
+        return [g for g in groups.values() if len(g) > 1]
+
+    def _require_library(self) -> LibraryIndex:
+        if self.library_index is None:
+            raise ValueError("未配置书库索引")
+        return self.library_index
+
+    def _library_entry(self, item: DuplicateItem) -> LibraryEntry | None:
+        """计算条目的书库指纹"""
+        key = self._cache_key(item.path)
+        if key is None:
+            return None
+        path, size, mtime_ns = key
+        return LibraryEntry(
+            path,
+            item.is_archive,
+            size,
+            mtime_ns,
+            self._filename_key(item),
+            self._load_phash(item),
+            self._zip_signature(item),
+        )
+
+    def _zip_signature(self, item: DuplicateItem) -> bytes | None:
+        if not item.is_archive or item.path.suffix.lower() not in ZIP_SUFFIXES:
+            return None
+        pages = self._list_pages(item)
+        return self._content_signature(pages) if pages else None
+
+    def _run_mode(
+        self,
+        all_items: list[DuplicateItem],
+        mode: str = "filename",
+        similarity_threshold: int = 85,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> dict[str, list[DuplicateItem]]:
         if mode == "cover":
             self._init_onnx()
             return self._run_cover_mode(
                 all_items, similarity_threshold, progress_callback
             )
+        elif mode == "fuzzy":
+            return self._run_fuzzy_mode(
+                all_items,
+                self.config.fuzzy_name_threshold / 100.0,
+                progress_callback,
+            )
+        elif mode == "content":
+            return self._run_content_mode(all_items, progress_callback)
+        elif mode == "phash":
+            return self._run_phash_mode(
+                all_items, self.config.phash_max_distance, progress_callback
+            )
+        elif mode == "pages":
+            return self._run_pages_mode(
+                all_items, self.config.phash_max_distance, progress_callback
+            )
+        elif mode == "hybrid":
+            return self._run_hybrid_mode(
+                all_items, similarity_threshold, progress_callback
+            )
         else:
             return self._run_filename_mode(all_items, progress_callback)
 
@@ -110,100 +457,479 @@ class Deduplicator:
     ):
         items_map = defaultdict(list)
 
-        def _process_node(item: DuplicateItem):
-            name = item.path.stem if item.is_archive else item.path.name
-            match = self.title_re.search(name)
-
-            if match:
-                groups = match.groupdict()
-                raw_artist = groups.get("artist") or ""
-                raw_title = groups.get("title") or ""
-                raw_series = groups.get("series") or ""
-
-                if raw_series:
-                    raw_series = raw_series.rstrip(") ")
-
-                core_artist = self._extract_circle_name(raw_artist)
-                artist_norm = self._normalize_text(core_artist)
-                title_norm = self._normalize_text(raw_title)
-                series_norm = self._normalize_text(raw_series)
-
-                key_parts = [p for p in [artist_norm, title_norm, series_norm] if p]
-                key = " - ".join(key_parts)
-                if not key:
-                    key = self._normalize_text(name)
-                items_map[key].append(item)
-            else:
-                key = self._normalize_text(name)
-                items_map[key].append(item)
-
         total = len(items)
         for i, item in enumerate(items):
             if progress_callback:
                 progress_callback(i, total, f"文件名分析: {item.path.name[:25]}...")
-            _process_node(item)
+            items_map[self._filename_key(item)].append(item)
 
         if progress_callback:
             progress_callback(total, total, "文件名对比分析完成")
 
         return self._format_results(items_map)
 
-    def _run_cover_mode(
+    def _run_fuzzy_mode(
+        self,
+        items: list[DuplicateItem],
+        threshold: float,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ):
+        items_map = self._fuzzy_groups(items, threshold, progress_callback)
+
+        if progress_callback:
+            progress_callback(len(items), len(items), "文件名模糊比对完成")
+
+        return self._format_results(items_map)
+
+    def _fuzzy_groups(
+        self,
+        items: list[DuplicateItem],
+        threshold: float,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> dict[str, list[DuplicateItem]]:
+        """按文件名键及其相近的键分组，返回 键 -> 条目列表 (含单个条目的组)"""
+        total = len(items)
+        keys = []
+        for i, item in enumerate(items):
+            if progress_callback:
+                progress_callback(i, total, f"文件名分析: {item.path.name[:25]}...")
+            keys.append(self._filename_key(item))
+
+        if progress_callback:
+            progress_callback(total, total, "文件名模糊比对中...")
+
+        # 完全相同的键只参与一次比对
+        unique_keys = list(dict.fromkeys(keys))
+        key_index = {key: i for i, key in enumerate(unique_keys)}
+        dsu = link_similar_texts(
+            [self._fuzzy_text(key) for key in unique_keys], threshold
+        )
+
+        # 每组以最先出现的键命名
+        names: dict[int, str] = {}
+        for i, key in enumerate(unique_keys):
+            names.setdefault(dsu.find(i), key)
+
+        items_map = defaultdict(list)
+        for item, key in zip(items, keys, strict=True):
+            items_map[names[dsu.find(key_index[key])]].append(item)
+        return items_map
+
+    def _run_hybrid_mode(
         self,
         items: list[DuplicateItem],
         threshold: int,
         progress_callback: Callable[[int, int, str], None] | None = None,
     ):
+        """
+        文件名 + 封面两阶段查重
+
+        先按文件名 (含模糊匹配) 找出候选组，只对候选组内的条目提取封面特征，
+        组内封面相似度达到阈值才确认为重复。候选条目中内容完全相同的 zip/cbz
+        只提取一次封面。
+        """
         threshold /= 100.0
-        total = len(items)
-        clusters = []
+        candidates = [
+            group
+            for group in self._fuzzy_groups(
+                items, self.config.fuzzy_name_threshold / 100.0, progress_callback
+            ).values()
+            if len(group) > 1
+        ]
+        pending = [item for group in candidates for item in group]
+        logger.info(f"混合模式: {len(items)} 个条目中 {len(pending)} 个需要比对封面")
 
-        for i, item in enumerate(items):
+        copies = {}
+        if pending and self.config.enable_zip_prefilter:
+            copies, pending = self._prefilter_zips(pending, progress_callback)
+
+        embeddings: dict[DuplicateItem, np.ndarray] = {}
+        if pending:
+            self._init_onnx()
+        total = len(pending)
+        for i, (item, emb) in enumerate(self._cover_embeddings(pending)):
             if progress_callback:
                 progress_callback(i, total, f"封面分析: {item.path.name[:25]}...")
+            if emb is not None:
+                embeddings[item] = emb
+        # 副本与代表共用封面特征
+        for rep, others in copies.items():
+            if rep in embeddings:
+                embeddings.update(dict.fromkeys(others, embeddings[rep]))
 
-            emb = self._extract_embedding(item)
-            if emb is None:
+        groups = []
+        for group in candidates:
+            members = [item for item in group if item in embeddings]
+            if len(members) < 2:
                 continue
+            matrix = np.stack([embeddings[item] for item in members])
+            dsu = link_similar(matrix.astype(np.float32), threshold)
+            groups.extend([members[k] for k in g] for g in dsu.groups())
 
-            best_match_idx = -1
-            best_sim = -1.0
+        if progress_callback:
+            progress_callback(total, total, "混合比对分析完成")
 
-            for c_idx, cluster in enumerate(clusters):
-                sim = np.dot(emb, cluster["center_emb"])
-                if sim > best_sim:
-                    best_sim = sim
-                    best_match_idx = c_idx
+        return self._format_results(self._group_items(groups))
 
-            if best_sim >= threshold:
-                clusters[best_match_idx]["items"].append(item)
-            else:
-                clusters.append({"center_emb": emb, "items": [item]})
+    def _run_content_mode(
+        self,
+        items: list[DuplicateItem],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ):
+        """
+        按页面内容查找完全相同的作品，不解码图片
+
+        归档直接使用目录中记录的 CRC32 与大小；文件夹按 页面大小 -> 首尾块
+        -> 完整 CRC32 逐级筛选，只有可能重复的文件才完整读取。
+        """
+        total = len(items)
+        listings: dict[DuplicateItem, list[_Page]] = {}
+        results = self._map_ordered(self._list_pages, items, PREPROCESS_WORKERS * 4)
+        for i, (item, pages) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"读取目录: {item.path.name[:25]}...")
+            if pages:
+                listings[item] = pages
+
+        # 页数与各页大小完全一致才可能相同
+        by_size: dict[tuple[int, ...], list[DuplicateItem]] = defaultdict(list)
+        for item, pages in listings.items():
+            by_size[tuple(sorted(p.size for p in pages))].append(item)
+
+        # 只含文件夹的分组先比较首尾块，排除大小巧合相同的
+        buckets: list[list[DuplicateItem]] = []
+        for bucket in by_size.values():
+            if len(bucket) < 2:
+                continue
+            if any(item.is_archive for item in bucket):
+                buckets.append(bucket)
+                continue
+            by_partial = defaultdict(list)
+            for item in bucket:
+                by_partial[self._partial_key(listings[item])].append(item)
+            buckets.extend(b for b in by_partial.values() if len(b) > 1)
+
+        if progress_callback:
+            progress_callback(total, total, "计算文件夹内容校验值...")
+
+        # 文件夹计算完整 CRC32，与归档目录中的 CRC32 直接比较
+        pending = [item for bucket in buckets for item in bucket if not item.is_archive]
+        hashed = self._map_ordered(
+            lambda item: self._fill_crcs(listings[item]),
+            pending,
+            PREPROCESS_WORKERS * 2,
+        )
+        for item, pages in hashed:
+            listings[item] = pages
+
+        groups = []
+        for bucket in buckets:
+            by_content = defaultdict(list)
+            for item in bucket:
+                pages = listings[item]
+                if any(p.crc is None for p in pages):
+                    continue
+                by_content[tuple(sorted((p.crc, p.size) for p in pages))].append(item)
+            groups.extend(g for g in by_content.values() if len(g) > 1)
+
+        if progress_callback:
+            progress_callback(total, total, "内容比对完成")
+
+        return self._format_results(self._group_items(groups, "相同内容"))
+
+    def _prefilter_zips(
+        self,
+        items: list[DuplicateItem],
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ) -> tuple[dict[DuplicateItem, list[DuplicateItem]], list[DuplicateItem]]:
+        """
+        按 zip/cbz 中央目录 (页数、各页大小与 CRC32) 找出内容完全相同的归档
+
+        每个归档只读取文件尾，不解压。
+
+        Returns:
+            (代表条目 -> 其余副本, 去掉副本后的条目列表)
+        """
+        zips = [
+            item
+            for item in items
+            if item.is_archive and item.path.suffix.lower() in ZIP_SUFFIXES
+        ]
+        total = len(zips)
+        by_signature: dict[bytes, list[DuplicateItem]] = defaultdict(list)
+        results = self._map_ordered(self._list_pages, zips, PREPROCESS_WORKERS * 4)
+        for i, (item, pages) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"预筛压缩包目录: {item.path.name[:25]}...")
+            if pages:
+                by_signature[self._content_signature(pages)].append(item)
+
+        copies = {
+            group[0]: group[1:] for group in by_signature.values() if len(group) > 1
+        }
+        if not copies:
+            return {}, items
+
+        skipped = {item for group in copies.values() for item in group}
+        logger.info(
+            f"压缩包目录预筛: {total} 个压缩包中 {len(skipped)} 个为完全相同的副本"
+        )
+        return copies, [item for item in items if item not in skipped]
+
+    @staticmethod
+    def _content_signature(pages: list[_Page]) -> bytes:
+        """页面 (CRC32, 大小) 多重集合的摘要，隐含页数与各页大小"""
+        pairs = np.array(sorted((p.crc or 0, p.size) for p in pages), dtype=np.uint64)
+        return hashlib.blake2b(pairs.tobytes(), digest_size=16).digest()
+
+    def _merge_copies(
+        self,
+        results: dict[str, list[DuplicateItem]],
+        copies: dict[DuplicateItem, list[DuplicateItem]],
+    ) -> dict[str, list[DuplicateItem]]:
+        """把预筛确认的副本并入其代表所在的分组，未归组的代表单独成组"""
+        grouped = set()
+        merged = {}
+        for key, group_items in results.items():
+            extra = [c for item in group_items for c in copies.get(item, [])]
+            grouped.update(item for item in group_items if item in copies)
+            merged[key] = group_items + extra
+
+        rest = [[rep, *others] for rep, others in copies.items() if rep not in grouped]
+        merged.update(self._group_items(rest, "相同内容"))
+        return self._format_results(merged)
+
+    def _list_pages(self, item: DuplicateItem) -> list[_Page] | None:
+        """列出作品的图片页面：归档读取目录，文件夹读取文件大小"""
+        try:
+            if item.is_archive:
+                members = self.archive_handler.list_members(item.path)
+                if members is None:
+                    return None
+                return [
+                    _Page(m.size, m.crc)
+                    for m in members
+                    if not m.is_dir and self._is_page(m.name)
+                ]
+
+            return [
+                _Page(f.stat().st_size, None, f)
+                for f in item.path.iterdir()
+                if f.is_file() and self._is_page(f.name)
+            ]
+        except OSError as e:
+            logger.debug(f"❌ 无法读取目录 {item.path.name}: {e}")
+            return None
+
+    def _is_page(self, name: str) -> bool:
+        parts = _PATH_SEP_RE.split(name)
+        if "__MACOSX" in parts or parts[-1].startswith("._"):
+            return False
+        return (
+            os.path.splitext(parts[-1])[1].lower() in self.ext_config.all_supported_img
+        )
+
+    def _partial_key(self, pages: list[_Page]) -> tuple[str, ...] | None:
+        try:
+            return tuple(sorted(quick_key_of_file(p.path) for p in pages if p.path))
+        except OSError:
+            return None
+
+    def _fill_crcs(self, pages: list[_Page]) -> list[_Page]:
+        """补全文件夹图片的 CRC32，读取失败的保持为 None"""
+        filled = []
+        for page in pages:
+            if page.crc is None and page.path is not None:
+                try:
+                    crc = 0
+                    with open(page.path, "rb") as f:
+                        while chunk := f.read(CRC_CHUNK_SIZE):
+                            crc = zlib.crc32(chunk, crc)
+                    page = page._replace(crc=crc)
+                except OSError as e:
+                    logger.debug(f"❌ 无法读取 {page.path.name}: {e}")
+            filled.append(page)
+        return filled
+
+    def _run_cover_mode(
+        self,
+        items: list[DuplicateItem],
+        threshold: int,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ):
+        threshold /= 100.0
+        total = len(items)
+        valid_items: list[DuplicateItem] = []
+        embeddings: list[np.ndarray] = []
+
+        for i, (item, emb) in enumerate(self._cover_embeddings(items)):
+            if progress_callback:
+                progress_callback(i, total, f"封面分析: {item.path.name[:25]}...")
+
+            if emb is not None:
+                valid_items.append(item)
+                embeddings.append(emb)
+
+        if progress_callback:
+            progress_callback(total, total, "封面相似度比对中...")
 
         items_map = {}
-        for cluster in clusters:
-            if len(cluster["items"]) > 1:
-                rep_name = cluster["items"][0].path.stem
-                items_map[f"相似组: {rep_name}"] = cluster["items"]
+        if embeddings:
+            matrix = np.stack(embeddings).astype(np.float32)
+            approx_limit = self.config.cover_approx_threshold
+            if approx_limit and len(matrix) >= approx_limit:
+                logger.info(f"条目数 {len(matrix)} 超过阈值，使用近似比对")
+                dsu = link_similar_approx(matrix, threshold)
+            else:
+                dsu = link_similar(matrix, threshold)
+
+            items_map = self._group_items(
+                [[valid_items[k] for k in group] for group in dsu.groups()]
+            )
 
         if progress_callback:
             progress_callback(total, total, "封面比对分析完成")
 
         return self._format_results(items_map)
 
+    def _run_phash_mode(
+        self,
+        items: list[DuplicateItem],
+        max_distance: int,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ):
+        total = len(items)
+        valid_items: list[DuplicateItem] = []
+        hashes: list[int] = []
+
+        results = self._map_ordered(self._load_phash, items, PREPROCESS_WORKERS * 4)
+        for i, (item, page_hash) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"封面哈希: {item.path.name[:25]}...")
+
+            if page_hash is not None:
+                valid_items.append(item)
+                hashes.append(page_hash)
+
+        dsu = link_hamming(np.array(hashes, dtype=np.uint64), max_distance)
+        items_map = self._group_items(
+            [[valid_items[k] for k in group] for group in dsu.groups()]
+        )
+
+        if progress_callback:
+            progress_callback(total, total, "封面哈希比对完成")
+
+        return self._format_results(items_map)
+
+    def _run_pages_mode(
+        self,
+        items: list[DuplicateItem],
+        max_distance: int,
+        progress_callback: Callable[[int, int, str], None] | None = None,
+    ):
+        """
+        内页抽样查重：按固定百分位抽取内页计算感知哈希
+
+        适用于封面不同但内页相同的再版、不同语言版本。
+        通过哈希倒排索引查找相近页面，匹配页数足够的作品归为一组。
+        """
+        total = len(items)
+        valid_items: list[DuplicateItem] = []
+        owners: list[int] = []
+        hashes: list[int] = []
+
+        results = self._map_ordered(
+            self._load_page_hashes, items, PREPROCESS_WORKERS * 4
+        )
+        for i, (item, page_hashes) in enumerate(results):
+            if progress_callback:
+                progress_callback(i, total, f"内页抽样: {item.path.name[:25]}...")
+
+            if len(page_hashes) >= MIN_MATCHED_PAGES:
+                owners.extend([len(valid_items)] * len(page_hashes))
+                hashes.extend(page_hashes)
+                valid_items.append(item)
+
+        if progress_callback:
+            progress_callback(total, total, "内页哈希比对中...")
+
+        dsu = link_shared_hashes(
+            np.array(owners, dtype=np.intp),
+            np.array(hashes, dtype=np.uint64),
+            max_distance,
+            MIN_MATCHED_PAGES,
+        )
+        items_map = self._group_items(
+            [[valid_items[k] for k in group] for group in dsu.groups()], "内页相同"
+        )
+
+        if progress_callback:
+            progress_callback(total, total, "内页比对完成")
+
+        return self._format_results(items_map)
+
+    def _group_items(
+        self, groups: Iterable[list[DuplicateItem]], label: str = "相似组"
+    ) -> dict[str, list[DuplicateItem]]:
+        """分组转换为 "标签: 代表名称" -> 条目列表，重名时追加序号"""
+        items_map = {}
+        for group_items in groups:
+            key = f"{label}: {group_items[0].path.stem}"
+            n = 2
+            while key in items_map:
+                key = f"{label}: {group_items[0].path.stem} ({n})"
+                n += 1
+            items_map[key] = group_items
+        return items_map
+
     def _format_results(self, items_map: dict) -> dict[str, list[DuplicateItem]]:
         final_results = {}
         valid_keys = [k for k, v in items_map.items() if len(v) > 1]
         sorted_keys = natsorted(valid_keys)
         for key in sorted_keys:
             items = items_map[key]
+            # 其他书库的条目不在本机，排在最后
             items.sort(
-                key=lambda x: x.path.stat().st_mtime if x.path.exists() else 0,
+                key=lambda x: (
+                    x.path.stat().st_mtime
+                    if not x.collection and x.path.exists()
+                    else 0
+                ),
                 reverse=True,
             )
             final_results[key] = items
         return final_results
 
+    def _filename_key(self, item: DuplicateItem) -> str:
+        """解析文件名，返回归一化的 "作者 - 标题 - 系列" 键"""
+        name = item.path.stem if item.is_archive else item.path.name
+        match = self.title_re.search(name)
+        if not match:
+            return self._normalize_text(name)
+
+        groups = match.groupdict()
+        raw_artist = groups.get("artist") or ""
+        raw_title = groups.get("title") or ""
+        raw_series = groups.get("series") or ""
+
+        if raw_series:
+            raw_series = raw_series.rstrip(") ")
+
+        core_artist = self._extract_circle_name(raw_artist)
+        artist_norm = self._normalize_text(core_artist)
+        title_norm = self._normalize_text(raw_title)
+        series_norm = self._normalize_text(raw_series)
+
+        key_parts = [p for p in [artist_norm, title_norm, series_norm] if p]
+        return " - ".join(key_parts) or self._normalize_text(name)
+
+    def _fuzzy_text(self, key: str) -> str:
+        """模糊比对用文本：统一卷号写法，去掉标点，数字去前导零"""
+        text = _CJK_VOLUME_RE.sub(r" \1 ", key)
+        text = _VOLUME_RE.sub(" ", text)
+        text = _DIGITS_RE.sub(lambda m: str(int(m.group())), text)
+        return " ".join(_PUNCT_RE.sub(" ", text).split())
+
     def _normalize_text(self, text: str) -> str:
         """归一化：全角转半角，去多余空格，转小写"""
         if not text:
@@ -221,55 +947,229 @@ class Deduplicator:
             return content.split("(", 1)[0]
         return content
 
-    def _extract_embedding(self, item: DuplicateItem) -> np.ndarray | None:
-        """从文件提取封面并转化为 1D 特征向量"""
+    def _cover_embeddings(
+        self, items: list[DuplicateItem]
+    ) -> Iterator[tuple[DuplicateItem, np.ndarray | None]]:
+        """按原顺序返回封面特征向量，优先读取缓存，只提取新增或变化的文件"""
+        cache = self.embedding_cache if self.config.enable_cover_cache else None
+        if cache is None:
+            yield from self._extract_embeddings(items)
+            return
+
+        cache.open(self.model_key)
+        extracted = None
         try:
-            img = None
-            if not item.is_archive:
-                for f in natsorted(item.path.iterdir(), key=lambda x: str(x)):
-                    if (
-                        f.is_file()
-                        and f.suffix.lower() in self.ext_config.all_supported_img
-                    ):
-                        img = Image.open(f)
-                        break
-            else:
-                img = self.archive_handler.extract_cover(item.path)
+            lookups = []
+            missing = []
+            for item in items:
+                key = self._cache_key(item.path)
+                emb = cache.get(*key) if key else None
+                lookups.append((key, emb))
+                if emb is None:
+                    missing.append(item)
+
+            if len(missing) < len(items):
+                logger.info(f"封面特征缓存命中 {len(items) - len(missing)} 项")
+
+            extracted = self._extract_embeddings(missing)
+            for item, (key, emb) in zip(items, lookups, strict=True):
+                if emb is None:
+                    _, emb = next(extracted)
+                    if emb is not None and key is not None:
+                        cache.put(*key, emb)
+                yield item, emb
+        finally:
+            if extracted is not None:
+                extracted.close()
+            cache.close()
 
+    def _cache_key(self, path: Path) -> tuple[str, int, int] | None:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return str(path.absolute()), st.st_size, st.st_mtime_ns
+
+    def _extract_embeddings(
+        self, items: Iterable[DuplicateItem]
+    ) -> Iterator[tuple[DuplicateItem, np.ndarray | None]]:
+        """
+        按原顺序批量提取封面特征向量
+
+        后台线程解码与预处理后续封面，同时主线程对当前批次做推理。
+        """
+        batch_size = self.config.cover_batch_size
+        # 预先提交两个批次，推理期间线程池不会空闲
+        loads = self._map_ordered(self._load_cover, items, batch_size * 2)
+        try:
+            for loaded in itertools.batched(loads, batch_size):
+                tensors = [t for _, t in loaded if t is not None]
+                embeddings = iter(
+                    self._embed_batch(np.stack(tensors)) if tensors else []
+                )
+                for item, tensor in loaded:
+                    yield item, next(embeddings) if tensor is not None else None
+        finally:
+            loads.close()
+
+    def _map_ordered[T](
+        self,
+        fn: Callable[[DuplicateItem], T],
+        items: Iterable[DuplicateItem],
+        window: int,
+    ) -> Iterator[tuple[DuplicateItem, T]]:
+        """在线程池中执行 fn 并按原顺序返回，在途任务不超过 window 个"""
+        pool = ThreadPoolExecutor(max_workers=PREPROCESS_WORKERS)
+        pending: deque[tuple[DuplicateItem, Future]] = deque()
+        it = iter(items)
+
+        def fill():
+            while len(pending) < window:
+                item = next(it, None)
+                if item is None:
+                    return
+                pending.append((item, pool.submit(fn, item)))
+
+        try:
+            fill()
+            while pending:
+                item, future = pending.popleft()
+                result = future.result()
+                fill()
+                yield item, result
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _open_cover(
+        self, item: DuplicateItem, size: tuple[int, int]
+    ) -> Image.Image | None:
+        """读取封面，JPEG 在 DCT 阶段直接缩小到接近目标尺寸"""
+        if item.is_archive:
+            return self.archive_handler.extract_cover(item.path, size)
+
+        for f in natsorted(item.path.iterdir(), key=lambda x: str(x)):
+            if f.is_file() and f.suffix.lower() in self.ext_config.all_supported_img:
+                with Image.open(f) as src:
+                    src.draft(src.mode, size)
+                    return src.copy()
+        return None
+
+    @staticmethod
+    def _flatten(img: Image.Image) -> Image.Image:
+        """透明图片合成到白色背景"""
+        if img.mode != "RGBA":
+            return img
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        bg.paste(img, mask=img.split()[3])
+        return bg
+
+    def _load_phash(self, item: DuplicateItem) -> int | None:
+        """计算封面的 64 位感知哈希"""
+        try:
+            img = self._open_cover(item, (PHASH_DECODE_SIZE, PHASH_DECODE_SIZE))
             if img is None:
                 return None
+            return self._image_phash(img)
 
-            if img.mode in ("P", "RGBA", "LA") or (
-                img.mode == "P" and "transparency" in img.info
-            ):
-                img = img.convert("RGBA")
-                bg = Image.new("RGB", img.size, (255, 255, 255))
-                bg.paste(img, mask=img.split()[3])
-                img = bg
+        except Exception as e:
+            logger.debug(f"❌ 无法读取封面 {item.path.name}: {e}")
+            return None
+
+    def _image_phash(self, img: Image.Image) -> int | None:
+        img = img.convert("RGBA" if img.mode in ("P", "RGBA", "LA") else "RGB")
+        img.thumbnail((PHASH_DECODE_SIZE, PHASH_DECODE_SIZE), reducing_gap=REDUCING_GAP)
+        return phash(np.asarray(self._flatten(img).convert("L")))
+
+    def _load_page_hashes(self, item: DuplicateItem) -> list[int]:
+        """计算抽样内页的感知哈希，归档只读取被抽中的成员"""
+        try:
+            if item.is_archive:
+                members = self.archive_handler.list_members(item.path)
+                if not members:
+                    return []
+                names = natsorted(
+                    m.name for m in members if not m.is_dir and self._is_page(m.name)
+                )
+                picked = self._sample_pages(names)
+                data = self.archive_handler.read_members(item.path, picked)
+                sources = [io.BytesIO(data[name]) for name in picked if name in data]
             else:
-                img = img.convert("RGB")
+                files = natsorted(
+                    (
+                        f
+                        for f in item.path.iterdir()
+                        if f.is_file() and self._is_page(f.name)
+                    ),
+                    key=lambda f: f.name,
+                )
+                sources = self._sample_pages(files)
 
-            img = img.resize((224, 224))
-            img_data = np.array(img).astype("float32") / 255.0
+            hashes = []
+            for source in sources:
+                with Image.open(source) as img:
+                    img.draft(img.mode, (PHASH_DECODE_SIZE, PHASH_DECODE_SIZE))
+                    page_hash = self._image_phash(img)
+                if page_hash is not None:
+                    hashes.append(page_hash)
+            return hashes
 
-            mean = np.array([0.485, 0.456, 0.406])
-            std = np.array([0.229, 0.224, 0.225])
-            img_data = (img_data - mean) / std
+        except Exception as e:
+            logger.debug(f"❌ 无法读取内页 {item.path.name}: {e}")
+            return []
 
-            img_data = np.transpose(img_data, (2, 0, 1))
-            img_data = np.expand_dims(img_data, axis=0)
-            img_data = img_data.astype(np.float32)
+    @staticmethod
+    def _sample_pages[T](pages: list[T]) -> list[T]:
+        """按百分位抽取内页，每个位置连续取 PAGE_SAMPLE_SPAN 页"""
+        if not pages:
+            return []
+        picked = set()
+        for point in PAGE_SAMPLE_POINTS:
+            start = int(point * (len(pages) - 1))
+            picked.update(range(start, min(start + PAGE_SAMPLE_SPAN, len(pages))))
+        return [pages[i] for i in sorted(picked)]
 
-            ort_inputs = {self.ort_session.get_inputs()[0].name: img_data}
-            ort_outs = self.ort_session.run(None, ort_inputs)
+    def _load_cover(self, item: DuplicateItem) -> np.ndarray | None:
+        """读取封面并预处理为 CHW float32 张量"""
+        try:
+            img = self._open_cover(item, (COVER_SIZE, COVER_SIZE))
+            if img is None:
+                return None
 
-            embedding = ort_outs[0].flatten()
-            eps = 1e-8
-            embedding = (embedding - np.mean(embedding)) / (np.std(embedding) + eps)
-            norm = np.linalg.norm(embedding)
+            # 先缩小再合成白色背景，避免在原始分辨率上做整图运算
+            img = img.convert("RGBA" if img.mode in ("P", "RGBA", "LA") else "RGB")
+            img = img.resize((COVER_SIZE, COVER_SIZE), reducing_gap=REDUCING_GAP)
+            img = self._flatten(img)
+            img_data = np.asarray(img, dtype=np.float32) / 255.0
+            img_data = (img_data - _MEAN) / _STD
 
-            return embedding / norm if norm > 0 else embedding
+            return np.ascontiguousarray(img_data.transpose(2, 0, 1))
 
         except Exception as e:
-            logger.debug(f"❌ 无法提取特征 {item.path.name}: {e}")
+            logger.debug(f"❌ 无法读取封面 {item.path.name}: {e}")
             return None
+
+    def _embed_batch(self, batch: np.ndarray) -> list[np.ndarray | None]:
+        """对一批预处理后的封面推理，返回归一化后的特征向量"""
+        limit = self._batch_limit()
+        input_name = self.ort_session.get_inputs()[0].name  # type: ignore
+        results: list[np.ndarray | None] = []
+
+        for start in range(0, len(batch), limit):
+            chunk = batch[start : start + limit]
+            try:
+                ort_outs = self.ort_session.run(None, {input_name: chunk})  # type: ignore
+            except Exception as e:
+                logger.debug(f"❌ 无法提取特征: {e}")
+                results.extend([None] * len(chunk))
+                continue
+
+            embeddings = ort_outs[0].reshape(len(chunk), -1)
+            eps = 1e-8
+            embeddings = (embeddings - embeddings.mean(axis=1, keepdims=True)) / (
+                embeddings.std(axis=1, keepdims=True) + eps
+            )
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.where(norms > 0, norms, 1.0)
+            results.extend(embeddings)
+
+        return results
@@ -0,0 +1,252 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from koma.config import get_user_config_dir
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIRNAME = "embedding_cache"
+MATRIX_FILENAME = "embeddings.f16"
+INDEX_FILENAME = "embeddings.db"
+
+# 自动清理已删除文件条目的间隔 (秒)
+PRUNE_INTERVAL = 7 * 24 * 3600
+
+_DTYPE = np.dtype(np.float16)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    row INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class EmbeddingCache:
+    """
+    封面特征向量缓存
+
+    特征向量以 float16 矩阵保存在单个文件中并通过 mmap 读取，
+    SQLite 索引记录 路径 + 大小 + 修改时间 对应的行号。
+    模型文件变化时整个缓存自动失效；已删除文件的条目定期清理，
+    矩阵文件随之压缩。
+    """
+
+    def __init__(self, cache_dir: Path | None = None):
+        """
+        初始化特征缓存
+
+        Args:
+            cache_dir: 缓存目录，默认位于用户配置目录
+        """
+        self.cache_dir = (
+            Path(cache_dir) if cache_dir else get_user_config_dir() / CACHE_DIRNAME
+        )
+        self.matrix_path = self.cache_dir / MATRIX_FILENAME
+        self.index_path = self.cache_dir / INDEX_FILENAME
+
+        self._conn: sqlite3.Connection | None = None
+        self._matrix: np.memmap | None = None
+        self._index: dict[str, tuple[int, int, int]] = {}
+        self._dim: int | None = None
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "EmbeddingCache":
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self, model_key: str | None = None):
+        """
+        打开缓存
+
+        Args:
+            model_key: 模型指纹，与缓存记录的不一致时清空缓存
+        """
+        with self._lock:
+            if self._conn is None:
+                self._open()
+            if model_key is not None and self._meta("model") != model_key:
+                if self._index:
+                    logger.info("模型已变化，封面特征缓存失效")
+                self._reset()
+                self._set_meta("model", model_key)
+                self._conn.commit()  # type: ignore
+
+            last_prune = float(self._meta("pruned_at") or 0)
+            if time.time() - last_prune >= PRUNE_INTERVAL:
+                self._prune()
+
+    def _open(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        dim = self._meta("dim")
+        self._dim = int(dim) if dim else None
+        self._index = {
+            path: (size, mtime_ns, row)
+            for path, size, mtime_ns, row in self._conn.execute(
+                "SELECT path, size, mtime_ns, row FROM items"
+            )
+        }
+
+        self.matrix_path.touch()
+        size = self.matrix_path.stat().st_size
+        self._rows = size // (self._dim * _DTYPE.itemsize) if self._dim else 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+            finally:
+                self._matrix = None
+                self._conn.close()
+                self._conn = None
+
+    def get(self, path: str, size: int, mtime_ns: int) -> np.ndarray | None:
+        """查询特征向量，文件大小或修改时间变化时视为未命中"""
+        with self._lock:
+            entry = self._index.get(path)
+            if entry is None or entry[:2] != (size, mtime_ns):
+                return None
+
+            row = entry[2]
+            if self._matrix is None or row >= len(self._matrix):
+                self._remap()
+            if self._matrix is None or row >= len(self._matrix):
+                return None
+            return self._matrix[row].astype(np.float32)
+
+    def put(self, path: str, size: int, mtime_ns: int, embedding: np.ndarray):
+        with self._lock:
+            if self._dim is None:
+                self._dim = len(embedding)
+                self._set_meta("dim", str(self._dim))
+            elif len(embedding) != self._dim:
+                return
+
+            entry = self._index.get(path)
+            if entry is not None:
+                row = entry[2]
+            else:
+                row = self._rows
+                self._rows += 1
+
+            with open(self.matrix_path, "r+b") as f:
+                f.seek(row * self._dim * _DTYPE.itemsize)
+                f.write(embedding.astype(_DTYPE).tobytes())
+            self._index[path] = (size, mtime_ns, row)
+            self._conn.execute(  # type: ignore
+                "INSERT OR REPLACE INTO items (path, size, mtime_ns, row) "
+                "VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, row),
+            )
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._reset()
+            self._conn.commit()  # type: ignore
+
+    def prune(self) -> int:
+        """
+        移除已删除文件的条目，并压缩矩阵文件
+
+        Returns:
+            移除的条目数
+        """
+        with self._lock:
+            if self._conn is None:
+                self._open()
+            return self._prune()
+
+    def _prune(self) -> int:
+        stale = [path for path in self._index if not os.path.exists(path)]
+        for path in stale:
+            del self._index[path]
+        self._conn.executemany(  # type: ignore
+            "DELETE FROM items WHERE path = ?", ((path,) for path in stale)
+        )
+        # 矩阵中不再被引用的行 (已删除的条目或未提交的写入)
+        if self._dim and self._rows > len(self._index):
+            self._compact()
+
+        self._set_meta("pruned_at", str(time.time()))
+        self._conn.commit()  # type: ignore
+        if stale:
+            logger.info(f"已清理 {len(stale)} 条失效的封面特征缓存")
+        return len(stale)
+
+    def _compact(self):
+        """按原顺序重写仍被引用的行，行号随之更新"""
+        # 替换文件前先释放 mmap
+        self._matrix = None
+        row_bytes = self._dim * _DTYPE.itemsize  # type: ignore
+        items = sorted(self._index.items(), key=lambda kv: kv[1][2])
+        temp_path = self.matrix_path.with_name(f"{MATRIX_FILENAME}.tmp")
+        with open(self.matrix_path, "rb") as src, open(temp_path, "wb") as dst:
+            for _, (_, _, row) in items:
+                src.seek(row * row_bytes)
+                dst.write(src.read(row_bytes))
+        os.replace(temp_path, self.matrix_path)
+
+        self._index = {
+            path: (size, mtime_ns, new_row)
+            for new_row, (path, (size, mtime_ns, _)) in enumerate(items)
+        }
+        self._conn.executemany(  # type: ignore
+            "UPDATE items SET row = ? WHERE path = ?",
+            ((entry[2], path) for path, entry in self._index.items()),
+        )
+        self._rows = len(items)
+
+    def _remap(self):
+        if not self._dim or not self._rows:
+            return
+        self._matrix = np.memmap(
+            self.matrix_path, dtype=_DTYPE, mode="r", shape=(self._rows, self._dim)
+        )
+
+    def _reset(self):
+        # 截断文件前先释放 mmap
+        self._matrix = None
+        self.matrix_path.write_bytes(b"")
+        self._conn.execute("DELETE FROM items")  # type: ignore
+        self._conn.execute("DELETE FROM meta WHERE key = 'dim'")  # type: ignore
+        self._index = {}
+        self._dim = None
+        self._rows = 0
+
+    def _meta(self, key: str) -> str | None:
+        row = self._conn.execute(  # type: ignore
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute(  # type: ignore
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
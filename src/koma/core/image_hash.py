@@ -0,0 +1,42 @@
+import cv2
+import numpy as np
+
+# 先按步长抽样到该边长附近，再做区域平均缩放
+_SAMPLE_SIZE = 256
+
+# 缩略图灰度标准差低于该值视为近乎纯色 (空白页等)，不计算哈希
+MIN_HASH_CONTRAST = 8.0
+
+
+def _thumbnail(img: np.ndarray, size: int) -> np.ndarray:
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = img.shape[:2]
+    step_y = max(1, h // _SAMPLE_SIZE)
+    step_x = max(1, w // _SAMPLE_SIZE)
+    sample = img[::step_y, ::step_x]
+    return cv2.resize(sample, (size, size), interpolation=cv2.INTER_AREA)
+
+
+def phash(img: np.ndarray) -> int | None:
+    """
+    64 位感知哈希 (DCT 低频分量与中位数比较)
+
+    Args:
+        img: 灰度或 BGR 图像，任意尺寸
+
+    Returns:
+        哈希值；近乎纯色的图片区分度不足，返回 None
+    """
+    thumb = _thumbnail(img, 32).astype(np.float32)
+    if float(thumb.std()) < MIN_HASH_CONTRAST:
+        return None
+
+    low = cv2.dct(thumb)[:8, :8].flatten()
+    # 直流分量不参与中位数计算
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
@@ -0,0 +1,128 @@
+import mmap
+import struct
+from typing import NamedTuple
+
+# 头部解析最多扫描的字节数 (JPEG 的 EXIF/ICC 段可能较大)
+PROBE_LIMIT = 1024 * 1024
+
+# JPEG 帧起始标记 (排除 DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = frozenset(
+    {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+)
+_JPEG_SOS = 0xDA
+
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+# PNG 颜色类型：0 灰度，4 灰度 + 透明
+_PNG_GRAY_TYPES = (0, 4)
+
+_WEBP_ANIMATION_FLAG = 0x02
+
+_JXL_CODESTREAM = b"\xff\x0a"
+_JXL_CONTAINER = b"\x00\x00\x00\x0cJXL \r\n\x87\n"
+
+type Buffer = bytes | mmap.mmap | memoryview
+
+
+class HeaderInfo(NamedTuple):
+    """文件头解析结果，None 表示仅凭文件头无法确定"""
+
+    format: str | None = None
+    is_animated: bool | None = None
+    is_grayscale: bool | None = None
+
+
+def probe_header(buf: Buffer) -> HeaderInfo:
+    """
+    仅根据文件头判断图片格式、是否动图、是否灰度
+
+    只有 GIF、APNG、WebP、AVIF、JXL 可能是动图；单通道 JPEG
+    以及颜色类型为灰度的 PNG 必然是灰度图。其余情况交给解码器判断。
+    """
+    try:
+        if buf[:3] == b"\xff\xd8\xff":
+            return HeaderInfo("jpeg", False, _probe_jpeg_gray(buf))
+        if buf[:8] == _PNG_MAGIC:
+            return _probe_png(buf)
+        if buf[:4] == b"RIFF" and buf[8:12] == b"WEBP":
+            return HeaderInfo("webp", _probe_webp_animated(buf))
+        if buf[:6] in (b"GIF87a", b"GIF89a"):
+            return HeaderInfo("gif")
+        if buf[4:8] == b"ftyp":
+            return _probe_isobmff(buf)
+        if buf[:2] == _JXL_CODESTREAM or buf[:12] == _JXL_CONTAINER:
+            return HeaderInfo("jxl")
+        if buf[:2] == b"BM":
+            return HeaderInfo("bmp", False)
+        if buf[:4] in (b"II*\x00", b"MM\x00*"):
+            return HeaderInfo("tiff", False)
+    except (IndexError, struct.error):
+        pass
+    return HeaderInfo()
+
+
+def _probe_jpeg_gray(buf: Buffer) -> bool | None:
+    """读取 SOF 段的分量数，单分量即灰度"""
+    limit = min(len(buf), PROBE_LIMIT)
+    pos = 2
+    while pos + 4 <= limit:
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        # 填充字节及无长度的标记
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            pos += 2
+            continue
+
+        if marker in _JPEG_SOF_MARKERS:
+            # FF Cn | 长度(2) | 精度(1) | 高(2) | 宽(2) | 分量数(1)
+            return True if buf[pos + 9] == 1 else None
+        if marker == _JPEG_SOS:
+            return None
+
+        (length,) = struct.unpack(">H", buf[pos + 2 : pos + 4])
+        pos += 2 + length
+    return None
+
+
+def _probe_png(buf: Buffer) -> HeaderInfo:
+    """读取 IHDR 颜色类型，并在 IDAT 之前查找 acTL (APNG)"""
+    limit = min(len(buf), PROBE_LIMIT)
+    is_grayscale = None
+    pos = len(_PNG_MAGIC)
+    while pos + 8 <= limit:
+        length, chunk_type = struct.unpack(">I4s", buf[pos : pos + 8])
+        data = pos + 8
+        if chunk_type == b"IHDR":
+            # 宽(4) | 高(4) | 位深(1) | 颜色类型(1)
+            is_grayscale = True if buf[data + 9] in _PNG_GRAY_TYPES else None
+        elif chunk_type == b"acTL":
+            (num_frames,) = struct.unpack(">I", buf[data : data + 4])
+            return HeaderInfo("png", num_frames > 1, is_grayscale)
+        elif chunk_type == b"IDAT":
+            return HeaderInfo("png", False, is_grayscale)
+        pos = data + length + 4
+    return HeaderInfo("png", None, is_grayscale)
+
+
+def _probe_webp_animated(buf: Buffer) -> bool | None:
+    chunk = buf[12:16]
+    if chunk in (b"VP8 ", b"VP8L"):
+        return False
+    if chunk == b"VP8X":
+        # VP8X 标志位中的动画位未设置时必然是静态图
+        return None if buf[20] & _WEBP_ANIMATION_FLAG else False
+    return None
+
+
+def _probe_isobmff(buf: Buffer) -> HeaderInfo:
+    """AVIF/HEIF：ftyp 中声明了图像序列品牌 (avis/msf1) 时才可能是动图"""
+    (size,) = struct.unpack(">I", buf[:4])
+    ftyp = bytes(buf[8 : min(size, 256)])
+    brands = {ftyp[i : i + 4] for i in range(0, len(ftyp) - 3, 4)}
+    fmt = "avif" if b"avif" in brands or b"avis" in brands else "heif"
+    if brands & {b"avis", b"msf1", b"hevs"}:
+        return HeaderInfo(fmt)
+    return HeaderInfo(fmt, False)
@@ -1,156 +1,447 @@
+import functools
+import io
 import logging
+import mmap
+import os
+import sys
+import threading
+from collections.abc import Callable
 from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO
 
 import cv2
 import numpy as np
 from PIL import Image
 
 from koma.config import ScannerConfig
+from koma.core.ad_blocklist import AdBlocklist
+from koma.core.image_hash import phash
+from koma.core.image_header import probe_header
+from koma.core.qr_cache import (
+    QrVerdictCache,
+    full_hash_of_data,
+    quick_key_of_data,
+    quick_key_of_file,
+)
+from koma.core.qr_prefilter import QrPrefilter, QrPrefilterStats
 
 logger = logging.getLogger(__name__)
 
+# 超过该大小的图片通过 mmap 读取，避免整块复制到内存
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# 灰度判断的采样边长
+GRAY_THUMB_SIZE = 64
+# 非 JPEG 图片先按步长抽样到该边长附近，再做区域平均缩放
+GRAY_SAMPLE_SIZE = GRAY_THUMB_SIZE * 4
+
 
 @dataclass
 class ImageInfo:
     is_animated: bool = False
     is_grayscale: bool = False
+    has_ad: bool = False
 
 
 class ImageProcessor:
-    def __init__(self, config: ScannerConfig):
+    def __init__(
+        self,
+        config: ScannerConfig,
+        verdict_cache: QrVerdictCache | None = None,
+        ad_blocklist: AdBlocklist | None = None,
+    ):
+        """
+        Args:
+            config: 扫描配置
+            verdict_cache: 二维码检测缓存，相同内容的图片不再重复解码
+            ad_blocklist: 已知广告页的感知哈希库，命中时跳过二维码解码
+        """
         self.config = config
+        self.verdict_cache = verdict_cache
+        self.ad_blocklist = ad_blocklist
+        self.qr_prefilter = QrPrefilter(audit=config.qr_prefilter_audit)
 
-        self._qr_detector = None
-        self._qr_engine_type = None
+        # 二维码检测器不是线程安全的，每个线程各持有一个
+        self._local = threading.local()
 
-    def analyze(self, file_path: Path) -> ImageInfo:
-        """综合分析图片属性，判断是否为动图和灰度图"""
-        try:
-            is_anim = self._check_is_animated(file_path)
-            if is_anim:
-                return ImageInfo(is_animated=True, is_grayscale=False)
+    @property
+    def _qr_detector(self):
+        return getattr(self._local, "detector", None)
+
+    @_qr_detector.setter
+    def _qr_detector(self, value):
+        self._local.detector = value
 
-            is_gray = self._check_is_grayscale(file_path)
+    @property
+    def _qr_engine_type(self) -> str | None:
+        return getattr(self._local, "engine_type", None)
 
-            return ImageInfo(is_animated=False, is_grayscale=is_gray)
+    @_qr_engine_type.setter
+    def _qr_engine_type(self, value: str | None):
+        self._local.engine_type = value
 
+    def inspect(self, file_path: Path, check_ad: bool = False) -> ImageInfo:
+        """
+        综合分析图片：只读取、解码一次，同时得到动图、灰度及广告二维码结果
+
+        Args:
+            file_path: 图片路径
+            check_ad: 是否同时检测广告二维码 (动图不检测)
+        """
+        try:
+            buf = self._read_bytes(file_path)
+            return self._inspect(
+                buf, file_path.name, check_ad, lambda: quick_key_of_file(file_path)
+            )
         except Exception as e:
             logger.debug(f"图片分析异常 {file_path.name}: {e}")
             return ImageInfo()
 
+    def inspect_data(
+        self, data: bytes, name: str = "", check_ad: bool = False
+    ) -> ImageInfo:
+        """同 inspect，分析内存中的图片 (如压缩包成员)"""
+        try:
+            return self._inspect(data, name, check_ad, lambda: quick_key_of_data(data))
+        except Exception as e:
+            logger.debug(f"图片分析异常 {name}: {e}")
+            return ImageInfo()
+
+    def analyze(self, file_path: Path) -> ImageInfo:
+        """综合分析图片属性，判断是否为动图和灰度图"""
+        return self.inspect(file_path)
+
+    def analyze_data(self, data: bytes, name: str = "") -> ImageInfo:
+        """同 analyze，分析内存中的图片 (如压缩包成员)"""
+        return self.inspect_data(data, name)
+
+    def _inspect(
+        self,
+        buf: bytes | mmap.mmap,
+        name: str,
+        check_ad: bool,
+        quick_key: Callable[[], str],
+    ) -> ImageInfo:
+        # 文件头能确定的属性不再打开解码器
+        header = probe_header(buf)
+
+        is_animated = header.is_animated
+        if is_animated is None:
+            source = buf if isinstance(buf, mmap.mmap) else io.BytesIO(buf)
+            is_animated = self._check_is_animated(source)
+        if is_animated:
+            return ImageInfo(is_animated=True)
+
+        detect_ad = check_ad and self.config.enable_ad_scan
+        is_grayscale = header.is_grayscale
+        img_array = np.frombuffer(buf, dtype=np.uint8)
+
+        blocklist = self._active_blocklist() if detect_ad else None
+
+        if header.format == "jpeg":
+            small = None
+            if is_grayscale is None or blocklist is not None:
+                # JPEG 可在 DCT 阶段直接按 1/8 解码，灰度判断无需完整解码
+                small = cv2.imdecode(img_array, cv2.IMREAD_REDUCED_COLOR_8)
+                if small is None:
+                    return ImageInfo()
+            if is_grayscale is None:
+                is_grayscale = self._is_grayscale(small)  # type: ignore
+
+            info = ImageInfo(is_grayscale=is_grayscale)
+            if detect_ad:
+                # 二维码检测仅在缓存未命中时按原分辨率解码灰度图
+                info.has_ad = self._detect_ad(img_array, quick_key, name, small)
+            return info
+
+        if is_grayscale is not None and not detect_ad:
+            return ImageInfo(is_grayscale=is_grayscale)
+
+        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        if img is None:
+            return ImageInfo()
+
+        if is_grayscale is None:
+            is_grayscale = self._is_grayscale(img)
+
+        info = ImageInfo(is_grayscale=is_grayscale)
+        if detect_ad:
+            # 复用已解码的彩色图，二维码检测不再重复解码
+            info.has_ad = self._detect_ad(
+                img_array,
+                quick_key,
+                name,
+                img,
+                gray=lambda: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY),
+            )
+        return info
+
+    def _active_blocklist(self) -> AdBlocklist | None:
+        if self.ad_blocklist is None or not self.config.enable_ad_blocklist:
+            return None
+        return self.ad_blocklist
+
+    def _detect_ad(
+        self,
+        img_array: np.ndarray,
+        quick_key: Callable[[], str],
+        name: str,
+        thumb: np.ndarray | None,
+        gray: Callable[[], np.ndarray] | None = None,
+    ) -> bool:
+        """先查已知广告页的感知哈希，未命中再解码二维码；确认的广告自动加入图库"""
+        blocklist = self._active_blocklist()
+        page_hash = None
+        if blocklist is not None and thumb is not None:
+            page_hash = phash(thumb)
+
+        if page_hash is not None:
+            for urls in blocklist.match(page_hash):  # type: ignore
+                if self._find_ad_url(urls) is not None:
+                    logger.info(f"🚫 命中已知广告页: {name}")
+                    return True
+
+        urls = self._qr_urls(lambda: img_array, quick_key, gray)
+        if not urls or not self._match_ad_urls(urls, name):
+            return False
+
+        if page_hash is not None:
+            blocklist.add(page_hash, urls, name)  # type: ignore
+        return True
+
+    def _read_bytes(self, file_path: Path) -> bytes | mmap.mmap:
+        """读取图片数据，大文件使用只读 mmap"""
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < MMAP_THRESHOLD:
+                return f.read()
+            # 关闭文件后映射依然有效，随引用释放
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
     def has_ad_qrcode(self, file_path: Path) -> bool:
         """检测是否包含广告二维码"""
         if not self.config.enable_ad_scan:
             return False
 
         try:
-            img_array = np.fromfile(str(file_path), dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_GRAYSCALE)
-
-            if img is None:
-                return False
-
-            detector = self._get_qr_detector()
-            found_urls = []
-
-            if self._qr_engine_type == "WECHAT":
-                try:
-                    res, *_ = detector.detectAndDecode(img)
-                    found_urls = res
-                except Exception:
-                    pass
-            else:
-                # 标准库回退
-                res, *_ = detector.detectAndDecode(img)
-                if res:
-                    found_urls = [res]
-
-            if not found_urls:
-                return False
-
-            for url in found_urls:
-                if not url:
-                    continue
-                url_lower = url.lower()
-
-                # 只要发现一个不在白名单里的，就判定为广告
-                is_safe = False
-                for safe_domain in self.config.qr_whitelist:
-                    if safe_domain in url_lower:
-                        is_safe = True
-                        break
-
-                if not is_safe:
-                    logger.info(f"🚫 发现广告二维码: {url[:30]}... 在 {file_path.name}")
-                    return True
+            return self._has_ad_qrcode(
+                lambda: np.fromfile(str(file_path), dtype=np.uint8),
+                lambda: quick_key_of_file(file_path),
+                file_path.name,
+            )
+        except Exception as e:
+            logger.debug(f"二维码检测出错 {file_path.name}: {e}")
+            return False
 
+    def has_ad_qrcode_data(self, data: bytes, name: str = "") -> bool:
+        """同 has_ad_qrcode，检测内存中的图片"""
+        if not self.config.enable_ad_scan:
             return False
 
+        try:
+            return self._has_ad_qrcode(
+                lambda: np.frombuffer(data, dtype=np.uint8),
+                lambda: quick_key_of_data(data),
+                name,
+            )
         except Exception as e:
-            logger.debug(f"二维码检测出错 {file_path.name}: {e}")
+            logger.debug(f"二维码检测出错 {name}: {e}")
             return False
 
-    def _check_is_animated(self, file_path: Path) -> bool:
-        try:
-            with Image.open(file_path) as img:
-                return getattr(img, "is_animated", False)
-        except Exception:
+    def _has_ad_qrcode(
+        self,
+        load: Callable[[], np.ndarray],
+        quick_key: Callable[[], str],
+        name: str,
+    ) -> bool:
+        return self._match_ad_urls(self._qr_urls(load, quick_key) or [], name)
+
+    def _qr_urls(
+        self,
+        load: Callable[[], np.ndarray],
+        quick_key: Callable[[], str],
+        gray: Callable[[], np.ndarray] | None = None,
+    ) -> list[str] | None:
+        """解码二维码链接 (优先读取检测缓存)，图片无法解码时返回 None"""
+        cache = self.verdict_cache if self.config.enable_qr_cache else None
+        loaded: list[np.ndarray] = []
+
+        def data() -> np.ndarray:
+            if not loaded:
+                loaded.append(load())
+            return loaded[0]
+
+        key = None
+        if cache is not None:
+            key = quick_key()
+            urls = cache.lookup(key, lambda: full_hash_of_data(data()))
+            if urls is not None:
+                return urls
+
+        if gray is not None:
+            result = self._detect_qr(gray())
+        else:
+            result = self._decode_qr(data())
+        if result is None:
+            return None
+
+        # 只缓存完整检测器的结论，预筛拒绝或回退检测器的结果不可靠
+        urls, conclusive = result
+        if conclusive and cache is not None and key is not None:
+            cache.store(key, full_hash_of_data(data()), urls)
+
+        return urls
+
+    def _decode_qr(self, img_array: np.ndarray) -> tuple[list[str], bool] | None:
+        """解码图片中的全部二维码，图片无法解码时返回 None"""
+        img = cv2.imdecode(img_array, cv2.IMREAD_GRAYSCALE)
+
+        if img is None:
+            return None
+
+        return self._detect_qr(img)
+
+    @property
+    def qr_stats(self) -> QrPrefilterStats:
+        """二维码预筛各阶段计数"""
+        return self.qr_prefilter.stats
+
+    def reset_qr_stats(self):
+        """清零预筛统计，并按当前配置切换审计模式"""
+        self.qr_prefilter.audit = self.config.qr_prefilter_audit
+        self.qr_prefilter.reset_stats()
+
+    def _detect_qr_urls(self, img: np.ndarray) -> list[str]:
+        return self._detect_qr(img)[0]
+
+    def _detect_qr(self, img: np.ndarray) -> tuple[list[str], bool]:
+        """
+        检测二维码链接
+
+        Returns:
+            (链接列表, 是否为微信检测器对整张图的结论)
+        """
+        detector = self._get_qr_detector()
+        found_urls = []
+        conclusive = False
+
+        if self._qr_engine_type == "WECHAT":
+            # 先用轮廓预筛，只有候选图片才交给微信 CNN 检测器
+            prefilter = self.qr_prefilter if self.config.enable_qr_prefilter else None
+            candidate = True
+            if prefilter is not None:
+                candidate = prefilter.is_candidate(img)
+                if not candidate and not prefilter.audit:
+                    return [], False
+
+            try:
+                res, *_ = detector.detectAndDecode(img)
+                found_urls = res
+                conclusive = True
+            except Exception:
+                pass
+
+            if prefilter is not None:
+                prefilter.record_detection(candidate, any(found_urls))
+                if not candidate:
+                    return [], False
+        else:
+            # 标准库回退
+            res, *_ = detector.detectAndDecode(img)
+            if res:
+                found_urls = [res]
+
+        return [url for url in found_urls if url], conclusive
+
+    def _match_ad_urls(self, urls: list[str], name: str) -> bool:
+        """按当前白名单判断链接中是否有广告"""
+        url = self._find_ad_url(urls)
+        if url is None:
             return False
 
-    def _check_is_grayscale(self, file_path: Path) -> bool:
-        try:
-            img_array = np.fromfile(str(file_path), dtype=np.uint8)
-            img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+        logger.info(f"🚫 发现广告二维码: {url[:30]}... 在 {name}")
+        return True
+
+    def _find_ad_url(self, urls: list[str]) -> str | None:
+        for url in urls:
+            url_lower = url.lower()
 
-            if img is None:
-                return False
+            # 只要发现一个不在白名单里的，就判定为广告
+            is_safe = False
+            for safe_domain in self.config.qr_whitelist:
+                if safe_domain in url_lower:
+                    is_safe = True
+                    break
 
-            thumb = cv2.resize(img, (64, 64), interpolation=cv2.INTER_AREA)
-            hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+            if not is_safe:
+                return url
 
-            return bool(np.mean(hsv[:, :, 1]) < 5.0)
+        return None
+
+    def _check_is_animated(self, source: Path | BinaryIO) -> bool:
+        try:
+            with Image.open(source) as img:
+                return getattr(img, "is_animated", False)
         except Exception:
             return False
 
+    def _is_grayscale(self, img: np.ndarray) -> bool:
+        # 大图先按步长抽样，避免对整张图做区域平均
+        h, w = img.shape[:2]
+        step_y = max(1, h // GRAY_SAMPLE_SIZE)
+        step_x = max(1, w // GRAY_SAMPLE_SIZE)
+        sample = img[::step_y, ::step_x]
+
+        thumb = cv2.resize(
+            sample, (GRAY_THUMB_SIZE, GRAY_THUMB_SIZE), interpolation=cv2.INTER_AREA
+        )
+        hsv = cv2.cvtColor(thumb, cv2.COLOR_BGR2HSV)
+
+        return bool(np.mean(hsv[:, :, 1]) < 5.0)
+
     def _get_qr_detector(self):
-        """加载二维码模型"""
+        """按线程懒加载二维码模型"""
         if self._qr_detector is not None:
             return self._qr_detector
 
-        try:
-            import sys
-
-            if getattr(sys, "frozen", False):
-                base_path = Path(sys._MEIPASS) / "koma"  # type: ignore
-            else:
-                base_path = Path(__file__).parent.parent
-
-            model_dir = base_path / "resources" / "wechat_qrcode"
-
-            files = [
-                "detect.prototxt",
-                "detect.caffemodel",
-                "sr.prototxt",
-                "sr.caffemodel",
-            ]
-            if all((model_dir / f).exists() for f in files):
-                self._qr_detector = cv2.wechat_qrcode_WeChatQRCode(  # type: ignore
-                    str(model_dir / "detect.prototxt"),
-                    str(model_dir / "detect.caffemodel"),
-                    str(model_dir / "sr.prototxt"),
-                    str(model_dir / "sr.caffemodel"),
-                )
+        model_files = _wechat_model_files()
+        if model_files is not None:
+            try:
+                self._qr_detector = cv2.wechat_qrcode_WeChatQRCode(*model_files)  # type: ignore
                 self._qr_engine_type = "WECHAT"
                 logger.debug("✅ 微信二维码引擎加载成功")
                 return self._qr_detector
-            else:
-                logger.warning(f"⚠️ 微信模型文件缺失: {model_dir}")
-
-        except Exception as e:
-            logger.warning(f"⚠️ 微信模型加载异常: {e}")
+            except Exception as e:
+                logger.warning(f"⚠️ 微信模型加载异常: {e}")
 
         logger.info("🔄 回退使用标准 OpenCV QRCodeDetector")
         self._qr_detector = cv2.QRCodeDetector()
         self._qr_engine_type = "STANDARD"
         return self._qr_detector
+
+
+@functools.cache
+def _wechat_model_files() -> tuple[str, ...] | None:
+    """定位微信二维码模型文件，结果在进程内缓存，各线程只需构造检测器"""
+    try:
+        if getattr(sys, "frozen", False):
+            base_path = Path(sys._MEIPASS) / "koma"  # type: ignore
+        else:
+            base_path = Path(__file__).parent.parent
+
+        model_dir = base_path / "resources" / "wechat_qrcode"
+
+        files = [
+            "detect.prototxt",
+            "detect.caffemodel",
+            "sr.prototxt",
+            "sr.caffemodel",
+        ]
+        if all((model_dir / f).exists() for f in files):
+            return tuple(str(model_dir / f) for f in files)
+
+        logger.warning(f"⚠️ 微信模型文件缺失: {model_dir}")
+    except Exception as e:
+        logger.warning(f"⚠️ 微信模型加载异常: {e}")
+    return None
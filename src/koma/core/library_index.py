@@ -0,0 +1,408 @@
+import os
+import platform
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from koma.config import get_user_config_dir
+from koma.core.clustering import HammingIndex
+
+INDEX_FILENAME = "library_index.db"
+
+# 导出的指纹文件格式版本
+EXPORT_FORMAT = "1"
+
+# IN 查询每批的参数数量 (SQLite 默认上限 999)
+_QUERY_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    path TEXT PRIMARY KEY,
+    is_archive INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    name_key TEXT NOT NULL,
+    phash INTEGER,
+    signature BLOB
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS items_name_key ON items (name_key);
+CREATE INDEX IF NOT EXISTS items_signature ON items (signature);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS remote_items (
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,
+    is_archive INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    name_key TEXT NOT NULL,
+    phash INTEGER,
+    signature BLOB,
+    PRIMARY KEY (collection, path)
+) WITHOUT ROWID;
+"""
+
+# 指纹文件：与 remote_items 结构相同，本机条目以导出时的书库名称记录
+_EXPORT_SCHEMA = """
+CREATE TABLE export.meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE export.items (
+    collection TEXT NOT NULL,
+    path TEXT NOT NULL,
+    is_archive INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    name_key TEXT NOT NULL,
+    phash INTEGER,
+    signature BLOB,
+    PRIMARY KEY (collection, path)
+) WITHOUT ROWID;
+"""
+
+_COLUMNS = "path, is_archive, size, mtime_ns, name_key, phash, signature"
+
+
+class LibraryEntry(NamedTuple):
+    path: str
+    is_archive: bool
+    size: int
+    mtime_ns: int
+    # 归一化的文件名键
+    name_key: str
+    # 封面 64 位感知哈希
+    phash: int | None = None
+    # zip/cbz 中央目录的内容摘要
+    signature: bytes | None = None
+    # 导入的其他书库名称，本机条目为空
+    collection: str = ""
+
+
+def _to_signed(value: int | None) -> int | None:
+    """SQLite 整数为有符号 64 位"""
+    if value is None or value < 1 << 63:
+        return value
+    return value - (1 << 64)
+
+
+def _entry(row: tuple, collection: str = "") -> LibraryEntry:
+    path, is_archive, size, mtime_ns, name_key, phash, signature = row
+    if phash is not None:
+        phash &= (1 << 64) - 1
+    return LibraryEntry(
+        path, bool(is_archive), size, mtime_ns, name_key, phash, signature, collection
+    )
+
+
+class LibraryIndex:
+    """
+    书库指纹索引
+
+    保存书库中每个条目的文件名键、封面感知哈希与 zip 目录摘要，
+    按 路径 + 大小 + 修改时间 增量更新。查重新增内容时只需计算新增条目的指纹，
+    再到索引中查询。
+
+    指纹可导出为单个文件，在其他电脑导入合并后与本机书库比对，无需重新扫描。
+    """
+
+    def __init__(self, db_path: Path | None = None, collection: str = ""):
+        """
+        初始化书库索引
+
+        Args:
+            db_path: 数据库路径，默认位于用户配置目录
+            collection: 本机书库名称，仅在新建索引时记录，默认为计算机名
+        """
+        self.db_path = (
+            Path(db_path) if db_path else get_user_config_dir() / INDEX_FILENAME
+        )
+        self.collection = collection or platform.node()
+        self._conn: sqlite3.Connection | None = None
+        # 感知哈希的多索引哈希表常驻内存 (首次查询时构建)，写入后失效
+        self._phash_index: HammingIndex | None = None
+        self._phash_paths: list[str] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "LibraryIndex":
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        # 导入时据此跳过本机书库的条目，无需先导出过
+        if self._meta("collection") is None:
+            self._set_meta("collection", self.collection)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+                self._conn = None
+                self._phash_index = None
+
+    def stamps(self, root: Path) -> dict[str, tuple[int, int]]:
+        """目录 (含自身) 下已索引条目的 路径 -> (大小, 修改时间)"""
+        root_str = str(root)
+        prefix = os.path.join(root_str, "")
+        with self._lock:
+            self._open()
+            rows = self._conn.execute(  # type: ignore
+                "SELECT path, size, mtime_ns FROM items "
+                "WHERE path = ? OR (path >= ? AND path < ?)",
+                (root_str, prefix, prefix + "\U0010ffff"),
+            )
+            return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def put_many(self, entries: Iterable[LibraryEntry]):
+        with self._lock:
+            self._open()
+            self._conn.executemany(  # type: ignore
+                f"INSERT OR REPLACE INTO items ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (e._replace(phash=_to_signed(e.phash))[:7] for e in entries),
+            )
+            self._conn.commit()  # type: ignore
+            self._phash_index = None
+
+    def remove_many(self, paths: Iterable[str]):
+        with self._lock:
+            self._open()
+            self._conn.executemany(  # type: ignore
+                "DELETE FROM items WHERE path = ?", ((p,) for p in paths)
+            )
+            self._conn.commit()  # type: ignore
+            self._phash_index = None
+
+    def find_by_name(self, keys: Iterable[str]) -> list[LibraryEntry]:
+        return self._find("name_key", list(set(keys)))
+
+    def find_by_signature(self, signatures: Iterable[bytes]) -> list[LibraryEntry]:
+        return self._find("signature", list(set(signatures)))
+
+    def find_near_phash(
+        self, hashes: Sequence[int], max_distance: int
+    ) -> list[tuple[int, LibraryEntry]]:
+        """
+        封面哈希距离不超过阈值的条目
+
+        Args:
+            hashes: 待查询的封面哈希
+            max_distance: 最大汉明距离
+
+        Returns:
+            (查询下标, 条目) 列表
+        """
+        with self._lock:
+            self._open()
+            if self._phash_index is None:
+                rows = self._conn.execute(  # type: ignore
+                    "SELECT path, phash FROM items WHERE phash IS NOT NULL"
+                ).fetchall()
+                self._phash_paths = [path for path, _ in rows]
+                self._phash_index = HammingIndex(
+                    np.array([h for _, h in rows], dtype=np.int64).view(np.uint64)
+                )
+            queries = np.array(hashes, dtype=np.uint64)
+            pairs = self._phash_index.query(queries, max_distance).tolist()
+            matches = [(q, self._phash_paths[i]) for q, i in pairs]
+
+        entries = {e.path: e for e in self._find("path", list({p for _, p in matches}))}
+        return [(q, entries[path]) for q, path in matches if path in entries]
+
+    def entries(self) -> list[LibraryEntry]:
+        """本机及导入的全部条目"""
+        with self._lock:
+            self._open()
+            local = self._conn.execute(f"SELECT {_COLUMNS} FROM items")  # type: ignore
+            entries = [_entry(row) for row in local]
+            remote = self._conn.execute(  # type: ignore
+                f"SELECT collection, {_COLUMNS} FROM remote_items"
+            )
+            entries.extend(_entry(row[1:], row[0]) for row in remote)
+            return entries
+
+    def collections(self) -> dict[str, int]:
+        """导入的书库名称 -> 条目数"""
+        with self._lock:
+            self._open()
+            rows = self._conn.execute(  # type: ignore
+                "SELECT collection, COUNT(*) FROM remote_items GROUP BY collection"
+            )
+            return dict(rows)
+
+    def export(self, path: Path, collection: str) -> int:
+        """
+        导出本机及已导入的指纹到单个文件
+
+        Args:
+            path: 导出文件路径，已存在时覆盖
+            collection: 本机书库名称
+
+        Returns:
+            导出的条目数
+        """
+        path = Path(path)
+        with self._lock:
+            self._open()
+            path.unlink(missing_ok=True)
+            self._conn.commit()  # type: ignore
+            self._conn.execute("ATTACH DATABASE ? AS export", (str(path),))  # type: ignore
+            try:
+                self._conn.executescript(_EXPORT_SCHEMA)  # type: ignore
+                self._conn.executemany(  # type: ignore
+                    "INSERT INTO export.meta (key, value) VALUES (?, ?)",
+                    [
+                        ("format", EXPORT_FORMAT),
+                        ("collection", collection),
+                        ("exported_at", str(time.time())),
+                    ],
+                )
+                self._conn.execute(  # type: ignore
+                    f"INSERT INTO export.items SELECT ?, {_COLUMNS} FROM main.items",
+                    (collection,),
+                )
+                self._conn.execute(  # type: ignore
+                    "INSERT OR IGNORE INTO export.items "
+                    f"SELECT collection, {_COLUMNS} FROM main.remote_items "
+                    "WHERE collection != ?",
+                    (collection,),
+                )
+                self._set_meta("collection", collection)
+                self._conn.commit()  # type: ignore
+                return self._conn.execute(  # type: ignore
+                    "SELECT COUNT(*) FROM export.items"
+                ).fetchone()[0]
+            finally:
+                # 出错时先回滚，否则无法分离
+                self._conn.rollback()  # type: ignore
+                self._conn.execute("DETACH DATABASE export")  # type: ignore
+
+    def import_file(self, path: Path) -> dict[str, int]:
+        """
+        导入其他电脑导出的指纹文件
+
+        文件中的每个书库整体替换此前导入的同名书库，本机书库的条目被跳过。
+
+        Returns:
+            导入的书库名称 -> 条目数
+        """
+        path = Path(path)
+        if not path.is_file():
+            # ATTACH 会为不存在的路径新建空数据库
+            raise FileNotFoundError(f"指纹文件不存在: {path}")
+
+        with self._lock:
+            self._open()
+            self._conn.commit()  # type: ignore
+            try:
+                self._conn.execute("ATTACH DATABASE ? AS src", (str(path),))  # type: ignore
+                fmt = self._conn.execute(  # type: ignore
+                    "SELECT value FROM src.meta WHERE key = 'format'"
+                ).fetchone()
+            except sqlite3.DatabaseError as e:
+                if self._attached("src"):
+                    self._conn.execute("DETACH DATABASE src")  # type: ignore
+                raise ValueError(f"不是有效的指纹文件: {e}") from e
+
+            try:
+                if fmt is None or fmt[0] != EXPORT_FORMAT:
+                    raise ValueError("不支持的指纹文件格式")
+
+                local = self._meta("collection") or ""
+                counts = dict(
+                    self._conn.execute(  # type: ignore
+                        "SELECT collection, COUNT(*) FROM src.items "
+                        "WHERE collection != ? GROUP BY collection",
+                        (local,),
+                    ).fetchall()
+                )
+                self._conn.executemany(  # type: ignore
+                    "DELETE FROM remote_items WHERE collection = ?",
+                    ((c,) for c in counts),
+                )
+                self._conn.execute(  # type: ignore
+                    f"INSERT INTO remote_items SELECT collection, {_COLUMNS} "
+                    "FROM src.items WHERE collection != ?",
+                    (local,),
+                )
+                self._conn.commit()  # type: ignore
+                return counts
+            finally:
+                # 出错时先回滚，否则无法分离
+                self._conn.rollback()  # type: ignore
+                self._conn.execute("DETACH DATABASE src")  # type: ignore
+
+    def remove_collection(self, collection: str):
+        """移除导入的书库"""
+        with self._lock:
+            self._open()
+            self._conn.execute(  # type: ignore
+                "DELETE FROM remote_items WHERE collection = ?", (collection,)
+            )
+            self._conn.commit()  # type: ignore
+
+    def count(self) -> int:
+        with self._lock:
+            self._open()
+            return self._conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]  # type: ignore
+
+    def clear(self):
+        """清空书库索引 (含导入的书库)"""
+        with self._lock:
+            self._open()
+            self._conn.execute("DELETE FROM items")  # type: ignore
+            self._conn.execute("DELETE FROM remote_items")  # type: ignore
+            self._conn.commit()  # type: ignore
+            self._phash_index = None
+
+    def _attached(self, schema: str) -> bool:
+        rows = self._conn.execute("PRAGMA database_list").fetchall()  # type: ignore
+        return any(row[1] == schema for row in rows)
+
+    def _meta(self, key: str) -> str | None:
+        row = self._conn.execute(  # type: ignore
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute(  # type: ignore
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _find(self, column: str, values: list) -> list[LibraryEntry]:
+        entries = []
+        with self._lock:
+            self._open()
+            for start in range(0, len(values), _QUERY_CHUNK):
+                chunk = values[start : start + _QUERY_CHUNK]
+                marks = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(  # type: ignore
+                    f"SELECT {_COLUMNS} FROM items WHERE {column} IN ({marks})", chunk
+                )
+                entries.extend(_entry(row) for row in rows)
+        return entries
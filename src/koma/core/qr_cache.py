@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from koma.config import get_user_config_dir
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILENAME = "qr_cache.db"
+
+# 快速指纹读取的首尾块大小
+BLOCK_SIZE = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    quick_key TEXT NOT NULL,
+    full_hash TEXT NOT NULL,
+    urls TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (quick_key, full_hash)
+) WITHOUT ROWID;
+"""
+
+
+def _digest(*chunks: bytes | memoryview) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for chunk in chunks:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def quick_key_of_data(data: bytes | memoryview) -> str:
+    """快速指纹：大小 + 首尾块哈希"""
+    size = len(data)
+    if size <= BLOCK_SIZE * 2:
+        return f"{size}:{_digest(data)}"
+    return f"{size}:{_digest(data[:BLOCK_SIZE], data[-BLOCK_SIZE:])}"
+
+
+def quick_key_of_file(file_path: Path) -> str:
+    """同 quick_key_of_data，只读取文件首尾块"""
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= BLOCK_SIZE * 2:
+            return f"{size}:{_digest(f.read())}"
+        head = f.read(BLOCK_SIZE)
+        f.seek(-BLOCK_SIZE, os.SEEK_END)
+        return f"{size}:{_digest(head, f.read(BLOCK_SIZE))}"
+
+
+def full_hash_of_data(data: bytes | memoryview) -> str:
+    """完整内容哈希，首尾块已覆盖全部内容时为空"""
+    if len(data) <= BLOCK_SIZE * 2:
+        return ""
+    return _digest(data)
+
+
+class QrVerdictCache:
+    """
+    二维码检测结果缓存：按图片内容寻址，记录解码出的二维码链接
+
+    只保存链接而非最终判定，白名单在读取时重新计算，修改配置无需清空缓存。
+    """
+
+    def __init__(self, db_path: Path | None = None):
+        """
+        初始化检测缓存
+
+        Args:
+            db_path: 缓存数据库路径，默认位于用户配置目录
+        """
+        self.db_path = (
+            Path(db_path) if db_path else get_user_config_dir() / CACHE_FILENAME
+        )
+        self._conn: sqlite3.Connection | None = None
+        # 广告检测在多个线程中进行，共用一个连接
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "QrVerdictCache":
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            if self._conn is None:
+                return
+            try:
+                self._conn.commit()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def lookup(self, quick_key: str, full_hash: Callable[[], str]) -> list[str] | None:
+        """
+        查询缓存的二维码链接
+
+        快速指纹命中后再用完整哈希确认，避免首尾相同的不同图片误命中。
+
+        Args:
+            quick_key: 快速指纹
+            full_hash: 计算完整哈希的回调，仅在快速指纹命中时调用
+
+        Returns:
+            链接列表 (空列表表示无二维码)，未命中返回 None
+        """
+        with self._lock:
+            self._open()
+            rows = self._conn.execute(  # type: ignore
+                "SELECT full_hash, urls FROM verdicts WHERE quick_key = ?",
+                (quick_key,),
+            ).fetchall()
+        if not rows:
+            return None
+
+        digest = full_hash()
+        for row_hash, urls in rows:
+            if row_hash == digest:
+                return json.loads(urls)
+        return None
+
+    def store(self, quick_key: str, full_hash: str, urls: list[str]):
+        with self._lock:
+            self._open()
+            self._conn.execute(  # type: ignore
+                "INSERT OR REPLACE INTO verdicts "
+                "(quick_key, full_hash, urls, created_at) VALUES (?, ?, ?, ?)",
+                (quick_key, full_hash, json.dumps(urls), time.time()),
+            )
+            self._conn.commit()  # type: ignore
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._open()
+            self._conn.execute("DELETE FROM verdicts")  # type: ignore
+            self._conn.commit()  # type: ignore
+
+    def count(self) -> int:
+        with self._lock:
+            self._open()
+            return self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]  # type: ignore
@@ -0,0 +1,160 @@
+import threading
+from dataclasses import dataclass, fields
+
+import cv2
+import numpy as np
+
+# 预筛时图片缩放到的最长边
+PREFILTER_MAX_SIDE = 1000
+
+# 角落/底部区域占整页的比例 (广告二维码通常在这些位置)
+ROI_RATIO = 0.4
+
+# 至少找到几个定位图案才视为候选
+MIN_FINDER_PATTERNS = 2
+
+# 定位图案的最小面积 (像素)，过滤网点与噪声
+MIN_FINDER_AREA = 36
+
+# 定位图案外框与内芯的面积比 (理论值 49 / 9)
+FINDER_AREA_RATIO = (2.5, 12.0)
+
+
+@dataclass
+class QrPrefilterStats:
+    """各阶段命中/未命中计数"""
+
+    downscale_hits: int = 0
+    roi_hits: int = 0
+    rejected: int = 0
+    detector_hits: int = 0
+    detector_misses: int = 0
+    # 审计模式：被预筛拒绝、但检测器仍然找到二维码的图片数
+    missed: int = 0
+
+    def __str__(self) -> str:
+        candidates = self.downscale_hits + self.roi_hits
+        total = candidates + self.rejected
+        return (
+            f"预筛 {total} 张: 缩略图命中 {self.downscale_hits}, "
+            f"区域命中 {self.roi_hits}, 拒绝 {self.rejected}; "
+            f"检测器命中 {self.detector_hits}, 未命中 {self.detector_misses}, "
+            f"漏检 {self.missed}"
+        )
+
+
+class QrPrefilter:
+    """
+    二维码预筛：在缩略图及角落/底部区域查找定位图案 (回字形)
+
+    只有找到定位图案的图片才交给微信二维码检测器，普通漫画页直接跳过。
+    """
+
+    def __init__(self, audit: bool = False):
+        """
+        Args:
+            audit: 审计模式，被拒绝的图片仍交给检测器，用于统计预筛漏检
+        """
+        self.audit = audit
+        self._stats = QrPrefilterStats()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> QrPrefilterStats:
+        with self._lock:
+            return QrPrefilterStats(
+                **{f.name: getattr(self._stats, f.name) for f in fields(self._stats)}
+            )
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = QrPrefilterStats()
+
+    def is_candidate(self, gray: np.ndarray) -> bool:
+        """判断灰度图是否可能包含二维码"""
+        small, scale = _downscale(gray)
+        if _count_finder_patterns(small) >= MIN_FINDER_PATTERNS:
+            self._count("downscale_hits")
+            return True
+
+        # 缩略图分辨率不足时，在角落/底部区域以更高分辨率再找一次
+        if scale < 1.0:
+            for roi in _regions(gray):
+                roi_small, _ = _downscale(roi)
+                if _count_finder_patterns(roi_small) >= MIN_FINDER_PATTERNS:
+                    self._count("roi_hits")
+                    return True
+
+        self._count("rejected")
+        return False
+
+    def record_detection(self, candidate: bool, found: bool):
+        """记录检测器结果"""
+        if candidate:
+            self._count("detector_hits" if found else "detector_misses")
+        elif found:
+            self._count("missed")
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self._stats, name, getattr(self._stats, name) + 1)
+
+
+def _downscale(gray: np.ndarray) -> tuple[np.ndarray, float]:
+    h, w = gray.shape[:2]
+    scale = min(1.0, PREFILTER_MAX_SIDE / max(h, w))
+    if scale >= 1.0:
+        return gray, 1.0
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA), scale
+
+
+def _regions(gray: np.ndarray) -> list[np.ndarray]:
+    """四个角落以及底部中间区域，底部优先"""
+    h, w = gray.shape[:2]
+    rh, rw = int(h * ROI_RATIO), int(w * ROI_RATIO)
+    cx = (w - rw) // 2
+    return [
+        gray[h - rh :, w - rw :],
+        gray[h - rh :, :rw],
+        gray[h - rh :, cx : cx + rw],
+        gray[:rh, w - rw :],
+        gray[:rh, :rw],
+    ]
+
+
+def _count_finder_patterns(gray: np.ndarray) -> int:
+    """统计三层嵌套、近似正方形的轮廓数量"""
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    contours, hierarchy = cv2.findContours(
+        binary, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE
+    )
+    if hierarchy is None:
+        return 0
+
+    tree = hierarchy[0]
+    count = 0
+    for i, contour in enumerate(contours):
+        child = tree[i][2]
+        if child < 0:
+            continue
+        grandchild = tree[child][2]
+        if grandchild < 0:
+            continue
+
+        outer = cv2.contourArea(contour)
+        inner = cv2.contourArea(contours[grandchild])
+        if outer < MIN_FINDER_AREA or inner <= 0:
+            continue
+        if not FINDER_AREA_RATIO[0] <= outer / inner <= FINDER_AREA_RATIO[1]:
+            continue
+
+        _, _, bw, bh = cv2.boundingRect(contour)
+        if not 0.7 <= bw / bh <= 1.4:
+            continue
+        # 外框应基本填满外接矩形
+        if outer < bw * bh * 0.7:
+            continue
+
+        count += 1
+    return count
@@ -15,6 +15,7 @@ from koma.config import ExtensionsConfig
 from koma.core.archive import ArchiveHandler
 from koma.core.image_processor import ImageProcessor
 from koma.core.scanner import Scanner
+from koma.core.walker import walk_tree
 
 logger = logging.getLogger(__name__)
 
@@ -114,9 +115,9 @@ class Renamer:
                     return []
 
                 images = []
-                for r, _, files in content_root.walk():
-                    for f in files:
-                        fp = Path(r) / f
+                for entry in walk_tree(content_root, skip_hidden=False):
+                    for f in entry.files:
+                        fp = entry.root / f.name
                         if fp.suffix.lower() in self.ext_config.all_supported_img:
                             images.append(fp)
 
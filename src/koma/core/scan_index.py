@@ -0,0 +1,194 @@
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple
+
+from koma.config import get_user_config_dir
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "scan_index.db"
+
+# 每处理多少个目录提交一次事务
+COMMIT_INTERVAL = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    signature TEXT NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (dir, name)
+) WITHOUT ROWID;
+"""
+
+
+class IndexedFile(NamedTuple):
+    size: int
+    mtime_ns: int
+    category: str
+
+
+@dataclass
+class IndexedDir:
+    mtime_ns: int
+    signature: str
+    files: dict[str, IndexedFile] = field(default_factory=dict)
+
+
+@dataclass
+class IndexStats:
+    path: Path
+    dirs: int = 0
+    files: int = 0
+    db_size: int = 0
+    last_scan: float | None = None
+    categories: dict[str, int] = field(default_factory=dict)
+
+
+class ScanIndex:
+    """扫描索引：记录目录/文件状态及分类结果，用于增量扫描"""
+
+    def __init__(self, db_path: Path | None = None):
+        """
+        初始化扫描索引
+
+        Args:
+            db_path: 索引数据库路径，默认位于用户配置目录
+        """
+        self.db_path = (
+            Path(db_path) if db_path else get_user_config_dir() / INDEX_FILENAME
+        )
+        self._conn: sqlite3.Connection | None = None
+        self._pending = 0
+
+    def __enter__(self) -> "ScanIndex":
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        if self._conn is not None:
+            return
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.commit()
+        finally:
+            self._conn.close()
+            self._conn = None
+            self._pending = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.open()
+        return self._conn  # type: ignore
+
+    def get_dir(self, dir_path: str) -> IndexedDir | None:
+        row = self.conn.execute(
+            "SELECT mtime_ns, signature FROM dirs WHERE path = ?", (dir_path,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        indexed = IndexedDir(mtime_ns=row[0], signature=row[1])
+        for name, size, mtime_ns, category in self.conn.execute(
+            "SELECT name, size, mtime_ns, category FROM files WHERE dir = ?",
+            (dir_path,),
+        ):
+            indexed.files[name] = IndexedFile(size, mtime_ns, category)
+        return indexed
+
+    def update_dir(
+        self,
+        dir_path: str,
+        mtime_ns: int,
+        signature: str,
+        files: dict[str, IndexedFile],
+    ):
+        """覆盖写入单个目录的索引"""
+        conn = self.conn
+        conn.execute("DELETE FROM files WHERE dir = ?", (dir_path,))
+        conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns, signature, scanned_at) "
+            "VALUES (?, ?, ?, ?)",
+            (dir_path, mtime_ns, signature, time.time()),
+        )
+        conn.executemany(
+            "INSERT INTO files (dir, name, size, mtime_ns, category) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(dir_path, name, *info) for name, info in files.items()],
+        )
+
+        self._pending += 1
+        if self._pending >= COMMIT_INTERVAL:
+            conn.commit()
+            self._pending = 0
+
+    def prune(self, root: str, visited: set[str]) -> int:
+        """删除 root 下本次扫描未访问到的目录 (已删除或被排除)"""
+        prefix = root.rstrip(os.sep) + os.sep
+        stale = [
+            path
+            for (path,) in self.conn.execute(
+                "SELECT path FROM dirs WHERE path = ? OR (path > ? AND path < ?)",
+                (root, prefix, prefix + "\U0010ffff"),
+            )
+            if path not in visited
+        ]
+        if stale:
+            self.conn.executemany(
+                "DELETE FROM files WHERE dir = ?", [(p,) for p in stale]
+            )
+            self.conn.executemany(
+                "DELETE FROM dirs WHERE path = ?", [(p,) for p in stale]
+            )
+            self.conn.commit()
+        return len(stale)
+
+    def clear(self):
+        """清空索引"""
+        self.conn.execute("DELETE FROM files")
+        self.conn.execute("DELETE FROM dirs")
+        self.conn.commit()
+
+    def stats(self) -> IndexStats:
+        """索引统计信息"""
+        stats = IndexStats(path=self.db_path)
+        if not self.db_path.exists():
+            return stats
+
+        conn = self.conn
+        stats.dirs, stats.last_scan = conn.execute(
+            "SELECT COUNT(*), MAX(scanned_at) FROM dirs"
+        ).fetchone()
+        stats.categories = dict(
+            conn.execute("SELECT category, COUNT(*) FROM files GROUP BY category")
+        )
+        stats.files = sum(stats.categories.values())
+        stats.db_size = sum(
+            p.stat().st_size
+            for p in self.db_path.parent.glob(f"{self.db_path.name}*")
+            if p.is_file()
+        )
+        return stats
@@ -1,19 +1,42 @@
+import hashlib
+import json
 import logging
+import os
 import shutil
+import sys
 import tempfile
+import threading
+from collections import defaultdict, deque
 from collections.abc import Callable, Generator
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 from natsort import natsorted
 
 from koma.config import ExtensionsConfig
-from koma.core.archive import ArchiveHandler
-from koma.core.image_processor import ImageProcessor
+from koma.core.archive import ZIP_SUFFIXES, ArchiveHandler
+from koma.core.image_processor import ImageInfo, ImageProcessor
+from koma.core.scan_index import IndexedDir, IndexedFile, ScanIndex
+from koma.core.walker import WalkEntry, walk_tree
 
 logger = logging.getLogger(__name__)
 
+# 解压清理压缩包时预估占用的临时空间 (相对压缩包大小)
+TEMP_SPACE_FACTOR = 2.5
+# 临时目录剩余空间中可用于预算的比例
+TEMP_SPACE_USABLE_RATIO = 0.9
+
+
+# 索引中记录的文件分类
+CATEGORY_CONVERT = "convert"
+CATEGORY_COPY = "copy"
+CATEGORY_AD = "ad"
+CATEGORY_JUNK = "junk"
+CATEGORY_ARCHIVE = "archive"
+CATEGORY_OTHER = "other"
+
 
 @dataclass
 class ScanResult:
@@ -24,6 +47,81 @@ class ScanResult:
     archives: list[Path] = field(default_factory=list)
     processed_archives: int = 0
 
+    @property
+    def has_items(self) -> bool:
+        return bool(
+            self.to_convert
+            or self.to_copy
+            or self.ads
+            or self.junk
+            or self.archives
+            or self.processed_archives > 0
+        )
+
+
+class TempSpaceBudget:
+    """临时目录空间预算，供并发处理的压缩包共享"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self._used = 0
+        self._queue: deque[object] = deque()
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_temp_dir(cls, limit: int = 0) -> "TempSpaceBudget":
+        """
+        根据临时目录剩余空间创建预算
+
+        Args:
+            limit: 预算上限 (字节)，0 表示仅受剩余空间限制
+        """
+        try:
+            free = shutil.disk_usage(tempfile.gettempdir()).free
+            total = int(free * TEMP_SPACE_USABLE_RATIO)
+        except OSError:
+            total = sys.maxsize
+        if limit > 0:
+            total = min(total, limit)
+        return cls(total)
+
+    def acquire(self, size: int) -> bool:
+        """按先来后到预留空间，不足时阻塞等待；超出预算总量时返回 False"""
+        if size > self.total:
+            return False
+
+        ticket = object()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                self._cond.wait_for(
+                    lambda: self._queue[0] is ticket and self._used + size <= self.total
+                )
+                self._used += size
+            finally:
+                self._queue.remove(ticket)
+                self._cond.notify_all()
+        return True
+
+    def release(self, size: int):
+        with self._cond:
+            self._used = max(0, self._used - size)
+            self._cond.notify_all()
+
+
+class _PendingFolder(NamedTuple):
+    root: Path
+    task: "ScanResult | Future[ScanResult]"
+    archive_tasks: list[Future[bool]] | None = None
+    index_key: str | None = None
+    mtime_ns: int = 0
+    file_stats: dict[str, tuple[int, int]] | None = None
+
+    @property
+    def done(self) -> bool:
+        tasks = [self.task, *(self.archive_tasks or [])]
+        return all(not isinstance(t, Future) or t.done() for t in tasks)
+
 
 class Scanner:
     def __init__(
@@ -31,6 +129,7 @@ class Scanner:
         input_dir: Path,
         ext_config: ExtensionsConfig,
         image_processor: ImageProcessor,
+        scan_index: ScanIndex | None = None,
     ):
         """
         初始化扫描器
@@ -39,12 +138,18 @@ class Scanner:
             input_dir: 扫描根目录
             ext_config: 扩展名配置
             image_processor: 图像处理器
+            scan_index: 扫描索引，提供时跳过未变化的文件夹
         """
         self.input_dir = Path(input_dir)
         self.ext_config = ext_config
         self.image_processor = image_processor
+        self.scan_index = scan_index
         self.archive_handler = ArchiveHandler(self.ext_config)
 
+        # 尾页推测检测：同时检查末尾 K 页，由 run() 按选项设置
+        self._tail_pool: ThreadPoolExecutor | None = None
+        self._tail_pages = 1
+
         self.supported_img = self.ext_config.all_supported_img
         self.valid_extensions = (
             self.supported_img | self.ext_config.archive | self.ext_config.document
@@ -58,101 +163,384 @@ class Scanner:
         options = options or {}
         enable_ad_scan = options.get("enable_ad_scan", False)
         enable_archive_scan = options.get("enable_archive_scan", False)
+        force_rescan = options.get("force_rescan", False)
         out_dir_str = options.get("archive_out_path")
         exclude_path = Path(out_dir_str).resolve() if out_dir_str else None
 
+        if enable_ad_scan:
+            # 每次扫描单独统计预筛命中与漏检
+            self.image_processor.reset_qr_stats()
+
+        index = self.scan_index
+        signature = self._index_signature(options)
+        visited: set[str] = set()
+        reused = 0
+        completed = False
+
+        # 广告检测线程池：各文件夹的尾页检测并发执行
+        ad_workers = max(1, options.get("ad_scan_workers") or 1)
+        pool = None
+        if enable_ad_scan and ad_workers > 1:
+            pool = ThreadPoolExecutor(
+                max_workers=ad_workers, thread_name_prefix="koma_ad"
+            )
+        # 尾页检测线程池：同一文件夹的末尾几页并发检测 (推测执行)
+        tail_pages = max(1, options.get("ad_tail_pages") or 1)
+        if enable_ad_scan and tail_pages > 1:
+            self._tail_pool = ThreadPoolExecutor(
+                max_workers=max(ad_workers, tail_pages), thread_name_prefix="koma_tail"
+            )
+            self._tail_pages = tail_pages
+        # 压缩包清理线程池：多个压缩包共享临时空间预算并发处理
+        budget = None
+        archive_pool = None
+        archive_workers = max(1, options.get("archive_workers") or 1)
+        if enable_archive_scan and options.get("archive_out_path"):
+            budget = TempSpaceBudget.from_temp_dir(options.get("temp_space_limit") or 0)
+            if archive_workers > 1:
+                archive_pool = ThreadPoolExecutor(
+                    max_workers=archive_workers, thread_name_prefix="koma_archive"
+                )
+
+        # 按遍历顺序排队，保证产出顺序与单线程一致
+        pending: deque[_PendingFolder] = deque()
+        window = max(ad_workers, archive_workers) * 4
+
         try:
-            for root, dirs, files in self.input_dir.walk():
-                root_path = Path(root).resolve()
-                if exclude_path:
-                    try:
-                        if root_path == exclude_path or root_path.is_relative_to(
-                            exclude_path
-                        ):
-                            dirs[:] = []
+            for entry in walk_tree(
+                self.input_dir, exclude=exclude_path, with_stat=index is not None
+            ):
+                root_path = entry.root
+                index_key = None
+                file_stats = {}
+
+                if index is not None and entry.stat is not None:
+                    index_key = os.path.abspath(root_path)
+                    visited.add(index_key)
+                    file_stats = self._collect_file_stats(entry)
+
+                    # 文件夹未变化时直接复用索引中的分类结果
+                    if not force_rescan:
+                        cached = index.get_dir(index_key)
+                        if self._is_index_valid(cached, entry, signature, file_stats):
+                            reused += 1
+                            result = self._result_from_index(entry, cached)  # type: ignore
+                            pending.append(_PendingFolder(root_path, result))
+                            yield from self._drain(pending, signature, window)
                             continue
-                    except ValueError:
-                        pass
 
-                # 排除隐藏文件夹
-                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                result, images, archive_tasks = self._classify_folder(
+                    entry, options, budget, archive_pool
+                )
+                if pool is not None and images:
+                    task = pool.submit(
+                        self._finish_folder, root_path, result, images, enable_ad_scan
+                    )
+                else:
+                    task = self._finish_folder(
+                        root_path, result, images, enable_ad_scan
+                    )
 
-                root_path = Path(root)
-                result = ScanResult()
-                files = natsorted(files)
+                pending.append(
+                    _PendingFolder(
+                        root_path,
+                        task,
+                        archive_tasks,
+                        index_key,
+                        entry.stat.st_mtime_ns if entry.stat else 0,
+                        file_stats,
+                    )
+                )
+                yield from self._drain(pending, signature, window)
 
-                image_candidates = []
+            yield from self._drain(pending, signature, 0)
+            completed = True
 
-                for f in files:
-                    f_path = root_path / f
+        finally:
+            # 尾页线程池最后关闭，文件夹任务可能仍在等待其结果
+            for executor in (pool, archive_pool, self._tail_pool):
+                if executor is not None:
+                    executor.shutdown(wait=True, cancel_futures=True)
+            self._tail_pool = None
+            self._tail_pages = 1
+
+            if index is not None:
+                try:
+                    if completed:
+                        index.prune(os.path.abspath(self.input_dir), visited)
+                    logger.info(
+                        f"🗂️ 扫描索引: 共 {len(visited)} 个文件夹，"
+                        f"复用 {reused} 个，重新分析 {len(visited) - reused} 个"
+                    )
+                except Exception as e:
+                    logger.error(f"更新扫描索引失败: {e}")
+                finally:
+                    index.close()
 
-                    # 压缩包扫描
-                    if self._is_archive(f_path):
-                        result.archives.append(f_path)
+            if progress_callback:
+                progress_callback(1, 1, "扫描分析完成")
 
-                        if enable_archive_scan and self._process_archive(
-                            f_path, options
-                        ):
-                            result.processed_archives += 1
+    def _drain(
+        self, pending: deque["_PendingFolder"], signature: str, keep: int
+    ) -> Generator[tuple[Path, ScanResult], None, None]:
+        """按顺序产出已完成的文件夹，队列超过 keep 时阻塞等待队首"""
+        while pending:
+            head = pending[0]
+            if len(pending) <= keep and not head.done:
+                break
 
-                        continue
+            pending.popleft()
+            result = head.task.result() if isinstance(head.task, Future) else head.task
+            for archive_task in head.archive_tasks or []:
+                if archive_task.result():
+                    result.processed_archives += 1
+
+            if self.scan_index is not None and head.index_key is not None:
+                self.scan_index.update_dir(
+                    head.index_key,
+                    head.mtime_ns,
+                    signature,
+                    self._index_rows(result, head.file_stats or {}),
+                )
+
+            if result.has_items:
+                yield head.root, result
 
-                    # 常规文件扫描
-                    is_junk_file = self._is_junk(f_path)
+    def _classify_folder(
+        self,
+        entry: WalkEntry,
+        options: dict,
+        budget: TempSpaceBudget | None = None,
+        archive_pool: ThreadPoolExecutor | None = None,
+    ) -> tuple[ScanResult, list[str], list[Future[bool]]]:
+        """按扩展名归类单个文件夹，返回结果、待检测的图片及压缩包清理任务"""
+        enable_archive_scan = options.get("enable_archive_scan", False)
 
-                    if is_junk_file:
-                        result.junk.append(f_path)
-                        continue
+        root_path = entry.root
+        result = ScanResult()
 
-                    if f_path.suffix.lower() in self.supported_img:
-                        image_candidates.append(f)
+        image_candidates = []
+        archive_tasks = []
 
-                # 广告检测
-                confirmed_ads = set()
-                if image_candidates and enable_ad_scan:
-                    confirmed_ads = self._detect_ads_in_folder(
-                        root_path, image_candidates
+        for f in entry.files:
+            name = f.name
+            suffix = os.path.splitext(name)[1].lower()
+
+            # 压缩包扫描
+            if suffix in self.ext_config.archive:
+                f_path = root_path / name
+                result.archives.append(f_path)
+
+                if not enable_archive_scan:
+                    continue
+                if archive_pool is not None:
+                    archive_tasks.append(
+                        archive_pool.submit(
+                            self._process_archive, f_path, options, budget
+                        )
                     )
+                elif self._process_archive(f_path, options, budget):
+                    result.processed_archives += 1
 
-                # 结果归类
-                self._categorize_files(
-                    root_path, image_candidates, confirmed_ads, result
-                )
+                continue
 
-                if (
-                    result.to_convert
-                    or result.to_copy
-                    or result.ads
-                    or result.junk
-                    or result.archives
-                    or result.processed_archives > 0
-                ):
-                    yield root_path, result
+            # 常规文件扫描
+            if self._is_junk_name(name, suffix):
+                result.junk.append(root_path / name)
+                continue
 
-        finally:
-            if progress_callback:
-                progress_callback(1, 1, "扫描分析完成")
+            if suffix in self.supported_img:
+                image_candidates.append(name)
 
-    def _process_archive(self, archive_path: Path, options: dict) -> bool:
-        """处理单个压缩包：检查空间 -> 解压 -> 清理 -> 重打包"""
+        return result, image_candidates, archive_tasks
+
+    def _finish_folder(
+        self,
+        root_path: Path,
+        result: ScanResult,
+        image_candidates: list[str],
+        enable_ad_scan: bool,
+    ) -> ScanResult:
+        """广告检测并完成归类 (可在线程池中执行)"""
+        confirmed_ads = set()
+        if image_candidates and enable_ad_scan:
+            confirmed_ads = self._detect_ads_in_folder(root_path, image_candidates)
+
+        self._categorize_files(root_path, image_candidates, confirmed_ads, result)
+
+        return result
+
+    def _index_signature(self, options: dict[str, Any]) -> str:
+        """影响分类结果与压缩包输出的配置指纹，配置变化时索引自动失效"""
+        enable_ad_scan = options.get("enable_ad_scan", False)
+        enable_archive_scan = options.get("enable_archive_scan", False)
+        ext = self.ext_config
+        parts: list[Any] = [
+            sorted(ext.convert),
+            sorted(ext.passthrough),
+            sorted(ext.archive),
+            sorted(ext.document),
+            sorted(ext.misc_whitelist),
+            enable_ad_scan,
+            enable_archive_scan,
+        ]
+        if enable_ad_scan:
+            scanner_config = getattr(self.image_processor, "config", None)
+            parts.append(sorted(getattr(scanner_config, "qr_whitelist", None) or []))
+            parts.append(getattr(scanner_config, "enable_qr_prefilter", None))
+            # 广告图库新增条目后，此前判定为干净的图片需要重新检测
+            blocklist = getattr(self.image_processor, "ad_blocklist", None)
+            if blocklist is not None and getattr(
+                scanner_config, "enable_ad_blocklist", False
+            ):
+                parts.append(blocklist.count())
+            else:
+                parts.append(None)
+        if enable_archive_scan:
+            # 压缩包的输出位置与打包方式 (与 _process_archive 一致)
+            out_dir = options.get("archive_out_path")
+            parts.extend(
+                [
+                    str(Path(out_dir).resolve()) if out_dir else None,
+                    options.get("repack", True),
+                    options.get("pack_format", "zip"),
+                ]
+            )
+
+        raw = json.dumps(parts, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha1(raw).hexdigest()
+
+    def _collect_file_stats(self, entry: WalkEntry) -> dict[str, tuple[int, int]]:
+        stats = {}
+        for f in entry.files:
+            try:
+                st = f.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            stats[f.name] = (st.st_size, st.st_mtime_ns)
+        return stats
+
+    def _is_index_valid(
+        self,
+        cached: IndexedDir | None,
+        entry: WalkEntry,
+        signature: str,
+        file_stats: dict[str, tuple[int, int]],
+    ) -> bool:
+        if cached is None or entry.stat is None:
+            return False
+        if cached.mtime_ns != entry.stat.st_mtime_ns or cached.signature != signature:
+            return False
+        if cached.files.keys() != file_stats.keys():
+            return False
+        return all(
+            (info.size, info.mtime_ns) == file_stats[name]
+            for name, info in cached.files.items()
+        )
+
+    def _result_from_index(self, entry: WalkEntry, cached: IndexedDir) -> ScanResult:
+        result = ScanResult()
+        targets = {
+            CATEGORY_CONVERT: result.to_convert,
+            CATEGORY_COPY: result.to_copy,
+            CATEGORY_AD: result.ads,
+            CATEGORY_JUNK: result.junk,
+            CATEGORY_ARCHIVE: result.archives,
+        }
+        for f in entry.files:
+            info = cached.files.get(f.name)
+            if info and info.category in targets:
+                targets[info.category].append(entry.root / f.name)
+        return result
+
+    def _index_rows(
+        self, result: ScanResult, file_stats: dict[str, tuple[int, int]]
+    ) -> dict[str, IndexedFile]:
+        categories = {}
+        for category, paths in (
+            (CATEGORY_CONVERT, result.to_convert),
+            (CATEGORY_COPY, result.to_copy),
+            (CATEGORY_AD, result.ads),
+            (CATEGORY_JUNK, result.junk),
+            (CATEGORY_ARCHIVE, result.archives),
+        ):
+            for p in paths:
+                categories[p.name] = category
+
+        return {
+            name: IndexedFile(size, mtime_ns, categories.get(name, CATEGORY_OTHER))
+            for name, (size, mtime_ns) in file_stats.items()
+        }
+
+    def _process_archive(
+        self,
+        archive_path: Path,
+        options: dict,
+        budget: "TempSpaceBudget | None" = None,
+    ) -> bool:
+        """处理单个压缩包：就地检查 -> 预留空间 -> 解压 -> 清理 -> 重打包"""
         output_dir = options.get("archive_out_path")
         if not output_dir:
             return False
 
+        # 就地检查，干净的压缩包无需解压
+        dirty = self._inspect_archive(
+            archive_path, check_ads=options.get("enable_ad_scan", False)
+        )
+        if dirty is not None and not dirty:
+            logger.info(f"⏩ 跳过干净压缩包: {archive_path.name}")
+            return False
+
+        # zip -> zip 直接复制其余成员的压缩数据，无需解压与临时空间
+        if dirty and self._can_strip_in_place(archive_path, options):
+            return self._strip_archive(archive_path, output_dir, options, dirty)
+
+        if budget is None:
+            budget = TempSpaceBudget.from_temp_dir()
+
         try:
-            required_space = archive_path.stat().st_size * 2.5
-            temp_base = Path(tempfile.gettempdir())
-            free_space = shutil.disk_usage(temp_base).free
-
-            if free_space < required_space:
-                logger.error(
-                    f"❌ 跳过压缩包 {archive_path.name}: 磁盘空间不足 "
-                    f"(需要 {required_space / 1024 / 1024:.1f}MB, 剩余 {free_space / 1024 / 1024:.1f}MB)"
-                )
-                return False
-        except Exception:
-            pass
+            required_space = int(archive_path.stat().st_size * TEMP_SPACE_FACTOR)
+        except OSError:
+            required_space = 0
+
+        # 空间不足时等待其他压缩包处理完成，仅在预算总量都不够时跳过
+        if not budget.acquire(required_space):
+            logger.error(
+                f"❌ 跳过压缩包 {archive_path.name}: 磁盘空间不足 "
+                f"(需要 {required_space / 1024 / 1024:.1f}MB, 可用 {budget.total / 1024 / 1024:.1f}MB)"
+            )
+            return False
 
+        try:
+            return self._clean_archive(archive_path, output_dir, options)
+        finally:
+            budget.release(required_space)
+
+    def _can_strip_in_place(self, archive_path: Path, options: dict) -> bool:
+        return (
+            options.get("repack", True)
+            and options.get("pack_format", "zip") in ("zip", "cbz")
+            and archive_path.suffix.lower() in ZIP_SUFFIXES
+        )
+
+    def _strip_archive(
+        self, archive_path: Path, output_dir: str, options: dict, dirty: set[str]
+    ) -> bool:
+        logger.info(f"🚫 发现杂项或广告: {archive_path.name}")
+
+        fmt = options.get("pack_format", "zip")
+        final_path = (Path(output_dir) / archive_path.stem).with_suffix(f".{fmt}")
+        if not self.archive_handler.strip_members(archive_path, final_path, dirty):
+            return False
+
+        logger.info(
+            f"📦 已重打包 (清理 {len(dirty)} 个文件): {archive_path.name} -> {final_path}"
+        )
+        return True
+
+    def _clean_archive(
+        self, archive_path: Path, output_dir: str, options: dict
+    ) -> bool:
         try:
             with tempfile.TemporaryDirectory(prefix="koma_extract_") as temp_dir:
                 temp_root = Path(temp_dir)
@@ -212,24 +600,23 @@ class Scanner:
         """递归清理临时目录中的垃圾和广告"""
         deleted_count = 0
 
-        for root, _, files in target_dir.walk():
-            root_path = Path(root)
-            files = natsorted(files)
+        for entry in walk_tree(target_dir, skip_hidden=False):
+            root_path = entry.root
 
             image_candidates = []
 
             # 删杂项
-            for f in files:
-                f_path = root_path / f
+            for f in entry.files:
+                f_path = root_path / f.name
                 if self._is_junk(f_path):
                     try:
                         f_path.unlink()
                         deleted_count += 1
-                        logger.debug(f"[TempClean] 删除杂项: {f}")
+                        logger.debug(f"[TempClean] 删除杂项: {f.name}")
                     except OSError:
                         pass
                 elif f_path.suffix.lower() in self.supported_img:
-                    image_candidates.append(f)
+                    image_candidates.append(f.name)
 
             # 删广告
             if check_ads and image_candidates:
@@ -246,9 +633,9 @@ class Scanner:
 
     def _is_junk(self, path: Path) -> bool:
         """判断是否为杂项文件"""
-        name = path.name
-        suffix = path.suffix.lower()
+        return self._is_junk_name(path.name, path.suffix.lower())
 
+    def _is_junk_name(self, name: str, suffix: str) -> bool:
         # 隐藏文件
         if name.startswith("."):
             return True
@@ -264,15 +651,19 @@ class Scanner:
 
     def _detect_ads_in_folder(self, root: Path, images: list[str]) -> set[str]:
         """倒序检测文件夹内的广告图片"""
+        return self._detect_tail_ads(
+            images,
+            lambda name: self.image_processor.inspect(root / name, check_ad=True),
+        )
+
+    def _detect_tail_ads(
+        self, images: list[str], inspect: Callable[[str], ImageInfo]
+    ) -> set[str]:
         confirmed = set()
 
         # 倒序检查最后几张图
-        for i in range(len(images) - 1, -1, -1):
-            img_name = images[i]
-            img_path = root / img_name
-            try:
-                info = self.image_processor.analyze(img_path)
-            except Exception:
+        for img_name, info in self._inspect_tail(images, inspect):
+            if info is None:
                 continue
 
             # 如果是正常漫画页（非动图、非灰度等），停止检测
@@ -280,7 +671,7 @@ class Scanner:
             if info.is_animated:
                 break
 
-            if self.image_processor.has_ad_qrcode(img_path):
+            if info.has_ad:
                 confirmed.add(img_name)
             else:
                 # 遇到第一张非广告图，停止倒序扫描
@@ -288,6 +679,101 @@ class Scanner:
 
         return confirmed
 
+    def _inspect_tail(
+        self, images: list[str], inspect: Callable[[str], ImageInfo]
+    ) -> Generator[tuple[str, ImageInfo | None], None, None]:
+        """
+        倒序产出图片分析结果，分析失败时为 None
+
+        启用推测检测时预先提交末尾 K 页，按倒序消费；
+        调用方提前停止后，尚未开始的任务会被取消。
+        """
+        order = images[::-1]
+        pool = self._tail_pool
+
+        if pool is None or self._tail_pages <= 1:
+            for name in order:
+                try:
+                    yield name, inspect(name)
+                except Exception:
+                    yield name, None
+            return
+
+        queued: deque[tuple[str, Future[ImageInfo]]] = deque()
+        next_idx = 0
+        try:
+            while queued or next_idx < len(order):
+                while next_idx < len(order) and len(queued) < self._tail_pages:
+                    name = order[next_idx]
+                    queued.append((name, pool.submit(inspect, name)))
+                    next_idx += 1
+
+                name, future = queued.popleft()
+                try:
+                    info = future.result()
+                except Exception:
+                    info = None
+                yield name, info
+        finally:
+            for _, future in queued:
+                future.cancel()
+
+    def _inspect_archive(self, archive_path: Path, check_ads: bool) -> set[str] | None:
+        """
+        不解压检查压缩包中需要移除的杂项或广告
+
+        仅读取成员列表判断杂项，广告检测只把尾部图片读入内存。
+
+        Returns:
+            需要移除的成员名集合 (空集合表示干净)，None 表示无法就地检查 (需完整解压)
+        """
+        members = self.archive_handler.list_members(archive_path)
+        if members is None:
+            return None
+
+        dirty: set[str] = set()
+        junk_dirs: set[str] = set()
+        folders: dict[str, dict[str, str]] = defaultdict(dict)
+        for member in members:
+            parent, _, name = member.name.replace("\\", "/").rstrip("/").rpartition("/")
+            if member.is_dir:
+                if name.lower() in self.ext_config.system_junk:
+                    junk_dirs.add(member.name)
+                continue
+            suffix = os.path.splitext(name)[1].lower()
+            if self._is_junk_name(name, suffix):
+                dirty.add(member.name)
+            elif suffix in self.supported_img:
+                folders[parent][name] = member.name
+
+        if check_ads:
+            for images in folders.values():
+                ads = self._detect_archive_ads(archive_path, images)
+                dirty.update(images[name] for name in ads)
+
+        # 杂项目录 (如 __MACOSX/) 仅在需要清理时一并移除
+        if dirty:
+            dirty |= junk_dirs
+        return dirty
+
+    def _detect_archive_ads(
+        self, archive_path: Path, images: dict[str, str]
+    ) -> set[str]:
+        """
+        倒序检测压缩包内某个目录的广告图片，成员按需读入内存
+
+        Args:
+            images: 文件名 -> 成员列表中的原始成员名
+        """
+
+        def inspect(name: str) -> ImageInfo:
+            data = self.archive_handler.read_member(archive_path, images[name])
+            if data is None:
+                raise OSError(f"无法读取 {images[name]}")
+            return self.image_processor.inspect_data(data, name, check_ad=True)
+
+        return self._detect_tail_ads(natsorted(images), inspect)
+
     def _categorize_files(
         self, root: Path, images: list[str], ads: set[str], result: ScanResult
     ):
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+from collections.abc import Generator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from natsort import natsort_keygen
+
+logger = logging.getLogger(__name__)
+
+# 目录遍历线程数 (I/O 密集，网络盘上多线程收益明显)
+DEFAULT_WALK_WORKERS = 8
+
+# 前若干个目录在当前线程读取，小目录树不经过线程池
+SERIAL_DIR_LIMIT = 16
+
+_name_key = natsort_keygen(key=lambda e: e.name)
+
+# 进程内共享的遍历线程池 (首次需要时创建)，嵌套或并发的遍历共用同一组线程
+_shared_pool: ThreadPoolExecutor | None = None
+_shared_pool_lock = threading.Lock()
+
+
+def _walk_pool() -> ThreadPoolExecutor:
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ThreadPoolExecutor(
+                max_workers=DEFAULT_WALK_WORKERS, thread_name_prefix="koma_walk"
+            )
+        return _shared_pool
+
+
+class WalkEntry(NamedTuple):
+    root: Path
+    dirs: list[os.DirEntry]
+    files: list[os.DirEntry]
+    stat: os.stat_result | None = None
+
+
+def _list_dir(path: Path, skip_hidden: bool, with_stat: bool) -> WalkEntry | None:
+    """列出单个目录，按自然顺序返回子目录和文件"""
+    dirs = []
+    files = []
+    dir_stat = None
+    try:
+        if with_stat:
+            dir_stat = os.stat(path)
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    if skip_hidden and entry.name.startswith("."):
+                        continue
+                    dirs.append(entry)
+                else:
+                    if with_stat:
+                        # DirEntry 会缓存 stat 结果，在工作线程中预先填充
+                        try:
+                            entry.stat(follow_symlinks=False)
+                        except OSError:
+                            pass
+                    files.append(entry)
+    except OSError as e:
+        logger.debug(f"无法读取目录 {path}: {e}")
+        return None
+
+    dirs.sort(key=_name_key)
+    files.sort(key=_name_key)
+    return WalkEntry(path, dirs, files, dir_stat)
+
+
+def walk_tree(
+    root: Path,
+    exclude: Path | None = None,
+    skip_hidden: bool = True,
+    with_stat: bool = False,
+    max_workers: int = DEFAULT_WALK_WORKERS,
+    executor: Executor | None = None,
+) -> Generator[WalkEntry, None, None]:
+    """
+    基于 os.scandir 的并行目录遍历
+
+    前 SERIAL_DIR_LIMIT 个目录在当前线程读取，目录树更大时
+    子目录的读取交给线程池预取，结果仍按自然排序的先序顺序产出，
+    与单线程遍历完全一致。
+
+    Args:
+        root: 遍历根目录
+        exclude: 需要整体跳过的目录 (如输出目录)
+        skip_hidden: 是否跳过隐藏文件夹
+        with_stat: 是否在工作线程中预取目录及文件的 stat 信息
+        max_workers: 预取并发度，不大于 1 时始终单线程遍历
+        executor: 预取使用的线程池，默认使用进程内共享的线程池
+    """
+    root = Path(root)
+
+    # 将排除目录换算为相对根目录的路径，避免逐个目录 resolve
+    excluded = None
+    if exclude is not None:
+        try:
+            rel = Path(exclude).resolve().relative_to(root.resolve())
+        except (OSError, ValueError):
+            rel = None
+        if rel is not None:
+            if rel == Path("."):
+                return
+            excluded = root / rel
+
+    lookahead = max(1, max_workers) * 4
+    pool: Executor | None = None
+    visited = 0
+    # 栈元素: [目录, Future | None]，仅栈顶附近的目录会被提交预取
+    stack: list[list] = [[root, None]]
+
+    try:
+        while stack:
+            if pool is None and max_workers > 1 and visited >= SERIAL_DIR_LIMIT:
+                pool = executor or _walk_pool()
+            if pool is not None:
+                for node in reversed(stack[-lookahead:]):
+                    if node[1] is None:
+                        node[1] = pool.submit(
+                            _list_dir, node[0], skip_hidden, with_stat
+                        )
+
+            path, future = stack.pop()
+            if future is not None:
+                entry = future.result()
+            else:
+                entry = _list_dir(path, skip_hidden, with_stat)
+            visited += 1
+            if entry is None:
+                continue
+
+            if excluded is not None:
+                entry.dirs[:] = [d for d in entry.dirs if Path(d.path) != excluded]
+
+            yield entry
+
+            # 调用方可修改 entry.dirs 以剪枝
+            stack.extend([Path(d.path), None] for d in reversed(entry.dirs))
+    finally:
+        # 提前中断遍历时丢弃尚未开始的预取任务 (线程池由调用方或进程共享，不关闭)
+        for _, future in stack:
+            if future is not None:
+                future.cancel()
@@ -9,7 +9,9 @@ from PIL import Image, ImageTk
 
 import koma
 from koma.config import ConfigManager
+from koma.core.ad_blocklist import AdBlocklist
 from koma.core.image_processor import ImageProcessor
+from koma.core.qr_cache import QrVerdictCache
 from koma.ui.binder_tab import BinderTab
 from koma.ui.convert_tab import ConvertTab
 from koma.ui.dedupe_tab import DedupeTab
@@ -32,7 +34,9 @@ class KomaGUI:
         config.app.font = get_sans_font(config.app.font)
         config.app.monospace_font = get_monospace_font(config.app.monospace_font)
         self.config = config
-        self.image_processor = ImageProcessor(self.config.scanner)
+        self.image_processor = ImageProcessor(
+            self.config.scanner, QrVerdictCache(), AdBlocklist()
+        )
 
         self.progress_var = tk.DoubleVar(value=0)
         self.status_var = tk.StringVar(value="就绪")
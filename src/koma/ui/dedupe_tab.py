@@ -13,6 +13,8 @@ class DedupeTab(BaseTab):
 
         self.mode_var = tk.StringVar(value="filename")
         self.threshold_var = tk.IntVar(value=85)
+        self.library_var = tk.BooleanVar(value=False)
+        self.refresh_library_var = tk.BooleanVar(value=False)
 
         self._setup_ui()
 
@@ -62,6 +64,46 @@ class DedupeTab(BaseTab):
             command=self._toggle_threshold,
         ).pack(side="left", padx=(0, 15))
 
+        ttk.Radiobutton(
+            f_mode,
+            text="文件名 (模糊)",
+            variable=self.mode_var,
+            value="fuzzy",
+            command=self._toggle_threshold,
+        ).pack(side="left", padx=(0, 15))
+
+        ttk.Radiobutton(
+            f_mode,
+            text="内容完全相同",
+            variable=self.mode_var,
+            value="content",
+            command=self._toggle_threshold,
+        ).pack(side="left", padx=(0, 15))
+
+        ttk.Radiobutton(
+            f_mode,
+            text="封面哈希 (快速)",
+            variable=self.mode_var,
+            value="phash",
+            command=self._toggle_threshold,
+        ).pack(side="left", padx=(0, 15))
+
+        ttk.Radiobutton(
+            f_mode,
+            text="内页抽样",
+            variable=self.mode_var,
+            value="pages",
+            command=self._toggle_threshold,
+        ).pack(side="left", padx=(0, 15))
+
+        ttk.Radiobutton(
+            f_mode,
+            text="文件名 + 封面",
+            variable=self.mode_var,
+            value="hybrid",
+            command=self._toggle_threshold,
+        ).pack(side="left", padx=(0, 15))
+
         ttk.Radiobutton(
             f_mode,
             text="封面相似度",
@@ -95,12 +137,29 @@ class DedupeTab(BaseTab):
         # 初始化阈值框的显示状态
         self._toggle_threshold()
 
+        ttk.Checkbutton(
+            grp_settings,
+            text="与书库比对 (列表中的目录视为新增内容，书库目录在设置中指定)",
+            variable=self.library_var,
+        ).pack(anchor="w", pady=(5, 0))
+        ttk.Checkbutton(
+            grp_settings,
+            text="比对前先更新书库索引 (遍历书库目录，书库较大时较慢)",
+            variable=self.refresh_library_var,
+        ).pack(anchor="w")
+
         self.btn_run = ttk.Button(self, text="🔍 开始分析", command=self._start)
-        self.btn_run.pack(fill="x", padx=40, pady=20, ipady=5)
+        self.btn_run.pack(fill="x", padx=40, pady=(20, 5), ipady=5)
+
+        ttk.Button(
+            self,
+            text="🌐 与导入的书库比对 (使用书库指纹，无需扫描)",
+            command=self._start_cross,
+        ).pack(fill="x", padx=40, pady=(0, 20))
 
     def _toggle_threshold(self):
         """控制阈值输入框的启用/禁用"""
-        if self.mode_var.get() == "cover":
+        if self.mode_var.get() in ("cover", "hybrid"):
             self.scale_threshold.config(state="normal")
         else:
             self.scale_threshold.config(state="disabled")
@@ -132,6 +191,21 @@ class DedupeTab(BaseTab):
         for idx in reversed(self.listbox.curselection()):
             self.listbox.delete(idx)
 
+    def _start_cross(self):
+        try:
+            DedupeWindow(
+                self.winfo_toplevel(),
+                [],
+                self.config,
+                self.mode_var.get(),
+                self.threshold_var.get(),
+                cross_collections=True,
+                refresh_library=self.refresh_library_var.get(),
+            )
+        except Exception as e:
+            logger.error(f"启动跨书库比对失败: {e}")
+            messagebox.showerror("错误", str(e))
+
     def _start(self):
         paths = [Path(p) for p in self.listbox.get(0, tk.END)]
         if not paths:
@@ -141,10 +215,22 @@ class DedupeTab(BaseTab):
         if not valid:
             return messagebox.showerror("错误", "所有路径均无效")
 
+        check_library = self.library_var.get()
+        if check_library and not self.config.deduplicator.library_dir:
+            return messagebox.showwarning("提示", "请先在设置中指定书库目录")
+
         try:
             mode = self.mode_var.get()
             threshold = self.threshold_var.get()
-            DedupeWindow(self.winfo_toplevel(), valid, self.config, mode, threshold)
+            DedupeWindow(
+                self.winfo_toplevel(),
+                valid,
+                self.config,
+                mode,
+                threshold,
+                check_library,
+                refresh_library=self.refresh_library_var.get(),
+            )
         except Exception as e:
             logger.error(f"启动查重失败: {e}")
             messagebox.showerror("错误", str(e))
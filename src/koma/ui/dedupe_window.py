@@ -10,6 +10,8 @@ from send2trash import send2trash
 
 from koma.config import GlobalConfig
 from koma.core import Deduplicator
+from koma.core.embedding_cache import EmbeddingCache
+from koma.core.library_index import LibraryIndex
 from koma.utils import logger
 
 
@@ -21,6 +23,9 @@ class DedupeWindow(tk.Toplevel):
         config: GlobalConfig,
         mode: str = "filename",
         threshold: int = 85,
+        check_library: bool = False,
+        cross_collections: bool = False,
+        refresh_library: bool = False,
     ):
         super().__init__(parent)
         self.title("📚 归档查重结果 - 扫描初始化...")
@@ -37,8 +42,15 @@ class DedupeWindow(tk.Toplevel):
         self.input_paths = input_paths
         self.mode = mode
         self.threshold = threshold
-
-        self.deduplicator = Deduplicator(config.extensions, config.deduplicator)
+        self.check_library = check_library
+        self.cross_collections = cross_collections
+        # 是否先遍历书库目录更新指纹索引，否则直接查询已有索引
+        self.refresh_library = refresh_library
+
+        self.library_index = LibraryIndex(collection=config.deduplicator.library_name)
+        self.deduplicator = Deduplicator(
+            config.extensions, config.deduplicator, EmbeddingCache(), self.library_index
+        )
         self.results = {}
 
         self._setup_ui()
@@ -132,9 +144,28 @@ class DedupeWindow(tk.Toplevel):
             def cb(curr, total, msg):
                 self.after(0, lambda: self.title(f"📚 查重中... {msg}"))
 
-            self.results = self.deduplicator.run(
-                self.input_paths, self.mode, self.threshold, progress_callback=cb
-            )
+            library_dir = self.config.deduplicator.library_dir
+            if self.cross_collections:
+                if self.refresh_library and library_dir:
+                    self.deduplicator.update_library(
+                        [Path(library_dir)], progress_callback=cb
+                    )
+                self.results = self.deduplicator.match_collections(
+                    self.mode, progress_callback=cb
+                )
+            elif self.check_library:
+                # 索引为空时必须先建立，否则只查询已有索引，耗时与新增内容数量成正比
+                if self.refresh_library or self.library_index.count() == 0:
+                    self.deduplicator.update_library(
+                        [Path(library_dir)], progress_callback=cb
+                    )
+                self.results = self.deduplicator.check_library(
+                    self.input_paths, self.mode, progress_callback=cb
+                )
+            else:
+                self.results = self.deduplicator.run(
+                    self.input_paths, self.mode, self.threshold, progress_callback=cb
+                )
 
             self.after(0, self._on_scan_complete)
 
@@ -143,6 +174,8 @@ class DedupeWindow(tk.Toplevel):
             logger.error(f"查重扫描出错: {msg}", exc_info=True)
             self.after(0, lambda: messagebox.showerror("错误", f"扫描失败: {msg}"))
             self.after(0, self.destroy)
+        finally:
+            self.library_index.close()
 
     def _on_scan_complete(self):
         self._toggle_ui(True)
@@ -180,6 +213,22 @@ class DedupeWindow(tk.Toplevel):
 
             for item in items:
                 path = item.path
+                if item.collection:
+                    # 其他书库的条目只展示，不可勾选
+                    self.tree.insert(
+                        parent_id,
+                        "end",
+                        values=(
+                            "",
+                            f" └─ 🌐 {path.name}",
+                            item.collection,
+                            "-",
+                            str(path),
+                        ),
+                        tags=("remote",),
+                    )
+                    continue
+
                 try:
                     stat = path.stat()
                     mtime = datetime.datetime.fromtimestamp(stat.st_mtime).strftime(
@@ -198,6 +247,8 @@ class DedupeWindow(tk.Toplevel):
                     size_mb = "未知"
 
                 icon = "💼" if item.is_archive else "📁"
+                if item.in_library:
+                    icon = "📚"
 
                 self.tree.insert(
                     parent_id,
@@ -209,6 +260,7 @@ class DedupeWindow(tk.Toplevel):
                         size_mb,
                         str(path),
                     ),
+                    tags=("library",) if item.in_library else (),
                 )
 
     def get_folder_size(self, path: Path) -> int:
@@ -235,7 +287,7 @@ class DedupeWindow(tk.Toplevel):
                 return
 
             tags = self.tree.item(item_id, "tags")
-            if "summary" in tags:
+            if "summary" in tags or "remote" in tags:
                 return
 
             current_values = list(self.tree.item(item_id, "values"))
@@ -285,7 +337,7 @@ class DedupeWindow(tk.Toplevel):
     def _get_path_from_event(self, event_y) -> Path | None:
         """从鼠标点击事件中提取文件路径"""
         item_id = self.tree.identify_row(event_y)
-        if not item_id:
+        if not item_id or "remote" in self.tree.item(item_id, "tags"):
             return None
 
         values = self.tree.item(item_id, "values")
@@ -294,26 +346,38 @@ class DedupeWindow(tk.Toplevel):
         return None
 
     def select_older(self):
-        """智能选择：保留每组中修改时间【最新】的，选中其他的"""
+        """
+        智能选择：保留每组中修改时间【最新】的，选中其他的
+
+        书库中的条目始终保留；组内已有书库副本时，新增条目全部选中。
+        """
         for parent_id in self.tree.get_children():
-            children = self.tree.get_children(parent_id)
-            if not children:
+            children = self._local_children(parent_id)
+            candidates = self._local_children(parent_id, include_library=False)
+            if not candidates:
                 continue
 
-            latest_id = children[0]
-            values_latest = list(self.tree.item(latest_id, "values"))
-            values_latest[0] = "☐"
-            self.tree.item(latest_id, values=values_latest)
-
-            for child_id in children[1:]:
+            keep = set(candidates[:1]) if len(candidates) == len(children) else set()
+            for child_id in children:
                 values = list(self.tree.item(child_id, "values"))
-                values[0] = "☑"
+                values[0] = (
+                    "☑" if child_id in candidates and child_id not in keep else "☐"
+                )
                 self.tree.item(child_id, values=values)
 
+    def _local_children(self, parent_id, include_library: bool = True) -> list[str]:
+        """组内本机条目 (不含其他书库的条目，可选排除书库中的条目)"""
+        excluded = {"remote"} if include_library else {"remote", "library"}
+        return [
+            child_id
+            for child_id in self.tree.get_children(parent_id)
+            if not excluded.intersection(self.tree.item(child_id, "tags"))
+        ]
+
     def invert_selection(self):
-        """反选"""
+        """反选 (不会勾选书库中的条目)"""
         for parent_id in self.tree.get_children():
-            for child_id in self.tree.get_children(parent_id):
+            for child_id in self._local_children(parent_id, include_library=False):
                 values = list(self.tree.item(child_id, "values"))
                 values[0] = "☑" if values[0] == "☐" else "☐"
                 self.tree.item(child_id, values=values)
@@ -321,7 +385,7 @@ class DedupeWindow(tk.Toplevel):
     def deselect_all(self):
         """取消选择"""
         for parent_id in self.tree.get_children():
-            for child_id in self.tree.get_children(parent_id):
+            for child_id in self._local_children(parent_id):
                 values = list(self.tree.item(child_id, "values"))
                 values[0] = "☐"
                 self.tree.item(child_id, values=values)
@@ -1,6 +1,7 @@
 import os
 import subprocess
 import threading
+import time
 import tkinter as tk
 from pathlib import Path
 from tkinter import messagebox, ttk
@@ -10,6 +11,8 @@ from PIL import Image, ImageTk
 from send2trash import send2trash
 
 from koma.config import ARCHIVE_OUTPUT_FORMATS
+from koma.core.converter import format_size
+from koma.core.scan_index import ScanIndex
 from koma.core.scanner import Scanner
 from koma.ui.base_tab import BaseTab
 from koma.utils import logger
@@ -27,6 +30,7 @@ class SacnTab(BaseTab):
             value=self.config.scanner.enable_archive_scan
         )
         self.archive_out_path_var = tk.StringVar()
+        self.force_rescan_var = tk.BooleanVar(value=False)
         self.repack_var = tk.BooleanVar(value=True)
         default_fmt = ARCHIVE_OUTPUT_FORMATS[0] if ARCHIVE_OUTPUT_FORMATS else "zip"
         self.pack_fmt_var = tk.StringVar(value=default_fmt)
@@ -87,6 +91,14 @@ class SacnTab(BaseTab):
             side="left", padx=(0, 15)
         )
 
+        ttk.Checkbutton(
+            chk_frame, text="强制完整扫描", variable=self.force_rescan_var
+        ).pack(side="left", padx=(0, 15))
+
+        ttk.Button(chk_frame, text="📊 索引统计", command=self._show_index_stats).pack(
+            side="left"
+        )
+
         ttk.Separator(chk_frame, orient="vertical").pack(side="left", fill="y", padx=15)
 
         chk_archive = ttk.Checkbutton(
@@ -463,6 +475,38 @@ class SacnTab(BaseTab):
         state = "readonly" if self.repack_var.get() else "disabled"
         self.cbo_fmt.config(state=state)
 
+    def _show_index_stats(self):
+        """显示扫描索引统计"""
+        try:
+            with ScanIndex() as index:
+                stats = index.stats()
+        except Exception as e:
+            logger.error(f"读取扫描索引失败: {e}")
+            return messagebox.showerror("错误", f"读取扫描索引失败: {e}")
+
+        labels = {
+            "convert": "待转换",
+            "copy": "直接复制",
+            "ad": "广告",
+            "junk": "杂项",
+            "archive": "压缩包",
+            "other": "其他",
+        }
+        lines = [
+            f"索引文件: {stats.path}",
+            f"索引大小: {format_size(stats.db_size)}",
+            f"文件夹数: {stats.dirs}",
+            f"文件数: {stats.files}",
+        ]
+        if stats.last_scan:
+            lines.append(
+                f"最近扫描: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stats.last_scan))}"
+            )
+        for key, count in sorted(stats.categories.items()):
+            lines.append(f"  {labels.get(key, key)}: {count}")
+
+        messagebox.showinfo("扫描索引统计", "\n".join(lines))
+
     def _start(self):
         path = self.path_var.get()
         if not path:
@@ -474,6 +518,13 @@ class SacnTab(BaseTab):
             "archive_out_path": self.archive_out_path_var.get(),
             "repack": self.repack_var.get(),
             "pack_format": self.pack_fmt_var.get(),
+            "force_rescan": self.force_rescan_var.get(),
+            "ad_scan_workers": self.config.scanner.actual_ad_scan_workers,
+            "ad_tail_pages": self.config.scanner.ad_tail_pages,
+            "archive_workers": self.config.scanner.actual_archive_workers,
+            "temp_space_limit": self.config.scanner.archive_temp_budget_mb
+            * 1024
+            * 1024,
         }
 
         if options["enable_archive_scan"] and not options["archive_out_path"]:
@@ -514,7 +565,10 @@ class SacnTab(BaseTab):
                     ),
                 )
 
-            scanner = Scanner(Path(path), self.config.extensions, self.image_processor)
+            scan_index = ScanIndex() if self.config.scanner.enable_scan_index else None
+            scanner = Scanner(
+                Path(path), self.config.extensions, self.image_processor, scan_index
+            )
 
             count_ad, count_junk, count_archive = 0, 0, 0
             for _, res in scanner.run(options=options, progress_callback=cb):
@@ -531,6 +585,9 @@ class SacnTab(BaseTab):
             if count_archive > 0:
                 msg += f"，已处理 {count_archive} 个压缩包"
 
+            if options["enable_ad_scan"]:
+                logger.info(f"二维码{self.image_processor.qr_stats}")
+
             self.after(0, lambda: self.update_status(msg, 100, False))
 
         except Exception as e:
@@ -1,4 +1,5 @@
 import json
+import platform
 import sys
 import threading
 import tkinter as tk
@@ -6,12 +7,16 @@ import tkinter.font as tkfont
 import urllib.request
 import webbrowser
 from pathlib import Path
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 
 from PIL import Image, ImageTk
 
 import koma
 from koma.config import IMG_OUTPUT_FORMATS, ConfigManager, GlobalConfig
+from koma.core.ad_blocklist import AdBlocklist
+from koma.core.embedding_cache import EmbeddingCache
+from koma.core.library_index import LibraryIndex
+from koma.core.qr_cache import QrVerdictCache
 from koma.utils import logger
 
 
@@ -40,6 +45,23 @@ class SettingsDialog(tk.Toplevel):
         self.quality_var = tk.IntVar()
         self.lossless_var = tk.BooleanVar()
         self.ad_scan_var = tk.BooleanVar()
+        self.scan_index_var = tk.BooleanVar()
+        self.qr_cache_var = tk.BooleanVar()
+        self.qr_prefilter_var = tk.BooleanVar()
+        self.qr_audit_var = tk.BooleanVar()
+        self.ad_blocklist_var = tk.BooleanVar()
+        self.ad_worker_var = tk.IntVar()
+        self.tail_pages_var = tk.IntVar()
+        self.archive_worker_var = tk.IntVar()
+        self.temp_budget_var = tk.IntVar()
+        self.cover_batch_var = tk.IntVar()
+        self.cover_cache_var = tk.BooleanVar()
+        self.cover_approx_var = tk.IntVar()
+        self.phash_distance_var = tk.IntVar()
+        self.zip_prefilter_var = tk.BooleanVar()
+        self.fuzzy_threshold_var = tk.IntVar()
+        self.library_dir_var = tk.StringVar()
+        self.library_name_var = tk.StringVar()
         self.editors = {}
 
         self._setup_ui()
@@ -163,6 +185,67 @@ class SettingsDialog(tk.Toplevel):
         ttk.Checkbutton(
             grp_ad, text="默认开启广告二维码检测", variable=self.ad_scan_var
         ).pack(anchor="w")
+        ttk.Checkbutton(
+            grp_ad,
+            text="启用扫描索引 (跳过未变化的文件夹)",
+            variable=self.scan_index_var,
+        ).pack(anchor="w")
+
+        f_cache = ttk.Frame(grp_ad)
+        f_cache.pack(fill="x")
+        ttk.Checkbutton(
+            f_cache,
+            text="缓存二维码检测结果 (相同图片不再重复检测)",
+            variable=self.qr_cache_var,
+        ).pack(side="left")
+        ttk.Button(f_cache, text="🗑 清空缓存", command=self._clear_qr_cache).pack(
+            side="right"
+        )
+        ttk.Checkbutton(
+            grp_ad,
+            text="二维码轮廓预筛 (跳过明显不含二维码的图片)",
+            variable=self.qr_prefilter_var,
+        ).pack(anchor="w")
+        ttk.Checkbutton(
+            grp_ad,
+            text="预筛审计模式 (统计预筛漏检的二维码，会变慢)",
+            variable=self.qr_audit_var,
+        ).pack(anchor="w")
+
+        f_blocklist = ttk.Frame(grp_ad)
+        f_blocklist.pack(fill="x")
+        ttk.Checkbutton(
+            f_blocklist,
+            text="记住已确认的广告页 (相似图片无需识别二维码)",
+            variable=self.ad_blocklist_var,
+        ).pack(side="left")
+        ttk.Button(
+            f_blocklist, text="🗑 清空广告图库", command=self._clear_ad_blocklist
+        ).pack(side="right")
+
+        f_workers = ttk.Frame(grp_ad)
+        f_workers.pack(fill="x", pady=(5, 0))
+        ttk.Label(f_workers, text="广告检测线程数:").pack(side="left")
+        ttk.Entry(f_workers, textvariable=self.ad_worker_var, width=8).pack(
+            side="left", padx=5
+        )
+        ttk.Label(f_workers, text="(0 = 自动)", foreground="gray").pack(side="left")
+        ttk.Label(f_workers, text="同时检测末尾页数:").pack(side="left", padx=(10, 0))
+        ttk.Spinbox(
+            f_workers, from_=1, to=16, textvariable=self.tail_pages_var, width=5
+        ).pack(side="left", padx=5)
+
+        f_archive = ttk.Frame(grp_ad)
+        f_archive.pack(fill="x", pady=(5, 0))
+        ttk.Label(f_archive, text="压缩包清理线程数:").pack(side="left")
+        ttk.Entry(f_archive, textvariable=self.archive_worker_var, width=8).pack(
+            side="left", padx=5
+        )
+        ttk.Label(f_archive, text="临时空间上限 (MB):").pack(side="left", padx=(10, 0))
+        ttk.Entry(f_archive, textvariable=self.temp_budget_var, width=8).pack(
+            side="left", padx=5
+        )
+        ttk.Label(f_archive, text="(0 = 自动)", foreground="gray").pack(side="left")
 
         ttk.Separator(grp_ad, orient="horizontal").pack(fill="x", pady=10)
 
@@ -224,6 +307,91 @@ class SettingsDialog(tk.Toplevel):
             command=lambda: self._reset_section("deduplicator"),
         ).pack(side="right")
 
+        grp_cover = ttk.LabelFrame(self.tab_dedupe, text="封面查重", padding=10)
+        grp_cover.pack(fill="x", pady=(0, 10))
+
+        f_batch = ttk.Frame(grp_cover)
+        f_batch.pack(fill="x")
+        ttk.Label(f_batch, text="封面预读数量:").pack(side="left")
+        ttk.Spinbox(
+            f_batch, from_=1, to=256, textvariable=self.cover_batch_var, width=5
+        ).pack(side="left", padx=5)
+        ttk.Label(f_batch, text="近似比对起始数量:").pack(side="left", padx=(10, 0))
+        ttk.Entry(f_batch, textvariable=self.cover_approx_var, width=10).pack(
+            side="left", padx=5
+        )
+        ttk.Label(f_batch, text="(0 = 始终精确)", foreground="gray").pack(side="left")
+
+        f_phash = ttk.Frame(grp_cover)
+        f_phash.pack(fill="x", pady=(5, 0))
+        ttk.Label(f_phash, text="封面哈希 / 内页抽样最大汉明距离:").pack(side="left")
+        ttk.Spinbox(
+            f_phash, from_=0, to=32, textvariable=self.phash_distance_var, width=5
+        ).pack(side="left", padx=5)
+        ttk.Label(f_phash, text="(越大越宽松)", foreground="gray").pack(side="left")
+
+        f_cover_cache = ttk.Frame(grp_cover)
+        f_cover_cache.pack(fill="x", pady=(5, 0))
+        ttk.Checkbutton(
+            f_cover_cache,
+            text="缓存封面特征 (未变化的文件无需重新提取封面)",
+            variable=self.cover_cache_var,
+        ).pack(side="left")
+        ttk.Button(
+            f_cover_cache, text="🗑 清空缓存", command=self._clear_cover_cache
+        ).pack(side="right")
+
+        ttk.Checkbutton(
+            grp_cover,
+            text="先比对 zip/cbz 目录 (内容完全相同的归档只分析一次)",
+            variable=self.zip_prefilter_var,
+        ).pack(anchor="w", pady=(5, 0))
+
+        grp_fuzzy = ttk.LabelFrame(self.tab_dedupe, text="模糊文件名", padding=10)
+        grp_fuzzy.pack(fill="x", pady=(0, 10))
+
+        f_fuzzy = ttk.Frame(grp_fuzzy)
+        f_fuzzy.pack(fill="x")
+        ttk.Label(f_fuzzy, text="相似度阈值:").pack(side="left")
+        ttk.Spinbox(
+            f_fuzzy, from_=1, to=100, textvariable=self.fuzzy_threshold_var, width=5
+        ).pack(side="left", padx=5)
+        ttk.Label(
+            f_fuzzy, text="(1 - 100，越小越宽松；卷号不同不会合并)", foreground="gray"
+        ).pack(side="left")
+
+        grp_library = ttk.LabelFrame(self.tab_dedupe, text="书库索引", padding=10)
+        grp_library.pack(fill="x", pady=(0, 10))
+
+        f_library = ttk.Frame(grp_library)
+        f_library.pack(fill="x")
+        ttk.Label(f_library, text="书库目录:").pack(side="left")
+        ttk.Entry(f_library, textvariable=self.library_dir_var).pack(
+            side="left", fill="x", expand=True, padx=5
+        )
+        ttk.Button(f_library, text="📁", width=3, command=self._browse_library).pack(
+            side="left"
+        )
+        ttk.Button(
+            f_library, text="🗑 清空索引", command=self._clear_library_index
+        ).pack(side="left", padx=(5, 0))
+
+        f_library_name = ttk.Frame(grp_library)
+        f_library_name.pack(fill="x", pady=(5, 0))
+        ttk.Label(f_library_name, text="本机书库名称:").pack(side="left")
+        ttk.Entry(f_library_name, textvariable=self.library_name_var, width=20).pack(
+            side="left", padx=5
+        )
+        ttk.Label(f_library_name, text="(留空使用计算机名)", foreground="gray").pack(
+            side="left"
+        )
+        ttk.Button(
+            f_library_name, text="📥 导入指纹", command=self._import_fingerprints
+        ).pack(side="right")
+        ttk.Button(
+            f_library_name, text="📤 导出指纹", command=self._export_fingerprints
+        ).pack(side="right", padx=5)
+
         grp_regex = ttk.LabelFrame(
             self.tab_dedupe, text="文件夹解析正则 (Python Regex)", padding=10
         )
@@ -393,6 +561,14 @@ class SettingsDialog(tk.Toplevel):
         # Deduplicator
         self.editors["regex"].delete("1.0", tk.END)
         self.editors["regex"].insert("1.0", self.config.deduplicator.comic_dir_regex)
+        self.cover_batch_var.set(self.config.deduplicator.cover_batch_size)
+        self.cover_cache_var.set(self.config.deduplicator.enable_cover_cache)
+        self.cover_approx_var.set(self.config.deduplicator.cover_approx_threshold)
+        self.phash_distance_var.set(self.config.deduplicator.phash_max_distance)
+        self.zip_prefilter_var.set(self.config.deduplicator.enable_zip_prefilter)
+        self.fuzzy_threshold_var.set(self.config.deduplicator.fuzzy_name_threshold)
+        self.library_dir_var.set(self.config.deduplicator.library_dir)
+        self.library_name_var.set(self.config.deduplicator.library_name)
 
         # Extensions
         self._set_text(self.editors["convert"], self.config.extensions.convert)
@@ -406,6 +582,15 @@ class SettingsDialog(tk.Toplevel):
 
         # Scanner
         self.ad_scan_var.set(self.config.scanner.enable_ad_scan)
+        self.scan_index_var.set(self.config.scanner.enable_scan_index)
+        self.qr_cache_var.set(self.config.scanner.enable_qr_cache)
+        self.qr_prefilter_var.set(self.config.scanner.enable_qr_prefilter)
+        self.qr_audit_var.set(self.config.scanner.qr_prefilter_audit)
+        self.ad_blocklist_var.set(self.config.scanner.enable_ad_blocklist)
+        self.ad_worker_var.set(self.config.scanner.ad_scan_workers)
+        self.tail_pages_var.set(self.config.scanner.ad_tail_pages)
+        self.archive_worker_var.set(self.config.scanner.archive_workers)
+        self.temp_budget_var.set(self.config.scanner.archive_temp_budget_mb)
         self._set_text(self.editors["qr"], self.config.scanner.qr_whitelist, True)
 
     def _set_text(
@@ -417,6 +602,20 @@ class SettingsDialog(tk.Toplevel):
         text = separator.join(data_set)
         editor.insert("1.0", text)
 
+    def _read_int(
+        self, var: tk.IntVar, label: str, low: int, high: int | None = None
+    ) -> int:
+        """读取整数设置，不是整数或超出范围时抛出 ValueError"""
+        try:
+            value = var.get()
+        except tk.TclError:
+            value = None
+        if value is None or value < low or (high is not None and value > high):
+            if high is None:
+                raise ValueError(f"{label}必须是不小于 {low} 的整数！")
+            raise ValueError(f"{label}必须是 {low} - {high} 之间的整数！")
+        return value
+
     def _get_set_from_text(self, editor: tk.Text) -> set[str]:
         """从文本框解析出集合"""
         content = editor.get("1.0", tk.END).strip()
@@ -431,6 +630,102 @@ class SettingsDialog(tk.Toplevel):
         """辅助：从文本框解析出列表"""
         return sorted(set(self._get_set_from_text(editor)))
 
+    def _clear_qr_cache(self):
+        """清空二维码检测缓存"""
+        try:
+            with QrVerdictCache() as cache:
+                count = cache.count()
+                cache.clear()
+        except Exception as e:
+            logger.error(f"清空二维码缓存失败: {e}")
+            return messagebox.showerror("错误", f"清空二维码缓存失败: {e}")
+
+        messagebox.showinfo("成功", f"已清空 {count} 条二维码检测记录。")
+
+    def _clear_cover_cache(self):
+        """清空封面特征缓存"""
+        try:
+            with EmbeddingCache() as cache:
+                count = cache.count()
+                cache.clear()
+        except Exception as e:
+            logger.error(f"清空封面特征缓存失败: {e}")
+            return messagebox.showerror("错误", f"清空封面特征缓存失败: {e}")
+
+        messagebox.showinfo("成功", f"已清空 {count} 条封面特征记录。")
+
+    def _browse_library(self):
+        p = filedialog.askdirectory(parent=self)
+        if p:
+            self.library_dir_var.set(p)
+
+    def _clear_library_index(self):
+        """清空书库指纹索引"""
+        try:
+            with LibraryIndex(
+                collection=self.library_name_var.get().strip()
+            ) as library:
+                count = library.count()
+                library.clear()
+        except Exception as e:
+            logger.error(f"清空书库索引失败: {e}")
+            return messagebox.showerror("错误", f"清空书库索引失败: {e}")
+
+        messagebox.showinfo("成功", f"已清空 {count} 条书库索引记录。")
+
+    def _export_fingerprints(self):
+        """导出书库指纹 (含已导入的其他书库)"""
+        name = self.library_name_var.get().strip() or platform.node()
+        p = filedialog.asksaveasfilename(
+            parent=self,
+            defaultextension=".komadb",
+            initialfile=f"{name}.komadb",
+            filetypes=[("书库指纹", "*.komadb")],
+        )
+        if not p:
+            return
+        try:
+            with LibraryIndex(collection=name) as library:
+                count = library.export(Path(p), name)
+        except Exception as e:
+            logger.error(f"导出书库指纹失败: {e}")
+            return messagebox.showerror("错误", f"导出书库指纹失败: {e}")
+
+        messagebox.showinfo("成功", f"已导出 {count} 条书库指纹。")
+
+    def _import_fingerprints(self):
+        """导入其他电脑导出的书库指纹"""
+        p = filedialog.askopenfilename(
+            parent=self, filetypes=[("书库指纹", "*.komadb"), ("所有文件", "*.*")]
+        )
+        if not p:
+            return
+        try:
+            with LibraryIndex(
+                collection=self.library_name_var.get().strip()
+            ) as library:
+                counts = library.import_file(Path(p))
+        except Exception as e:
+            logger.error(f"导入书库指纹失败: {e}")
+            return messagebox.showerror("错误", f"导入书库指纹失败: {e}")
+
+        if not counts:
+            return messagebox.showinfo("提示", "文件中没有其他书库的指纹。")
+        lines = "\n".join(f"  {name}: {n} 项" for name, n in counts.items())
+        messagebox.showinfo("成功", f"已导入以下书库:\n{lines}")
+
+    def _clear_ad_blocklist(self):
+        """清空广告页感知哈希库"""
+        try:
+            with AdBlocklist() as blocklist:
+                count = blocklist.count()
+                blocklist.clear()
+        except Exception as e:
+            logger.error(f"清空广告图库失败: {e}")
+            return messagebox.showerror("错误", f"清空广告图库失败: {e}")
+
+        messagebox.showinfo("成功", f"已清空 {count} 条广告页记录。")
+
     def _reset_section(self, section_name: str):
         """重置某个配置段到默认值"""
         if not messagebox.askyesno(
@@ -454,9 +749,26 @@ class SettingsDialog(tk.Toplevel):
             elif section_name == "deduplicator":
                 self.editors["regex"].delete("1.0", tk.END)
                 self.editors["regex"].insert("1.0", defaults.comic_dir_regex)
+                self.cover_batch_var.set(defaults.cover_batch_size)
+                self.cover_cache_var.set(defaults.enable_cover_cache)
+                self.cover_approx_var.set(defaults.cover_approx_threshold)
+                self.phash_distance_var.set(defaults.phash_max_distance)
+                self.zip_prefilter_var.set(defaults.enable_zip_prefilter)
+                self.fuzzy_threshold_var.set(defaults.fuzzy_name_threshold)
+                self.library_dir_var.set(defaults.library_dir)
+                self.library_name_var.set(defaults.library_name)
 
             elif section_name == "scanner":
                 self.ad_scan_var.set(defaults.enable_ad_scan)
+                self.scan_index_var.set(defaults.enable_scan_index)
+                self.qr_cache_var.set(defaults.enable_qr_cache)
+                self.qr_prefilter_var.set(defaults.enable_qr_prefilter)
+                self.qr_audit_var.set(defaults.qr_prefilter_audit)
+                self.ad_blocklist_var.set(defaults.enable_ad_blocklist)
+                self.ad_worker_var.set(defaults.ad_scan_workers)
+                self.tail_pages_var.set(defaults.ad_tail_pages)
+                self.archive_worker_var.set(defaults.archive_workers)
+                self.temp_budget_var.set(defaults.archive_temp_budget_mb)
                 self._set_text(self.editors["qr"], defaults.qr_whitelist, True)
 
             messagebox.showinfo("成功", "已恢复默认值，点击【保存】后生效。")
@@ -554,6 +866,30 @@ class SettingsDialog(tk.Toplevel):
     def _save(self):
         """保存配置到磁盘"""
         try:
+            # 数值设置先全部校验，任一无效则不保存
+            try:
+                cover_batch = self._read_int(self.cover_batch_var, "封面预读数量", 1)
+                cover_approx = self._read_int(
+                    self.cover_approx_var, "近似比对起始数量", 0
+                )
+                phash_distance = self._read_int(
+                    self.phash_distance_var, "最大汉明距离", 0, 32
+                )
+                fuzzy_threshold = self._read_int(
+                    self.fuzzy_threshold_var, "模糊文件名相似度阈值", 1, 100
+                )
+                ad_workers = self._read_int(self.ad_worker_var, "广告检测线程数", 0)
+                tail_pages = self._read_int(self.tail_pages_var, "同时检测末尾页数", 1)
+                archive_workers = self._read_int(
+                    self.archive_worker_var, "压缩包清理线程数", 0
+                )
+                temp_budget = self._read_int(
+                    self.temp_budget_var, "临时空间上限 (MB)", 0
+                )
+            except ValueError as e:
+                messagebox.showwarning("输入错误", str(e))
+                return
+
             # App
             try:
                 w = int(self.win_width_var.get())
@@ -582,6 +918,14 @@ class SettingsDialog(tk.Toplevel):
             regex_val = self.editors["regex"].get("1.0", "end-1c").strip()
             if regex_val:
                 self.config.deduplicator.comic_dir_regex = regex_val
+            self.config.deduplicator.cover_batch_size = cover_batch
+            self.config.deduplicator.enable_cover_cache = self.cover_cache_var.get()
+            self.config.deduplicator.cover_approx_threshold = cover_approx
+            self.config.deduplicator.phash_max_distance = phash_distance
+            self.config.deduplicator.enable_zip_prefilter = self.zip_prefilter_var.get()
+            self.config.deduplicator.fuzzy_name_threshold = fuzzy_threshold
+            self.config.deduplicator.library_dir = self.library_dir_var.get().strip()
+            self.config.deduplicator.library_name = self.library_name_var.get().strip()
 
             # Extensions
             self.config.extensions.convert = self._get_set_from_text(
@@ -605,6 +949,15 @@ class SettingsDialog(tk.Toplevel):
 
             # Scanner
             self.config.scanner.enable_ad_scan = self.ad_scan_var.get()
+            self.config.scanner.enable_scan_index = self.scan_index_var.get()
+            self.config.scanner.enable_qr_cache = self.qr_cache_var.get()
+            self.config.scanner.enable_qr_prefilter = self.qr_prefilter_var.get()
+            self.config.scanner.qr_prefilter_audit = self.qr_audit_var.get()
+            self.config.scanner.enable_ad_blocklist = self.ad_blocklist_var.get()
+            self.config.scanner.ad_scan_workers = ad_workers
+            self.config.scanner.ad_tail_pages = tail_pages
+            self.config.scanner.archive_workers = archive_workers
+            self.config.scanner.archive_temp_budget_mb = temp_budget
             self.config.scanner.qr_whitelist = self._get_list_from_text(
                 self.editors["qr"]
             )
@@ -1,3 +1,4 @@
+from dataclasses import replace
 from unittest.mock import MagicMock
 
 import pytest
@@ -43,4 +44,20 @@ def mock_image_processor():
     processor.analyze.return_value = ImageInfo(is_animated=False, is_grayscale=False)
     # 设置 has_ad_qrcode 的默认返回值
     processor.has_ad_qrcode.return_value = False
+
+    # inspect 由上面两个接口组合而成，测试中只需设置 analyze / has_ad_qrcode
+    def inspect(file_path, check_ad=False):
+        info = processor.analyze(file_path)
+        if check_ad and not info.is_animated:
+            info = replace(info, has_ad=processor.has_ad_qrcode(file_path))
+        return info
+
+    def inspect_data(data, name="", check_ad=False):
+        info = processor.analyze_data(data, name)
+        if check_ad and not info.is_animated:
+            info = replace(info, has_ad=processor.has_ad_qrcode_data(data, name))
+        return info
+
+    processor.inspect.side_effect = inspect
+    processor.inspect_data.side_effect = inspect_data
     return processor
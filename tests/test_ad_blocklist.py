@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from koma.core.ad_blocklist import AdBlocklist
+from koma.core.image_hash import hamming, phash
+
+
+def _page(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 256, (12, 8, 3), dtype=np.uint8)
+    return cv2.resize(blocks, (800, 1200), interpolation=cv2.INTER_NEAREST)
+
+
+@pytest.fixture
+def blocklist(tmp_path):
+    with AdBlocklist(tmp_path / "db" / "ad_blocklist.db") as b:
+        yield b
+
+
+def test_phash_stable_under_recompression():
+    """测试重新压缩、缩放后的图片哈希接近，不同图片差异大"""
+    page = _page()
+    h = phash(page)
+    assert h is not None
+
+    _, buf = cv2.imencode(".jpg", page, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    recompressed = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    resized = cv2.resize(page, (400, 600), interpolation=cv2.INTER_AREA)
+    assert hamming(h, phash(recompressed)) <= 4  # type: ignore
+    assert hamming(h, phash(resized)) <= 4  # type: ignore
+
+    assert hamming(h, phash(_page(1))) > 12  # type: ignore
+
+
+def test_phash_flat_image():
+    """测试近乎纯色的图片不计算哈希"""
+    assert phash(np.full((100, 100, 3), 255, dtype=np.uint8)) is None
+    assert phash(np.full((100, 100), 30, dtype=np.uint8)) is None
+
+
+def test_blocklist_match_and_persist(blocklist):
+    """测试按汉明距离匹配，并在重新打开后保留"""
+    h = phash(_page())
+    assert blocklist.match(h) == []
+
+    blocklist.add(h, ["http://spam.com"], "a.jpg")
+    blocklist.add(h, ["http://other.com"], "b.jpg")
+    assert blocklist.count() == 1
+
+    assert blocklist.match(h ^ 0b111) == [["http://spam.com"]]
+    assert blocklist.match(h ^ 0xFF) == []
+
+    blocklist.close()
+    with AdBlocklist(blocklist.db_path) as reopened:
+        assert reopened.match(h) == [["http://spam.com"]]
+        reopened.clear()
+        assert reopened.count() == 0
+        assert reopened.match(h) == []
+
+
+def test_blocklist_reloads_after_external_change(blocklist):
+    """测试其他连接清空或写入后，已打开的图库自动重新加载"""
+    h = phash(_page())
+    blocklist.add(h, ["http://spam.com"], "a.jpg")
+
+    with AdBlocklist(blocklist.db_path) as other:
+        other.clear()
+    assert blocklist.count() == 0
+    assert blocklist.match(h) == []
+
+    with AdBlocklist(blocklist.db_path) as other:
+        other.add(h, ["http://new.com"], "b.jpg")
+    assert blocklist.match(h) == [["http://new.com"]]
+
+    # 自身写入不触发重新加载，内存副本保持一致
+    blocklist.add(h ^ 0xFFFF, ["http://own.com"], "c.jpg")
+    assert blocklist.count() == 2
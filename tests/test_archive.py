@@ -1,8 +1,10 @@
+import io
 import shutil
 import zipfile
 from unittest.mock import MagicMock, patch
 
 import pytest
+from PIL import Image
 
 from koma.core.archive import ArchiveHandler
 
@@ -188,6 +190,23 @@ def test_extract_cover_7z_fallback(tmp_path, handler_with_7z):
         assert "01.png" in args_ext
 
 
+def test_extract_cover_draft(tmp_path, handler_no_7z):
+    """测试指定尺寸时 JPEG 封面按缩小比例解码"""
+    buf = io.BytesIO()
+    Image.new("RGB", (2000, 3000), color="red").save(buf, format="JPEG")
+    zip_path = tmp_path / "big_cover.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("01.jpg", buf.getvalue())
+
+    full = handler_no_7z.extract_cover(zip_path)
+    assert full is not None
+    assert full.size == (2000, 3000)
+
+    img = handler_no_7z.extract_cover(zip_path, (224, 224))
+    assert img is not None
+    assert img.size == (250, 375)
+
+
 def test_extract_cover_no_images(tmp_path, handler_no_7z):
     """测试当压缩包内没有合法图片时返回 None"""
     zip_path = tmp_path / "no_images.zip"
@@ -223,3 +242,133 @@ def test_real_7z_pack_and_extract(tmp_path, ext_config):
     assert result_path.name == "test"
     assert (result_path / "cover.jpg").exists()
     assert (result_path / "cover.jpg").read_bytes() == b"data"
+
+
+def test_list_and_read_members_zip(tmp_path, handler_no_7z):
+    """测试原生 zipfile 读取成员列表与单个成员"""
+    zip_path = tmp_path / "members.cbz"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("sub/", b"")
+        zf.writestr("sub/01.png", MINIMAL_PNG)
+        zf.writestr("info.txt", b"text")
+
+    members = handler_no_7z.list_members(zip_path)
+    assert members is not None
+    by_name = {m.name: m for m in members}
+    assert by_name["sub/"].is_dir is True
+    assert by_name["sub/01.png"].size == len(MINIMAL_PNG)
+    assert by_name["info.txt"].is_dir is False
+
+    assert handler_no_7z.read_member(zip_path, "sub/01.png") == MINIMAL_PNG
+    assert handler_no_7z.read_member(zip_path, "missing.png") is None
+
+    # 非 zip 且没有 7z 时无法就地读取
+    assert handler_no_7z.list_members(tmp_path / "book.rar") is None
+
+
+def test_read_zip_directory(tmp_path, monkeypatch):
+    """测试直接解析中央目录，结果与 zipfile 一致"""
+    zip_path = tmp_path / "many.cbz"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("封面.png", MINIMAL_PNG)
+        for i in range(50):
+            zf.writestr(f"pages/{i:03d}.jpg", bytes(i))
+        zf.comment = b"comment"
+
+    expected = [
+        (info.filename, info.file_size, info.is_dir(), info.CRC)
+        for info in zipfile.ZipFile(zip_path).infolist()
+    ]
+    assert ArchiveHandler._read_zip_directory(zip_path) == expected
+
+    # 中央目录超出尾部读取范围时再寻址一次
+    monkeypatch.setattr("koma.core.archive.ZIP_TAIL_SIZE", 64)
+    assert ArchiveHandler._read_zip_directory(zip_path) == expected
+
+    # 结束记录不在尾部数据内时返回 None，由 zipfile 处理
+    monkeypatch.setattr("koma.core.archive.ZIP_TAIL_SIZE", 8)
+    assert ArchiveHandler._read_zip_directory(zip_path) is None
+
+
+def test_read_zip_directory_normalizes_names(tmp_path):
+    """测试成员名与 zipfile 一样截断 NUL 并替换系统路径分隔符"""
+    zip_path = tmp_path / "names.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("dir\\01.jpg", b"a")
+        zf.writestr("02.jpg#.exe", b"b")
+    zip_path.write_bytes(zip_path.read_bytes().replace(b"#", b"\0"))
+
+    expected = [info.filename for info in zipfile.ZipFile(zip_path).infolist()]
+    assert expected[1] == "02.jpg"
+    members = ArchiveHandler._read_zip_directory(zip_path)
+    assert members is not None
+    assert [m.name for m in members] == expected
+
+
+def test_parse_7z_listing(handler_with_7z):
+    """测试解析 7z l -slt 输出，忽略归档自身的头部记录"""
+    output = (
+        "Listing archive: book.7z\n\n--\nPath = book.7z\nType = 7z\n"
+        "Physical Size = 100\n\n----------\n"
+        "Path = pages\nSize = 0\nAttributes = D....\n\n"
+        "Path = pages/01.jpg\nSize = 1234\nAttributes = ....A\nCRC = 0A1B2C3D\n\n"
+        "Path = pages/Thumbs.db\nSize = 10\nFolder = -\n"
+    )
+    members = handler_with_7z._parse_7z_listing(output)
+
+    assert [m.name for m in members] == ["pages", "pages/01.jpg", "pages/Thumbs.db"]
+    assert members[0].is_dir is True
+    assert members[1].size == 1234
+    assert members[1].crc == 0x0A1B2C3D
+    assert members[2].is_dir is False
+    assert members[2].crc is None
+
+
+def test_strip_members_raw_copy(tmp_path, handler_no_7z):
+    """测试直接移除 zip 成员：其余成员的压缩数据与元信息原样保留"""
+    src = tmp_path / "src.cbz"
+    payload = b"page " * 1000
+    with zipfile.ZipFile(src, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.comment = b"koma"
+        zf.writestr("book/", b"")
+        zf.writestr("book/01.jpg", payload)
+        zf.writestr("book/02.jpg", payload * 2, compress_type=zipfile.ZIP_STORED)
+        zf.writestr("book/ad.jpg", b"ad")
+        zf.writestr("__MACOSX/._01.jpg", b"junk")
+        zf.writestr("漫画/03.jpg", payload)
+
+    out = tmp_path / "out" / "dst.cbz"
+    assert handler_no_7z.strip_members(src, out, {"book/ad.jpg", "__MACOSX/._01.jpg"})
+
+    with zipfile.ZipFile(src) as zs, zipfile.ZipFile(out) as zd:
+        assert zd.namelist() == ["book/", "book/01.jpg", "book/02.jpg", "漫画/03.jpg"]
+        assert zd.comment == b"koma"
+        assert zd.testzip() is None
+        for info in zd.infolist():
+            orig = zs.getinfo(info.filename)
+            assert (info.CRC, info.compress_size, info.compress_type) == (
+                orig.CRC,
+                orig.compress_size,
+                orig.compress_type,
+            )
+        assert zd.read("book/02.jpg") == payload * 2
+
+    assert not list(out.parent.glob("*.koma_tmp"))
+
+
+def test_strip_members_invalid(tmp_path, handler_no_7z):
+    broken = tmp_path / "broken.zip"
+    broken.write_bytes(b"not a zip")
+    out = tmp_path / "out.zip"
+
+    assert handler_no_7z.strip_members(broken, out, set()) is False
+    assert handler_no_7z.strip_members(tmp_path / "a.7z", out, set()) is False
+    assert not out.exists()
+
+    # 需要移除的成员不存在时视为失败
+    src = tmp_path / "src.zip"
+    with zipfile.ZipFile(src, "w") as zf:
+        zf.writestr("book/01.jpg", b"a")
+    assert handler_no_7z.strip_members(src, out, {"book\\01.jpg"}) is False
+    assert not out.exists()
+    assert not list(tmp_path.glob("*.koma_tmp"))
@@ -0,0 +1,169 @@
+import numpy as np
+
+from koma.core.clustering import (
+    DisjointSet,
+    HammingIndex,
+    link_hamming,
+    link_shared_hashes,
+    link_similar,
+    link_similar_approx,
+    link_similar_texts,
+)
+
+
+def _clusters(n_groups: int, per_group: int, dim: int = 64, noise: float = 0.05):
+    """生成 n_groups 组相似向量，返回 (已归一化矩阵, 组标签)"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((n_groups, dim))
+    labels = np.repeat(np.arange(n_groups), per_group)
+    vectors = centers[labels] + rng.standard_normal((len(labels), dim)) * noise
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    perm = rng.permutation(len(labels))
+    return vectors[perm].astype(np.float32), labels[perm]
+
+
+def _as_sets(groups: list[list[int]]) -> set[frozenset[int]]:
+    return {frozenset(g) for g in groups}
+
+
+def test_disjoint_set():
+    """测试并查集合并与分组顺序"""
+    dsu = DisjointSet(6)
+    dsu.union(4, 1)
+    dsu.union(5, 3)
+    dsu.union(3, 1)
+    assert dsu.groups() == [[1, 3, 4, 5]]
+    assert dsu.find(5) == dsu.find(4)
+    assert dsu.find(0) == 0
+
+
+def test_link_similar_transitive_and_order_independent():
+    """测试超过阈值的配对传递合并，结果与输入顺序无关"""
+    a = np.array([1.0, 0.0, 0.0])
+    b = np.array([0.9, 0.436, 0.0])
+    c = np.array([0.64, 0.768, 0.0])
+    d = np.array([0.0, 0.0, 1.0])
+    vectors = np.stack([a, b, c, d]).astype(np.float32)
+
+    # a-b、b-c 相似，a-c 不相似，仍合并为同一组
+    assert float(a @ c) < 0.85
+    assert link_similar(vectors, 0.85).groups() == [[0, 1, 2]]
+
+    reordered = vectors[[2, 3, 0, 1]]
+    assert link_similar(reordered, 0.85).groups() == [[0, 2, 3]]
+
+
+def test_link_similar_across_blocks():
+    """测试分块边界两侧的配对同样被合并"""
+    vectors, labels = _clusters(10, 5)
+    expected = _as_sets([np.flatnonzero(labels == k).tolist() for k in range(10)])
+    assert _as_sets(link_similar(vectors, 0.9, block_size=7).groups()) == expected
+    assert _as_sets(link_similar(vectors, 0.9).groups()) == expected
+
+
+def test_link_similar_approx_matches_exact():
+    """测试近似比对在明显的重复组上与精确比对一致"""
+    vectors, _ = _clusters(200, 3)
+    exact = _as_sets(link_similar(vectors, 0.9).groups())
+    approx = _as_sets(link_similar_approx(vectors, 0.9).groups())
+    assert approx == exact
+
+
+def test_link_hamming_matches_brute_force():
+    """测试多索引哈希与两两比较结果一致"""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 1 << 63, 40, dtype=np.uint64) << np.uint64(1)
+    hashes = [int(h) for h in base]
+    # 每个基准哈希随机翻转若干位生成近似副本
+    for h in base[:20]:
+        bits = rng.choice(64, size=rng.integers(1, 12), replace=False)
+        hashes.append(int(h) ^ sum(1 << int(b) for b in bits))
+    hashes = np.array(hashes, dtype=np.uint64)
+
+    for d in (0, 3, 8, 11):
+        dsu = DisjointSet(len(hashes))
+        for i in range(len(hashes)):
+            for j in range(i + 1, len(hashes)):
+                if int(hashes[i] ^ hashes[j]).bit_count() <= d:
+                    dsu.union(i, j)
+        expected = _as_sets(dsu.groups())
+        assert _as_sets(link_hamming(hashes, d).groups()) == expected
+
+
+def test_hamming_index_matches_brute_force():
+    """测试多索引哈希表查询与逐个比较结果一致"""
+    rng = np.random.default_rng(1)
+    indexed = rng.integers(0, 1 << 63, 300, dtype=np.uint64) << np.uint64(1)
+    queries = [int(indexed[0]), 0]
+    for h in indexed[:40]:
+        bits = rng.choice(64, size=rng.integers(1, 12), replace=False)
+        queries.append(int(h) ^ sum(1 << int(b) for b in bits))
+    queries = np.array(queries, dtype=np.uint64)
+
+    index = HammingIndex(indexed)
+    assert len(index) == 300
+    for d in (0, 3, 8, 11):
+        expected = {
+            (q, i)
+            for q in range(len(queries))
+            for i in range(len(indexed))
+            if int(queries[q] ^ indexed[i]).bit_count() <= d
+        }
+        assert set(map(tuple, index.query(queries, d).tolist())) == expected
+    assert HammingIndex(np.empty(0, dtype=np.uint64)).query(queries, 8).shape == (0, 2)
+
+
+def test_link_similar_texts():
+    """测试 n-gram 模糊匹配：相近文本合并，数字不同不合并"""
+    texts = [
+        "circle my lovely sister 1",
+        "circle my lovley sister 1",
+        "circle my lovely sister 2",
+        "circle a completely different story 1",
+        "circle my lovely sister 01",
+    ]
+    groups = link_similar_texts(texts, 0.6).groups()
+    assert groups == [[0, 1, 4]]
+
+    # 阈值提高到 1 时只合并完全相同的 n-gram 集合
+    assert link_similar_texts([*texts, texts[3]], 1.0).groups() == [[3, 5]]
+    assert link_similar_texts(["only one"], 0.5).groups() == []
+
+
+def test_link_similar_texts_scales():
+    """测试大量互不相似的文本不会产生误合并"""
+    rng = np.random.default_rng(0)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    texts = ["".join(rng.choice(letters, 16)) for _ in range(5000)]
+    texts.append(texts[0][:-1] + "!")
+    assert link_similar_texts(texts, 0.7).groups() == [[0, 5000]]
+
+
+def test_link_shared_hashes():
+    """按匹配页数合并：单个页面相同不合并，同一对象内的相近哈希不计数"""
+    rng = np.random.default_rng(3)
+    pages = rng.integers(0, 2**63, 8, dtype=np.uint64)
+    flip = np.uint64(0b101)
+    owners = [0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3]
+    hashes = [
+        *pages[:4],
+        # 对象 1 与对象 0 有 3 页相近
+        pages[0] ^ flip,
+        pages[1],
+        pages[2] ^ flip,
+        pages[5],
+        # 对象 2 只有 1 页与对象 0 相同，其余页面彼此相同
+        pages[3],
+        pages[6],
+        pages[6],
+        pages[6],
+        # 对象 3 的多页都只匹配对象 0 的同一页
+        pages[0],
+        pages[0] ^ flip,
+        pages[0],
+        pages[7],
+    ]
+    dsu = link_shared_hashes(
+        np.array(owners), np.array(hashes, dtype=np.uint64), 4, min_shared=3
+    )
+    assert dsu.groups() == [[0, 1]]
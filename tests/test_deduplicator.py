@@ -1,3 +1,6 @@
+import io
+import os
+import zipfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
@@ -5,6 +8,8 @@ import numpy as np
 from PIL import Image
 
 from koma.core.deduplicator import Deduplicator, DuplicateItem
+from koma.core.embedding_cache import EmbeddingCache
+from koma.core.library_index import LibraryEntry, LibraryIndex
 
 
 def test_filename_mode_normalization(tmp_path, ext_config, dedupe_config):
@@ -45,9 +50,10 @@ def test_filename_mode_normalization(tmp_path, ext_config, dedupe_config):
 
 
 @patch("koma.core.deduplicator.Deduplicator._init_onnx")
-@patch("koma.core.deduplicator.Deduplicator._extract_embedding")
+@patch("koma.core.deduplicator.Deduplicator._embed_batch")
+@patch("koma.core.deduplicator.Deduplicator._load_cover")
 def test_cover_mode_clustering(
-    mock_extract, mock_init, tmp_path, ext_config, dedupe_config
+    mock_extract, mock_embed, mock_init, tmp_path, ext_config, dedupe_config
 ):
     """封面查重模式能否正确根据特征向量聚类"""
 
@@ -79,6 +85,9 @@ def test_cover_mode_clustering(
         return None
 
     mock_extract.side_effect = mock_extract_side_effect
+    # 预处理结果直接作为特征向量，批次中跳过无法读取的封面
+    mock_embed.side_effect = lambda batch: list(batch)
+    dedupe_config.cover_batch_size = 2
 
     deduper = Deduplicator(ext_config, dedupe_config)
 
@@ -116,8 +125,8 @@ def test_empty_input(ext_config, dedupe_config):
     assert results_invalid == {}
 
 
-def test_extract_embedding_internal_coverage(tmp_path, ext_config, dedupe_config):
-    """_extract_embedding 内部逻辑的测试"""
+def test_embed_cover_internal_coverage(tmp_path, ext_config, dedupe_config):
+    """封面读取与 _embed_batch 推理的内部逻辑测试"""
     deduper = Deduplicator(ext_config, dedupe_config)
 
     # 伪造 ONNX Session
@@ -131,6 +140,11 @@ def test_extract_embedding_internal_coverage(tmp_path, ext_config, dedupe_config
     mock_session.run.return_value = [fake_embedding]
     deduper.ort_session = mock_session
 
+    def embed(item):
+        tensor = deduper._load_cover(item)
+        assert tensor is not None
+        return deduper._embed_batch(tensor[np.newaxis])[0]
+
     # 普通文件夹 + RGB 图片
     folder_rgb = tmp_path / "rgb_folder"
     folder_rgb.mkdir()
@@ -138,7 +152,7 @@ def test_extract_embedding_internal_coverage(tmp_path, ext_config, dedupe_config
     Image.new("RGB", (100, 100), color="red").save(img_rgb_path)
 
     item_rgb = DuplicateItem(path=folder_rgb, is_archive=False)
-    emb_rgb = deduper._extract_embedding(item_rgb)
+    emb_rgb = embed(item_rgb)
     assert emb_rgb is not None
     assert emb_rgb.shape == (576,)
 
@@ -149,7 +163,7 @@ def test_extract_embedding_internal_coverage(tmp_path, ext_config, dedupe_config
     Image.new("RGBA", (100, 100), color=(255, 0, 0, 128)).save(img_rgba_path)
 
     item_rgba = DuplicateItem(path=folder_rgba, is_archive=False)
-    emb_rgba = deduper._extract_embedding(item_rgba)
+    emb_rgba = embed(item_rgba)
     assert emb_rgba is not None
 
     # 压缩包提取封面
@@ -157,10 +171,428 @@ def test_extract_embedding_internal_coverage(tmp_path, ext_config, dedupe_config
     deduper.archive_handler.extract_cover = MagicMock(
         return_value=Image.new("L", (50, 50))
     )
-    emb_archive = deduper._extract_embedding(item_archive)
+    emb_archive = embed(item_archive)
     assert emb_archive is not None
 
     # 异常处理
     mock_session.run.side_effect = Exception("模拟 ONNX 崩溃")
-    emb_error = deduper._extract_embedding(item_rgb)
+    emb_error = embed(item_rgb)
     assert emb_error is None  # 发生异常时应返回 None
+
+
+def test_embed_batch_respects_model_batch(ext_config, dedupe_config):
+    """批量推理：按模型允许的批大小拆分，输出逐行归一化"""
+    deduper = Deduplicator(ext_config, dedupe_config)
+    dedupe_config.cover_batch_size = 8
+
+    mock_session = MagicMock()
+    mock_input = MagicMock()
+    mock_input.name = "input"
+    mock_input.shape = [1, 3, 224, 224]
+    mock_session.get_inputs.return_value = [mock_input]
+    mock_session.run.side_effect = lambda _, feeds: [
+        feeds["input"].reshape(len(feeds["input"]), -1)[:, :576]
+    ]
+    deduper.ort_session = mock_session
+
+    rng = np.random.default_rng(0)
+    batch = rng.random((3, 3, 224, 224), dtype=np.float32)
+    embeddings = deduper._embed_batch(batch)
+
+    # 固定批大小为 1 的模型逐张推理
+    assert mock_session.run.call_count == 3
+    assert len(embeddings) == 3
+    for emb in embeddings:
+        assert emb.shape == (576,)
+        assert np.isclose(np.linalg.norm(emb), 1.0)
+
+    # 动态批大小的模型一次完成
+    mock_input.shape = ["batch", 3, 224, 224]
+    mock_session.run.reset_mock()
+    batched = deduper._embed_batch(batch)
+    assert mock_session.run.call_count == 1
+    for a, b in zip(embeddings, batched, strict=True):
+        assert np.allclose(a, b, atol=1e-5)
+
+
+def test_cover_mode_embedding_cache(tmp_path, ext_config, dedupe_config):
+    """封面特征缓存：未变化的文件不再提取封面，修改过的文件重新提取"""
+    input_dir = tmp_path / "covers"
+    input_dir.mkdir()
+    for name in ("a.zip", "b.zip"):
+        (input_dir / name).write_bytes(b"data")
+
+    cache = EmbeddingCache(tmp_path / "cache")
+    deduper = Deduplicator(ext_config, dedupe_config, cache)
+    deduper._init_onnx = MagicMock()
+    deduper.model_key = "model"
+    deduper._load_cover = MagicMock(return_value=np.array([1.0, 0.0, 0.0]))
+    deduper._embed_batch = MagicMock(side_effect=lambda batch: list(batch))
+
+    # 两个压缩包加上所在的文件夹本身
+    results = deduper.run([input_dir], mode="cover")
+    assert len(next(iter(results.values()))) == 3
+    assert deduper._load_cover.call_count == 3
+
+    results = deduper.run([input_dir], mode="cover")
+    assert len(next(iter(results.values()))) == 3
+    assert deduper._load_cover.call_count == 3
+
+    (input_dir / "b.zip").write_bytes(b"changed")
+    deduper.run([input_dir], mode="cover")
+    assert deduper._load_cover.call_count == 4
+    assert deduper._load_cover.call_args.args[0].path.name == "b.zip"
+
+    # 关闭缓存后全部重新提取
+    dedupe_config.enable_cover_cache = False
+    deduper.run([input_dir], mode="cover")
+    assert deduper._load_cover.call_count == 7
+
+
+def test_phash_mode(tmp_path, ext_config, dedupe_config):
+    """封面哈希模式：重新压缩、缩放的封面归为一组，无需 ONNX 模型"""
+    rng = np.random.default_rng(0)
+    cover = Image.fromarray(rng.integers(0, 256, (12, 8, 3), dtype=np.uint8)).resize(
+        (800, 1200), Image.Resampling.NEAREST
+    )
+    other = Image.fromarray(rng.integers(0, 256, (12, 8, 3), dtype=np.uint8)).resize(
+        (800, 1200), Image.Resampling.NEAREST
+    )
+
+    input_dir = tmp_path / "lib"
+    for name, img, kwargs in [
+        ("a", cover, {"quality": 95}),
+        ("a_small", cover.resize((400, 600)), {"quality": 40}),
+        ("b", other, {"quality": 95}),
+        ("blank", Image.new("RGB", (800, 1200), "white"), {}),
+    ]:
+        folder = input_dir / name
+        folder.mkdir(parents=True)
+        img.save(folder / "001.jpg", **kwargs)
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    with patch.object(deduper, "_init_onnx") as mock_init:
+        results = deduper.run([input_dir], mode="phash")
+        mock_init.assert_not_called()
+
+    assert len(results) == 1
+    names = {item.path.name for item in next(iter(results.values()))}
+    assert names == {"a", "a_small"}
+
+
+def test_zip_prefilter(tmp_path, ext_config, dedupe_config):
+    """压缩包目录预筛：完全相同的压缩包只分析一次，结果中仍包含全部副本"""
+    rng = np.random.default_rng(1)
+    covers = []
+    for _ in range(2):
+        buf = io.BytesIO()
+        Image.fromarray(rng.integers(0, 256, (12, 8, 3), dtype=np.uint8)).resize(
+            (400, 600), Image.Resampling.NEAREST
+        ).save(buf, "JPEG")
+        covers.append(buf.getvalue())
+
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    for name, pages in [
+        ("a.cbz", [covers[0], b"page"]),
+        ("a_copy.zip", [covers[0], b"page"]),
+        ("a_variant.zip", [covers[0], b"page", b"extra"]),
+        ("solo.zip", [covers[1]]),
+        ("solo_copy.cbz", [covers[1]]),
+    ]:
+        with zipfile.ZipFile(lib / name, "w") as zf:
+            for i, data in enumerate(pages):
+                zf.writestr(f"{i:03d}.jpg", data)
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    with patch.object(deduper, "_load_phash", wraps=deduper._load_phash) as load:
+        results = deduper.run([lib], mode="phash")
+
+    # 文件夹本身 + 3 个不重复的压缩包
+    assert load.call_count == 4
+    groups = sorted(sorted(i.path.name for i in items) for items in results.values())
+    assert groups == [
+        ["a.cbz", "a_copy.zip", "a_variant.zip"],
+        ["solo.zip", "solo_copy.cbz"],
+    ]
+    assert any(key.startswith("相同内容") for key in results)
+
+    # 关闭预筛时逐个分析，分组结果相同
+    dedupe_config.enable_zip_prefilter = False
+    with patch.object(deduper, "_load_phash", wraps=deduper._load_phash) as load:
+        results = deduper.run([lib], mode="phash")
+    assert load.call_count == 6
+    assert groups == sorted(
+        sorted(i.path.name for i in items) for items in results.values()
+    )
+
+
+def test_pages_mode(tmp_path, ext_config, dedupe_config):
+    """内页抽样模式：封面不同、页数略有差异的版本归为一组，只读取抽样页"""
+    rng = np.random.default_rng(2)
+
+    def page():
+        return Image.fromarray(rng.integers(0, 256, (12, 8, 3), dtype=np.uint8)).resize(
+            (200, 300), Image.Resampling.NEAREST
+        )
+
+    interior = [page() for _ in range(11)]
+    # 再版：封面不同，中间多一页，重新压缩
+    editions = {
+        "original.zip": ([page(), *interior], 95),
+        "reprint.zip": ([page(), *interior[:5], page(), *interior[5:]], 60),
+        "other.zip": ([page() for _ in range(12)], 95),
+    }
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    for name, (pages, quality) in editions.items():
+        with zipfile.ZipFile(lib / name, "w") as zf:
+            for i, img in enumerate(pages):
+                buf = io.BytesIO()
+                img.save(buf, "JPEG", quality=quality)
+                zf.writestr(f"{i:03d}.jpg", buf.getvalue())
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    handler = deduper.archive_handler
+    with patch.object(handler, "read_members", wraps=handler.read_members) as read:
+        results = deduper.run([lib], mode="pages")
+
+    # 每个归档只读取抽样的内页
+    assert read.call_count == 3
+    assert all(len(call.args[1]) < 12 for call in read.call_args_list)
+
+    assert len(results) == 1
+    names = {item.path.name for item in next(iter(results.values()))}
+    assert names == {"original.zip", "reprint.zip"}
+
+
+def test_library_check(tmp_path, ext_config, dedupe_config):
+    """书库比对：增量更新索引，只计算新增内容的指纹"""
+    rng = np.random.default_rng(4)
+
+    def jpeg(img, size=(400, 600), quality=95):
+        buf = io.BytesIO()
+        img.resize(size, Image.Resampling.NEAREST).save(buf, "JPEG", quality=quality)
+        return buf.getvalue()
+
+    covers = [
+        Image.fromarray(rng.integers(0, 256, (12, 8, 3), dtype=np.uint8))
+        for _ in range(3)
+    ]
+
+    def make_zip(path, pages):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(path, "w") as zf:
+            for i, data in enumerate(pages):
+                zf.writestr(f"{i:03d}.jpg", data)
+
+    lib = tmp_path / "lib"
+    make_zip(lib / "[Circle] Title A.zip", [jpeg(covers[0]), b"page-a"])
+    make_zip(lib / "[Circle] Title B.zip", [jpeg(covers[1]), b"page-b"])
+    inbox = tmp_path / "inbox"
+    make_zip(inbox / "[Circle] Title A.cbz", [jpeg(covers[0]), b"page-a"])
+    make_zip(inbox / "Renamed.zip", [jpeg(covers[1], (200, 300), 50), b"new"])
+    make_zip(inbox / "Unique.zip", [jpeg(covers[2]), b"page-u"])
+
+    library = LibraryIndex(tmp_path / "library.db")
+    deduper = Deduplicator(ext_config, dedupe_config, library_index=library)
+
+    # 文件夹本身 + 2 个压缩包
+    assert deduper.update_library([lib]) == 3
+    assert deduper.update_library([lib]) == 0
+    book_b = lib / "[Circle] Title B.zip"
+    os.utime(book_b, ns=(0, book_b.stat().st_mtime_ns + 10**9))
+    assert deduper.update_library([lib]) == 1
+
+    def groups(mode):
+        results = deduper.check_library([inbox], mode)
+        return sorted(
+            sorted(item.path.name for item in items) for items in results.values()
+        )
+
+    assert groups("filename") == [["[Circle] Title A.cbz", "[Circle] Title A.zip"]]
+    # 书库中的条目被标记，智能选择不会勾选
+    for items in deduper.check_library([inbox], "phash").values():
+        assert {item.path.parent for item in items if item.in_library} == {lib}
+        assert {item.path.parent for item in items if not item.in_library} == {inbox}
+    assert groups("content") == [["[Circle] Title A.cbz", "[Circle] Title A.zip"]]
+    assert groups("phash") == [
+        ["Renamed.zip", "[Circle] Title B.zip"],
+        ["[Circle] Title A.cbz", "[Circle] Title A.zip"],
+    ]
+
+    # 删除的条目从索引移除
+    (lib / "[Circle] Title A.zip").unlink()
+    deduper.update_library([lib])
+    assert library.count() == 2
+    assert groups("content") == []
+    library.close()
+
+
+def test_match_collections(tmp_path, ext_config, dedupe_config):
+    """跨书库比对：只使用导入的指纹，只返回跨越多个书库的分组"""
+
+    def entry(path, **kwargs):
+        fields = {"name_key": Path(path).stem, **kwargs}
+        return LibraryEntry(path, True, 1, 1, **fields)
+
+    with LibraryIndex(tmp_path / "remote.db") as remote:
+        remote.put_many(
+            [
+                entry("/remote/book.zip", signature=b"s1", phash=0b1111),
+                entry("/remote/other.zip", phash=0xFF00),
+            ]
+        )
+        remote.export(tmp_path / "remote.komadb", "NAS")
+
+    local = LibraryIndex(tmp_path / "local.db")
+    local.put_many(
+        [
+            entry("/local/book.zip", signature=b"s1"),
+            entry("/local/renamed.zip", phash=0b0111),
+            # 本机内部的重复不在结果中
+            entry("/local/dup/other2.zip", name_key="same"),
+            entry("/local/other2.zip", name_key="same"),
+        ]
+    )
+    local.import_file(tmp_path / "remote.komadb")
+    deduper = Deduplicator(ext_config, dedupe_config, library_index=local)
+
+    def groups(mode):
+        results = deduper.match_collections(mode)
+        return sorted(
+            sorted((item.collection, str(item.path)) for item in items)
+            for items in results.values()
+        )
+
+    assert groups("filename") == [
+        [("", "/local/book.zip"), ("NAS", "/remote/book.zip")]
+    ]
+    assert groups("content") == [[("", "/local/book.zip"), ("NAS", "/remote/book.zip")]]
+    assert groups("phash") == [
+        [("", "/local/renamed.zip"), ("NAS", "/remote/book.zip")]
+    ]
+    local.close()
+
+
+def test_fuzzy_filename_mode(tmp_path, ext_config, dedupe_config):
+    """模糊文件名模式：卷号写法、错别字差异归为一组，卷号不同不合并"""
+    files = [
+        "[Circle] My Lovely Sister Vol.1.zip",
+        "[Circle] My Lovely Sister 01 [中国翻訳].zip",
+        "[Circle (Author)] My Lovley Sister 1.cbz",
+        "[Circle] My Lovely Sister Vol.2.zip",
+        "[Circle] Another Story.zip",
+    ]
+    input_dir = tmp_path / "lib"
+    input_dir.mkdir()
+    for f in files:
+        (input_dir / f).touch()
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    assert deduper.run([input_dir], mode="filename") == {}
+
+    results = deduper.run([input_dir], mode="fuzzy")
+    assert len(results) == 1
+    names = {item.path.name for item in next(iter(results.values()))}
+    assert names == set(files[:3])
+
+
+def test_hybrid_mode(tmp_path, ext_config, dedupe_config):
+    """混合模式：只对文件名候选组提取封面，封面相似才确认"""
+    covers = {
+        "[Circle] Sister Vol.1.zip": [1.0, 0.0, 0.0],
+        "[Circle] Sister 01 [中国翻訳].cbz": [0.95, 0.312, 0.0],
+        "[Circle] Another Story.zip": [0.0, 1.0, 0.0],
+        "[Circle (Author)] Another Story.zip": [0.0, 0.0, 1.0],
+        "[Other] Unique.zip": [1.0, 0.0, 0.0],
+    }
+    input_dir = tmp_path / "lib"
+    input_dir.mkdir()
+    for f in covers:
+        (input_dir / f).touch()
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    with (
+        patch.object(deduper, "_init_onnx"),
+        patch.object(
+            deduper,
+            "_load_cover",
+            side_effect=lambda item: np.array(covers[item.path.name]),
+        ) as load,
+        patch.object(deduper, "_embed_batch", side_effect=lambda batch: list(batch)),
+    ):
+        results = deduper.run([input_dir], mode="hybrid", similarity_threshold=85)
+
+    # 没有同名候选的条目不提取封面
+    loaded = {call.args[0].path.name for call in load.call_args_list}
+    assert loaded == set(list(covers)[:4])
+
+    assert len(results) == 1
+    names = {item.path.name for item in next(iter(results.values()))}
+    assert names == set(list(covers)[:2])
+
+
+def test_hybrid_mode_zip_prefilter(tmp_path, ext_config, dedupe_config):
+    """混合模式：候选组中内容完全相同的压缩包只提取一次封面"""
+    input_dir = tmp_path / "lib"
+    input_dir.mkdir()
+    names = [
+        "[Circle] Sister Vol.1.zip",
+        "[Circle] Sister 01.cbz",
+        "[Circle] Sister 1.zip",
+    ]
+    for name, page in zip(names, [b"same", b"same", b"other"], strict=True):
+        with zipfile.ZipFile(input_dir / name, "w") as zf:
+            zf.writestr("001.jpg", page)
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    with (
+        patch.object(deduper, "_init_onnx"),
+        patch.object(
+            deduper, "_load_cover", side_effect=lambda item: np.array([1.0, 0.0])
+        ) as load,
+        patch.object(deduper, "_embed_batch", side_effect=lambda batch: list(batch)),
+    ):
+        results = deduper.run([input_dir], mode="hybrid", similarity_threshold=85)
+
+    assert load.call_count == 2
+    assert len(results) == 1
+    assert {item.path.name for item in next(iter(results.values()))} == set(names)
+
+
+def test_content_mode(tmp_path, ext_config, dedupe_config):
+    """内容模式：页面相同的文件夹与压缩包归为一组，不解压、不解码"""
+    pages = [b"page-one" * 100, b"page-two" * 200]
+    other = [b"PAGE-ONE" * 100, b"PAGE-TWO" * 200]  # 大小相同，内容不同
+
+    lib = tmp_path / "lib"
+    for name, data in [("folder_a", pages), ("folder_b", pages), ("folder_c", other)]:
+        folder = lib / name
+        folder.mkdir(parents=True)
+        for i, page in enumerate(data):
+            (folder / f"{i:03d}.jpg").write_bytes(page)
+        (folder / "info.txt").write_text("not a page")
+
+    with zipfile.ZipFile(lib / "book.cbz", "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("p1.jpg", pages[0])
+        zf.writestr("p2.jpg", pages[1])
+        zf.writestr("__MACOSX/._p1.jpg", b"junk")
+    with zipfile.ZipFile(lib / "other.zip", "w") as zf:
+        zf.writestr("01.jpg", other[0])
+        zf.writestr("02.jpg", other[1])
+        zf.writestr("03.jpg", b"extra page")
+
+    deduper = Deduplicator(ext_config, dedupe_config)
+    with (
+        patch.object(deduper.archive_handler, "read_member") as mock_read,
+        patch("koma.core.deduplicator.Image.open") as mock_open,
+    ):
+        results = deduper.run([lib], mode="content")
+        mock_read.assert_not_called()
+        mock_open.assert_not_called()
+
+    assert len(results) == 1
+    key, group = next(iter(results.items()))
+    assert key.startswith("相同内容")
+    assert {item.path.name for item in group} == {"folder_a", "folder_b", "book.cbz"}
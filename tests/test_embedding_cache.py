@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from koma.core.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = EmbeddingCache(tmp_path / "cache")
+    c.open("model-a")
+    yield c
+    c.close()
+
+
+def _vec(seed: int) -> np.ndarray:
+    v = np.random.default_rng(seed).standard_normal(576).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_get_and_put(cache):
+    """测试按 路径 + 大小 + 修改时间 命中"""
+    assert cache.get("/a.zip", 10, 100) is None
+
+    cache.put("/a.zip", 10, 100, _vec(0))
+    cache.put("/b.zip", 20, 200, _vec(1))
+
+    emb = cache.get("/a.zip", 10, 100)
+    assert emb is not None
+    assert emb.dtype == np.float32
+    assert np.allclose(emb, _vec(0), atol=1e-3)
+
+    # 大小或修改时间变化视为未命中
+    assert cache.get("/a.zip", 11, 100) is None
+    assert cache.get("/a.zip", 10, 101) is None
+
+    # 更新已有条目复用原来的行
+    cache.put("/a.zip", 11, 100, _vec(2))
+    assert np.allclose(cache.get("/a.zip", 11, 100), _vec(2), atol=1e-3)  # type: ignore
+    assert np.allclose(cache.get("/b.zip", 20, 200), _vec(1), atol=1e-3)  # type: ignore
+    assert cache.count() == 2
+    assert cache.matrix_path.stat().st_size == 2 * 576 * 2
+
+
+def test_persist_and_model_change(tmp_path):
+    """测试重新打开后保留，模型变化时整个缓存失效"""
+    with EmbeddingCache(tmp_path) as c:
+        c.open("model-a")
+        c.put("/a.zip", 10, 100, _vec(0))
+
+    c = EmbeddingCache(tmp_path)
+    c.open("model-a")
+    assert np.allclose(c.get("/a.zip", 10, 100), _vec(0), atol=1e-3)  # type: ignore
+    c.close()
+
+    c.open("model-b")
+    assert c.get("/a.zip", 10, 100) is None
+    assert c.count() == 0
+    c.put("/a.zip", 10, 100, _vec(3))
+    assert np.allclose(c.get("/a.zip", 10, 100), _vec(3), atol=1e-3)  # type: ignore
+
+    c.clear()
+    assert c.count() == 0
+    assert c.get("/a.zip", 10, 100) is None
+    c.close()
+
+
+def test_prune_and_compact(tmp_path, cache):
+    """测试清理已删除文件的条目并压缩矩阵，剩余条目的特征不变"""
+    files = [tmp_path / f"{i}.zip" for i in range(4)]
+    for i, f in enumerate(files):
+        f.touch()
+        cache.put(str(f), 10, 100, _vec(i))
+    files[0].unlink()
+    files[2].unlink()
+
+    assert cache.prune() == 2
+    assert cache.count() == 2
+    assert cache.matrix_path.stat().st_size == 2 * 576 * 2
+    assert cache.get(str(files[0]), 10, 100) is None
+    for i in (1, 3):
+        emb = cache.get(str(files[i]), 10, 100)
+        assert np.allclose(emb, _vec(i), atol=1e-3)  # type: ignore
+
+    # 新写入的条目追加在压缩后的末尾
+    files[0].touch()
+    cache.put(str(files[0]), 10, 100, _vec(5))
+    assert cache.matrix_path.stat().st_size == 3 * 576 * 2
+    cache.close()
+
+    # 重新打开后行号保持一致；超过清理间隔时打开即自动清理
+    files[1].unlink()
+    with EmbeddingCache(tmp_path / "cache") as c:
+        c.open("model-a")
+        assert c.count() == 3
+        c._set_meta("pruned_at", "0")
+        c.close()
+        c.open("model-a")
+        assert c.count() == 2
+        assert np.allclose(c.get(str(files[3]), 10, 100), _vec(3), atol=1e-3)  # type: ignore
+        assert np.allclose(c.get(str(files[0]), 10, 100), _vec(5), atol=1e-3)  # type: ignore
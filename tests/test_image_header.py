@@ -0,0 +1,70 @@
+import io
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from koma.core.image_header import HeaderInfo, probe_header
+from koma.core.image_processor import ImageInfo, ImageProcessor
+
+
+def _pil_bytes(frames, fmt, **kwargs):
+    buf = io.BytesIO()
+    frames[0].save(
+        buf, fmt, save_all=len(frames) > 1, append_images=frames[1:], **kwargs
+    )
+    return buf.getvalue()
+
+
+def _frames(mode, count):
+    return [Image.new(mode, (16, 16), i * 40) for i in range(count)]
+
+
+def test_probe_jpeg_components():
+    """测试 JPEG：单分量即灰度，三分量需解码判断"""
+    gray = _pil_bytes(_frames("L", 1), "JPEG")
+    color = _pil_bytes(_frames("RGB", 1), "JPEG")
+
+    assert probe_header(gray) == HeaderInfo("jpeg", False, True)
+    assert probe_header(color) == HeaderInfo("jpeg", False, None)
+
+
+def test_probe_png_and_apng():
+    """测试 PNG：IHDR 颜色类型与 acTL 动画块"""
+    assert probe_header(_pil_bytes(_frames("L", 1), "PNG")) == HeaderInfo(
+        "png", False, True
+    )
+    assert probe_header(_pil_bytes(_frames("LA", 1), "PNG")).is_grayscale is True
+    assert probe_header(_pil_bytes(_frames("RGB", 1), "PNG")) == HeaderInfo(
+        "png", False, None
+    )
+    assert probe_header(_pil_bytes(_frames("RGB", 3), "PNG")).is_animated is True
+
+
+def test_probe_webp_gif_and_unknown():
+    """测试 WebP 动画标志位、GIF 及未知格式"""
+    assert probe_header(_pil_bytes(_frames("RGB", 1), "WEBP")).is_animated is False
+    assert probe_header(_pil_bytes(_frames("RGB", 3), "WEBP")) == HeaderInfo("webp")
+    assert probe_header(_pil_bytes(_frames("L", 1), "GIF")) == HeaderInfo("gif")
+    assert probe_header(_pil_bytes(_frames("RGB", 1), "BMP")) == HeaderInfo(
+        "bmp", False
+    )
+    assert probe_header(b"") == HeaderInfo()
+    assert probe_header(b"\x89PNG\r\n\x1a\n\x00") == HeaderInfo("png")
+
+
+def test_inspect_skips_decoder(tmp_path, scanner_config):
+    """测试文件头已能确定结果时，综合分析不打开解码器"""
+    processor = ImageProcessor(scanner_config)
+    p = tmp_path / "gray.png"
+    cv2.imwrite(str(p), np.full((30, 30), 200, dtype=np.uint8))
+
+    with (
+        patch("koma.core.image_processor.cv2.imdecode") as m_decode,
+        patch.object(processor, "_check_is_animated") as m_anim,
+    ):
+        assert processor.inspect(p) == ImageInfo(is_grayscale=True)
+
+    m_decode.assert_not_called()
+    m_anim.assert_not_called()
@@ -1,10 +1,13 @@
+import threading
 from unittest.mock import MagicMock, patch
 
 import cv2
 import numpy as np
 import pytest
 
-from koma.core.image_processor import ImageProcessor
+from koma.core.ad_blocklist import AdBlocklist
+from koma.core.image_processor import ImageInfo, ImageProcessor
+from koma.core.qr_cache import QrVerdictCache
 
 
 @pytest.fixture
@@ -87,3 +90,185 @@ def test_ad_whitelist_pass(tmp_path, processor):
     ):
         is_ad = processor.has_ad_qrcode(p)
         assert is_ad is False
+
+
+def test_qr_detector_per_thread(processor):
+    """测试每个线程持有独立的二维码检测器"""
+    processor._qr_detector = MagicMock()
+    main_detector = processor._qr_detector
+
+    seen = []
+
+    def worker():
+        seen.append(processor._qr_detector)
+        processor._qr_detector = MagicMock()
+        seen.append(processor._qr_detector)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+
+    assert seen[0] is None
+    assert seen[1] is not main_detector
+    assert processor._qr_detector is main_detector
+
+
+def test_ad_verdict_cache(tmp_path, processor):
+    """测试二维码检测缓存：相同内容不再解码，白名单变化实时生效"""
+    processor._qr_detector = MagicMock()
+    processor._qr_engine_type = "WECHAT"
+    processor._qr_detector.detectAndDecode.return_value = (
+        ["https://pixiv.net/artworks/1"],
+        None,
+    )
+    processor.config.enable_ad_scan = True
+    processor.config.enable_qr_prefilter = False
+    processor.config.qr_whitelist = ["pixiv.net"]
+    processor.verdict_cache = QrVerdictCache(tmp_path / "qr_cache.db")
+
+    img = np.zeros((20, 20, 3), dtype=np.uint8)
+    for name in ("a.png", "b.png"):
+        cv2.imwrite(str(tmp_path / name), img)
+
+    assert processor.has_ad_qrcode(tmp_path / "a.png") is False
+    assert processor._qr_detector.detectAndDecode.call_count == 1
+
+    # 相同内容的另一张图片直接命中缓存
+    assert processor.has_ad_qrcode(tmp_path / "b.png") is False
+    data = (tmp_path / "b.png").read_bytes()
+    assert processor.has_ad_qrcode_data(data, "b.png") is False
+    assert processor._qr_detector.detectAndDecode.call_count == 1
+
+    # 白名单移除后，缓存的链接被重新判定为广告
+    processor.config.qr_whitelist = []
+    assert processor.has_ad_qrcode(tmp_path / "a.png") is True
+    assert processor._qr_detector.detectAndDecode.call_count == 1
+
+    # 关闭缓存后重新检测
+    processor.config.enable_qr_cache = False
+    assert processor.has_ad_qrcode(tmp_path / "a.png") is True
+    assert processor._qr_detector.detectAndDecode.call_count == 2
+    processor.verdict_cache.close()
+
+
+@pytest.mark.parametrize("engine", ["STANDARD", "PREFILTER"])
+def test_ad_verdict_cache_skips_inconclusive(tmp_path, processor, engine):
+    """测试回退检测器与预筛拒绝的结论不写入缓存"""
+    processor._qr_detector = MagicMock()
+    if engine == "STANDARD":
+        processor._qr_engine_type = "STANDARD"
+        processor._qr_detector.detectAndDecode.return_value = ("", None, None)
+    else:
+        processor._qr_engine_type = "WECHAT"
+        processor._qr_detector.detectAndDecode.return_value = ([], None)
+        processor.config.enable_qr_prefilter = True
+    processor.config.enable_ad_scan = True
+    processor.verdict_cache = QrVerdictCache(tmp_path / "qr_cache.db")
+
+    img = np.zeros((20, 20, 3), dtype=np.uint8)
+    cv2.imwrite(str(tmp_path / "a.png"), img)
+
+    assert processor.has_ad_qrcode(tmp_path / "a.png") is False
+    assert processor.verdict_cache.count() == 0
+
+    # 切换到完整检测器后重新检测并写入缓存
+    processor._qr_engine_type = "WECHAT"
+    processor._qr_detector.detectAndDecode.return_value = (
+        ["https://ad.example.com"],
+        None,
+    )
+    processor.config.enable_qr_prefilter = False
+    assert processor.has_ad_qrcode(tmp_path / "a.png") is True
+    assert processor.verdict_cache.count() == 1
+    processor.verdict_cache.close()
+
+
+@pytest.mark.parametrize("mmap_threshold", [0, 1 << 30])
+def test_inspect_decodes_once(tmp_path, processor, monkeypatch, mmap_threshold):
+    """测试综合分析只解码一次，同时给出灰度与二维码结果 (含 mmap 读取)"""
+    monkeypatch.setattr("koma.core.image_processor.MMAP_THRESHOLD", mmap_threshold)
+    processor._qr_detector = MagicMock()
+    processor._qr_engine_type = "STANDARD"
+    processor._qr_detector.detectAndDecode.return_value = (
+        "http://spam.com",
+        None,
+        None,
+    )
+    processor.config.enable_ad_scan = True
+
+    p = tmp_path / "gray.png"
+    cv2.imwrite(str(p), np.full((50, 50, 3), 128, dtype=np.uint8))
+
+    with patch(
+        "koma.core.image_processor.cv2.imdecode", wraps=cv2.imdecode
+    ) as m_decode:
+        info = processor.inspect(p, check_ad=True)
+        assert info == ImageInfo(is_animated=False, is_grayscale=True, has_ad=True)
+        assert m_decode.call_count == 1
+
+        # 不检测广告时不调用检测器
+        assert processor.inspect(p).has_ad is False
+        assert processor._qr_detector.detectAndDecode.call_count == 1
+
+        data = p.read_bytes()
+        assert processor.inspect_data(data, "gray.png", check_ad=True).has_ad is True
+
+
+def test_inspect_jpeg_reduced_decode(tmp_path, processor):
+    """测试 JPEG 灰度判断使用 1/8 缩小解码"""
+    gray = tmp_path / "gray.jpg"
+    cv2.imwrite(str(gray), np.full((400, 300, 3), 128, dtype=np.uint8))
+    color = tmp_path / "color.jpg"
+    color_data = np.zeros((400, 300, 3), dtype=np.uint8)
+    color_data[:] = (0, 0, 255)
+    cv2.imwrite(str(color), color_data)
+
+    with patch(
+        "koma.core.image_processor.cv2.imdecode", wraps=cv2.imdecode
+    ) as m_decode:
+        assert processor.inspect(gray).is_grayscale is True
+        assert processor.inspect(color).is_grayscale is False
+
+    flags = [c.args[1] for c in m_decode.mock_calls]
+    assert flags == [cv2.IMREAD_REDUCED_COLOR_8] * 2
+
+
+def test_ad_blocklist_learns_pages(tmp_path, processor):
+    """测试确认的广告页被记住，二维码无法识别的重新压缩版本同样判定为广告"""
+    processor._qr_detector = MagicMock()
+    processor._qr_engine_type = "STANDARD"
+    processor._qr_detector.detectAndDecode.return_value = (
+        "http://spam.com",
+        None,
+        None,
+    )
+    processor.config.enable_ad_scan = True
+    processor.config.qr_whitelist = []
+    processor.ad_blocklist = AdBlocklist(tmp_path / "ad_blocklist.db")
+
+    rng = np.random.default_rng(0)
+    page = cv2.resize(
+        rng.integers(0, 256, (12, 8, 3), dtype=np.uint8),
+        (400, 600),
+        interpolation=cv2.INTER_NEAREST,
+    )
+    cv2.imwrite(str(tmp_path / "ad.png"), page)
+    cv2.imwrite(str(tmp_path / "copy.jpg"), page, [cv2.IMWRITE_JPEG_QUALITY, 50])
+
+    assert processor.inspect(tmp_path / "ad.png", check_ad=True).has_ad is True
+    assert processor.ad_blocklist.count() == 1
+
+    processor._qr_detector.detectAndDecode.return_value = ("", None, None)
+    processor._qr_detector.detectAndDecode.reset_mock()
+    assert processor.inspect(tmp_path / "copy.jpg", check_ad=True).has_ad is True
+    processor._qr_detector.detectAndDecode.assert_not_called()
+
+    # 链接加入白名单后，已记住的广告页失效
+    processor.config.qr_whitelist = ["spam.com"]
+    assert processor.inspect(tmp_path / "copy.jpg", check_ad=True).has_ad is False
+
+    # 关闭后不再查询广告图库
+    processor.config.qr_whitelist = []
+    processor.config.enable_ad_blocklist = False
+    assert processor.inspect(tmp_path / "copy.jpg", check_ad=True).has_ad is False
+    processor.ad_blocklist.close()
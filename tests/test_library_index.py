@@ -0,0 +1,113 @@
+import pytest
+
+from koma.core.library_index import LibraryEntry, LibraryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = LibraryIndex(tmp_path / "library.db")
+    idx.open()
+    yield idx
+    idx.close()
+
+
+def _entry(path: str, **kwargs) -> LibraryEntry:
+    fields = {"name_key": path.rsplit("/", 1)[-1], **kwargs}
+    return LibraryEntry(path, True, 10, 100, **fields)
+
+
+def test_stamps_and_remove(index, tmp_path):
+    """测试按目录列出已索引条目，不包含前缀相同的其他目录"""
+    root = tmp_path / "lib"
+    index.put_many(
+        [
+            _entry(str(root)),
+            _entry(str(root / "a.zip")),
+            _entry(str(root / "sub" / "b.zip")),
+            _entry(str(tmp_path / "lib2" / "c.zip")),
+        ]
+    )
+
+    assert set(index.stamps(root)) == {
+        str(root),
+        str(root / "a.zip"),
+        str(root / "sub" / "b.zip"),
+    }
+    assert index.stamps(root)[str(root / "a.zip")] == (10, 100)
+
+    index.remove_many([str(root / "a.zip")])
+    assert str(root / "a.zip") not in index.stamps(root)
+    assert index.count() == 3
+
+
+def test_find(index):
+    """测试按文件名键、目录摘要与封面哈希查询"""
+    high = (1 << 64) - 1  # 超出有符号 64 位范围
+    index.put_many(
+        [
+            _entry("/lib/a.zip", name_key="a", phash=high, signature=b"sig-a"),
+            _entry("/lib/b.zip", name_key="b", phash=0),
+            _entry("/lib/c.zip", name_key="a"),
+        ]
+    )
+
+    assert {e.path for e in index.find_by_name(["a", "x"])} == {
+        "/lib/a.zip",
+        "/lib/c.zip",
+    }
+    assert [e.path for e in index.find_by_signature([b"sig-a"])] == ["/lib/a.zip"]
+
+    near = index.find_near_phash([high ^ 0b111, high ^ 0b11], 2)
+    assert [(q, e.path) for q, e in near] == [(1, "/lib/a.zip")]
+    assert near[0][1].phash == high
+    assert index.find_near_phash([high ^ 0b111], 2) == []
+
+    # 写入后重新构建哈希表
+    index.put_many([_entry("/lib/d.zip", phash=0b1)])
+    assert {e.path for _, e in index.find_near_phash([0], 1)} == {
+        "/lib/b.zip",
+        "/lib/d.zip",
+    }
+
+    index.clear()
+    assert index.count() == 0
+    assert index.find_near_phash([0], 1) == []
+
+
+def test_export_import(tmp_path):
+    """测试导出、导入合并：同名书库整体替换，本机书库的条目不会重复导入"""
+    with LibraryIndex(tmp_path / "a.db") as a, LibraryIndex(tmp_path / "b.db") as b:
+        a.put_many([_entry("/a/x.zip", phash=(1 << 64) - 1), _entry("/a/y.zip")])
+        b.put_many([_entry("/b/z.zip")])
+
+        assert a.export(tmp_path / "a.komadb", "A") == 2
+        assert b.import_file(tmp_path / "a.komadb") == {"A": 2}
+        assert b.collections() == {"A": 2}
+        remote = [e for e in b.entries() if e.collection == "A"]
+        assert {e.path for e in remote} == {"/a/x.zip", "/a/y.zip"}
+        assert max(e.phash or 0 for e in remote) == (1 << 64) - 1
+
+        # B 的导出包含已导入的 A，A 导入时跳过自己的条目
+        assert b.export(tmp_path / "b.komadb", "B") == 3
+        assert a.import_file(tmp_path / "b.komadb") == {"B": 1}
+        assert a.collections() == {"B": 1}
+
+        # 重新导入时替换旧数据
+        a.remove_many(["/a/y.zip"])
+        a.export(tmp_path / "a.komadb", "A")
+        b.import_file(tmp_path / "a.komadb")
+        assert b.collections() == {"A": 1}
+
+        # 从未导出过的书库同样跳过自己的条目
+        with LibraryIndex(tmp_path / "c.db", collection="C") as c:
+            c.put_many([_entry("/c/w.zip")])
+            with LibraryIndex(tmp_path / "other.db") as other:
+                other.put_many([_entry("/c/w.zip")])
+                other.export(tmp_path / "c.komadb", "C")
+            assert c.import_file(tmp_path / "c.komadb") == {}
+            assert c.collections() == {}
+
+        (tmp_path / "bad.komadb").write_bytes(b"not a database" * 100)
+        with pytest.raises(ValueError):
+            b.import_file(tmp_path / "bad.komadb")
+        assert b.collections() == {"A": 1}
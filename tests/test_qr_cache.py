@@ -0,0 +1,57 @@
+import pytest
+
+from koma.core.qr_cache import (
+    BLOCK_SIZE,
+    QrVerdictCache,
+    full_hash_of_data,
+    quick_key_of_data,
+    quick_key_of_file,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with QrVerdictCache(tmp_path / "cache" / "qr_cache.db") as c:
+        yield c
+
+
+def test_quick_key_file_matches_data(tmp_path):
+    """测试文件与内存数据的快速指纹一致，只看首尾块"""
+    small = b"small image"
+    big = b"a" * BLOCK_SIZE + b"middle" + b"z" * BLOCK_SIZE
+    for i, data in enumerate((small, big)):
+        p = tmp_path / f"{i}.jpg"
+        p.write_bytes(data)
+        assert quick_key_of_file(p) == quick_key_of_data(data)
+
+    # 中间内容不同：快速指纹相同，完整哈希不同
+    other = b"a" * BLOCK_SIZE + b"MIDDLE" + b"z" * BLOCK_SIZE
+    assert quick_key_of_data(other) == quick_key_of_data(big)
+    assert full_hash_of_data(other) != full_hash_of_data(big)
+    assert full_hash_of_data(small) == ""
+
+
+def test_cache_lookup_and_collision(cache):
+    """测试缓存命中以及快速指纹冲突时用完整哈希区分"""
+    calls = []
+
+    def full(value):
+        def fn():
+            calls.append(value)
+            return value
+
+        return fn
+
+    assert cache.lookup("k", full("h1")) is None
+    assert calls == []  # 未命中时不计算完整哈希
+
+    cache.store("k", "h1", ["https://spam.example"])
+    cache.store("k", "h2", [])
+
+    assert cache.lookup("k", full("h1")) == ["https://spam.example"]
+    assert cache.lookup("k", full("h2")) == []
+    assert cache.lookup("k", full("h3")) is None
+    assert cache.count() == 2
+
+    cache.clear()
+    assert cache.count() == 0
@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock
+
+import cv2
+import numpy as np
+import pytest
+
+from koma.core.image_processor import ImageProcessor
+from koma.core.qr_prefilter import QrPrefilter
+
+
+def _page(qr_size=0, pos=(-1, -1), shape=(3000, 2100)):
+    """白底漫画页，可在指定位置放置二维码 (负数表示从右/下边缘计算)"""
+    page = np.full(shape, 255, dtype=np.uint8)
+    for i in range(0, shape[0], 150):
+        cv2.rectangle(page, (40, i + 20), (shape[1] - 40, i + 120), 0, 3)
+        cv2.putText(page, "manga text", (80, i + 90), cv2.FONT_HERSHEY_SIMPLEX, 2, 0, 3)
+
+    if qr_size:
+        qr = cv2.QRCodeEncoder.create().encode("https://spam.example.com/ad")  # type: ignore
+        qr = cv2.resize(qr, (qr_size, qr_size), interpolation=cv2.INTER_NEAREST)
+        y = pos[0] if pos[0] >= 0 else shape[0] - qr_size - 60
+        x = pos[1] if pos[1] >= 0 else shape[1] - qr_size - 60
+        page[y : y + qr_size, x : x + qr_size] = qr
+    return page
+
+
+def test_prefilter_stages():
+    """测试缩略图与角落区域两级预筛及计数"""
+    prefilter = QrPrefilter()
+
+    assert prefilter.is_candidate(_page(400)) is True
+    # 小二维码在缩略图中无法识别，由角落区域命中
+    assert prefilter.is_candidate(_page(80, pos=(60, 60))) is True
+    assert prefilter.is_candidate(_page()) is False
+
+    stats = prefilter.stats
+    assert (stats.downscale_hits, stats.roi_hits, stats.rejected) == (1, 1, 1)
+
+    prefilter.reset_stats()
+    assert prefilter.stats.rejected == 0
+
+
+@pytest.mark.parametrize("audit", [False, True])
+def test_prefilter_gates_wechat_detector(scanner_config, audit):
+    """测试只有候选图片才交给微信检测器；审计模式统计漏检"""
+    processor = ImageProcessor(scanner_config)
+    processor.qr_prefilter.audit = audit
+    processor._qr_detector = MagicMock()
+    processor._qr_engine_type = "WECHAT"
+    processor._qr_detector.detectAndDecode.return_value = (["https://spam.com"], None)
+
+    assert processor._detect_qr_urls(_page(300)) == ["https://spam.com"]
+    assert processor._detect_qr_urls(_page()) == []
+
+    calls = processor._qr_detector.detectAndDecode.call_count
+    stats = processor.qr_stats
+    assert stats.detector_hits == 1
+    assert calls == (2 if audit else 1)
+    assert stats.missed == (1 if audit else 0)
+
+    # 关闭预筛后所有图片都交给检测器
+    processor.config.enable_qr_prefilter = False
+    assert processor._detect_qr_urls(_page()) == ["https://spam.com"]
+
+
+def test_prefilter_audit_config_and_reset(scanner_config):
+    """测试审计模式由配置开启，每次扫描前统计清零"""
+    scanner_config.qr_prefilter_audit = True
+    processor = ImageProcessor(scanner_config)
+    assert processor.qr_prefilter.audit is True
+
+    processor._qr_detector = MagicMock()
+    processor._qr_engine_type = "WECHAT"
+    processor._qr_detector.detectAndDecode.return_value = (["https://spam.com"], None)
+    assert processor._detect_qr_urls(_page()) == []
+    assert processor.qr_stats.missed == 1
+
+    scanner_config.qr_prefilter_audit = False
+    processor.reset_qr_stats()
+    assert processor.qr_prefilter.audit is False
+    assert processor.qr_stats.missed == 0
+    assert processor.qr_stats.rejected == 0
@@ -0,0 +1,149 @@
+import os
+
+import pytest
+
+from koma.core.ad_blocklist import AdBlocklist
+from koma.core.image_processor import ImageInfo, ImageProcessor
+from koma.core.scan_index import IndexedFile, ScanIndex
+from koma.core.scanner import Scanner
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ScanIndex(tmp_path / "index" / "scan_index.db")
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "library"
+    for vol in ("vol1", "vol2"):
+        (root / vol).mkdir(parents=True)
+        for name in ("01.jpg", "02.jpg", "99_ad.jpg", "info.txt"):
+            (root / vol / name).write_bytes(b"data")
+    return root
+
+
+def test_index_roundtrip_and_stats(index):
+    """测试索引读写、清理与统计"""
+    files = {
+        "01.jpg": IndexedFile(10, 1, "convert"),
+        "info.txt": IndexedFile(5, 2, "junk"),
+    }
+    index.update_dir("/lib/a", 123, "sig", files)
+    index.update_dir("/lib/a/b", 456, "sig", {})
+    index.update_dir("/lib/ab", 789, "sig", {})
+
+    cached = index.get_dir("/lib/a")
+    assert cached is not None
+    assert cached.mtime_ns == 123
+    assert cached.files == files
+    assert index.get_dir("/missing") is None
+
+    # /lib/ab 与 /lib/a 前缀相同，但不属于 /lib/a 子树
+    removed = index.prune("/lib/a", visited={"/lib/a"})
+    assert removed == 1
+    assert index.get_dir("/lib/a/b") is None
+    assert index.get_dir("/lib/ab") is not None
+
+    stats = index.stats()
+    assert stats.dirs == 2
+    assert stats.files == 2
+    assert stats.categories == {"convert": 1, "junk": 1}
+    assert stats.db_size > 0
+
+    index.clear()
+    assert index.stats().dirs == 0
+    index.close()
+
+
+def test_scanner_reuses_index(library, index, ext_config, mock_image_processor):
+    """测试未变化的文件夹直接复用索引，不再做广告检测"""
+    mock_image_processor.analyze.return_value = ImageInfo(False, False)
+    mock_image_processor.has_ad_qrcode.side_effect = lambda p: "ad" in p.name
+    options = {"enable_ad_scan": True}
+
+    scanner = Scanner(library, ext_config, mock_image_processor, index)
+    first = {root.name: res for root, res in scanner.run(options=options)}
+    assert [p.name for p in first["vol1"].ads] == ["99_ad.jpg"]
+    calls_after_first = mock_image_processor.has_ad_qrcode.call_count
+
+    # 第二次扫描：全部来自索引，结果一致
+    second = {root.name: res for root, res in scanner.run(options=options)}
+    assert mock_image_processor.has_ad_qrcode.call_count == calls_after_first
+    assert second == first
+
+    # 修改 vol2 后，仅 vol2 重新分析
+    (library / "vol2" / "03.jpg").write_bytes(b"new")
+    third = {root.name: res for root, res in scanner.run(options=options)}
+    assert [p.name for p in third["vol2"].to_convert] == ["01.jpg", "02.jpg", "03.jpg"]
+    assert mock_image_processor.has_ad_qrcode.call_count == calls_after_first + 2
+
+    # 内容变化但文件名不变，同样触发重新分析
+    target = library / "vol1" / "01.jpg"
+    target.write_bytes(b"changed content")
+    st = target.stat()
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    list(scanner.run(options=options))
+    assert mock_image_processor.has_ad_qrcode.call_count == calls_after_first + 4
+
+
+def test_scanner_force_rescan_and_option_change(
+    library, index, ext_config, mock_image_processor
+):
+    """测试强制完整扫描以及扫描选项变化导致索引失效"""
+    mock_image_processor.analyze.return_value = ImageInfo(False, False)
+    scanner = Scanner(library, ext_config, mock_image_processor, index)
+
+    list(scanner.run(options={"enable_ad_scan": True}))
+    base = mock_image_processor.has_ad_qrcode.call_count
+    assert base > 0
+
+    list(scanner.run(options={"enable_ad_scan": True, "force_rescan": True}))
+    assert mock_image_processor.has_ad_qrcode.call_count == base * 2
+
+    # 关闭广告检测后，索引签名不同，文件夹重新分类
+    results = list(scanner.run(options={"enable_ad_scan": False}))
+    assert all(not res.ads for _, res in results)
+    assert mock_image_processor.has_ad_qrcode.call_count == base * 2
+
+
+def test_index_signature_covers_archive_output(
+    tmp_path, ext_config, mock_image_processor
+):
+    """测试压缩包输出相关选项变化时索引签名随之变化"""
+    scanner = Scanner(tmp_path, ext_config, mock_image_processor)
+    base = {"enable_archive_scan": True, "archive_out_path": str(tmp_path / "out")}
+
+    signatures = {
+        scanner._index_signature(base),
+        scanner._index_signature({**base, "archive_out_path": str(tmp_path / "b")}),
+        scanner._index_signature({**base, "repack": False}),
+        scanner._index_signature({**base, "pack_format": "cbz"}),
+    }
+    assert len(signatures) == 4
+    assert scanner._index_signature(base) == scanner._index_signature(
+        {**base, "pack_format": "zip"}
+    )
+
+
+def test_index_signature_covers_ad_detection_state(
+    tmp_path, ext_config, scanner_config
+):
+    """测试预筛开关与广告图库变化时索引签名随之变化"""
+    blocklist = AdBlocklist(tmp_path / "ad_blocklist.db")
+    processor = ImageProcessor(scanner_config, ad_blocklist=blocklist)
+    scanner = Scanner(tmp_path, ext_config, processor)
+    options = {"enable_ad_scan": True}
+
+    base = scanner._index_signature(options)
+    scanner_config.enable_qr_prefilter = not scanner_config.enable_qr_prefilter
+    assert scanner._index_signature(options) != base
+    scanner_config.enable_qr_prefilter = not scanner_config.enable_qr_prefilter
+
+    blocklist.add(0xFFFF, ["https://spam.com"], "ad.jpg")
+    learned = scanner._index_signature(options)
+    assert learned != base
+
+    scanner_config.enable_ad_blocklist = False
+    assert scanner._index_signature(options) not in (base, learned)
+    blocklist.close()
@@ -1,11 +1,14 @@
 import errno
+import threading
+import time
+import zipfile
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
 
 from koma.core.image_processor import ImageInfo
-from koma.core.scanner import Scanner
+from koma.core.scanner import Scanner, TempSpaceBudget
 
 
 @pytest.fixture
@@ -58,6 +61,7 @@ def test_scanner_ad_detection_logic(scanner_setup, ext_config, mock_image_proces
     # 启用广告扫描
     options = {"enable_ad_scan": True}
     results = list(scanner.run(options=options))
+    mock_image_processor.reset_qr_stats.assert_called_once()
 
     res = results[0][1]
     ads_names = [p.name for p in res.ads]
@@ -103,11 +107,13 @@ def test_scanner_skip_clean_archive(
     (scanner_setup / "clean.zip").touch()
 
     with (
-        patch("koma.core.scanner.ArchiveHandler"),
+        patch("koma.core.scanner.ArchiveHandler") as MockHandler,
         patch.object(
             Scanner, "_clean_directory_recursive", return_value=0
         ) as mock_clean,
     ):
+        # 无法就地检查，走完整解压流程
+        MockHandler.return_value.list_members.return_value = None
         scanner = Scanner(scanner_setup, ext_config, mock_image_processor)
         results = list(scanner.run(options=archive_options))
 
@@ -129,6 +135,7 @@ def test_scanner_process_dirty_archive(
 
     with patch("koma.core.scanner.ArchiveHandler") as MockHandler:
         mock_instance = MockHandler.return_value
+        mock_instance.list_members.return_value = None
         mock_instance.extract.return_value = Path("/tmp/mock_extract")
 
         with patch.object(Scanner, "_clean_directory_recursive", return_value=1):
@@ -208,6 +215,7 @@ def test_process_archive_runtime_disk_full(
 
         with patch("koma.core.scanner.ArchiveHandler") as MockHandlerClass:
             mock_handler_instance = MockHandlerClass.return_value
+            mock_handler_instance.list_members.return_value = None
 
             disk_full_error = OSError(errno.ENOSPC, "No space left on device")
             mock_handler_instance.extract.side_effect = disk_full_error
@@ -231,6 +239,7 @@ def test_process_archive_generic_io_error(
 
         with patch("koma.core.scanner.ArchiveHandler") as MockHandlerClass:
             mock_handler_instance = MockHandlerClass.return_value
+            mock_handler_instance.list_members.return_value = None
 
             perm_error = OSError(errno.EACCES, "Permission denied")
             mock_handler_instance.extract.side_effect = perm_error
@@ -289,3 +298,229 @@ def test_clean_directory_recursive_real_logic(
     assert not ad_file.exists(), "广告文件未被删除"
     assert not sub_junk.exists(), "子文件夹垃圾未被删除"
     assert normal_file.exists(), "正常文件被误删"
+
+
+def test_scanner_parallel_ad_detection_order(
+    tmp_path, ext_config, mock_image_processor
+):
+    """测试多线程广告检测：结果与单线程一致，且按文件夹顺序产出"""
+    root = tmp_path / "library"
+    for i in range(1, 13):
+        folder = root / f"vol{i}"
+        folder.mkdir(parents=True)
+        for name in ("01.jpg", "02.jpg", "zz_ad.jpg"):
+            (folder / name).touch()
+
+    mock_image_processor.analyze.return_value = ImageInfo(False, False)
+    mock_image_processor.has_ad_qrcode.side_effect = lambda p: "ad" in p.name
+
+    scanner = Scanner(root, ext_config, mock_image_processor)
+    serial = list(scanner.run(options={"enable_ad_scan": True}))
+    parallel = list(scanner.run(options={"enable_ad_scan": True, "ad_scan_workers": 4}))
+
+    assert [r.name for r, _ in parallel] == [f"vol{i}" for i in range(1, 13)]
+    assert parallel == serial
+    assert all([p.name for p in res.ads] == ["zz_ad.jpg"] for _, res in parallel)
+
+
+def test_temp_space_budget_waits_for_space():
+    """测试临时空间预算：空间不足时等待释放，超出总量时拒绝"""
+    budget = TempSpaceBudget(100)
+
+    assert budget.acquire(150) is False
+    assert budget.acquire(60) is True
+
+    acquired = threading.Event()
+
+    def worker():
+        budget.acquire(80)
+        acquired.set()
+
+    t = threading.Thread(target=worker)
+    t.start()
+    assert not acquired.wait(0.1)
+
+    budget.release(60)
+    assert acquired.wait(2)
+    t.join()
+    budget.release(80)
+
+
+def test_scanner_concurrent_archives_share_budget(
+    scanner_setup, ext_config, mock_image_processor, archive_options
+):
+    """测试多个压缩包并发清理，超出预算的压缩包等待而不是跳过"""
+    for i in range(6):
+        (scanner_setup / f"book{i}.zip").write_bytes(b"x" * 40)
+
+    # 每个压缩包预估占用 100 字节，预算只够同时处理 2 个
+    options = {**archive_options, "archive_workers": 4, "temp_space_limit": 200}
+
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def fake_clean(self, archive_path, output_dir, opts):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return True
+
+    with (
+        patch("shutil.disk_usage") as mock_usage,
+        patch.object(Scanner, "_clean_archive", fake_clean),
+    ):
+        mock_usage.return_value.free = 10**12
+        scanner = Scanner(scanner_setup, ext_config, mock_image_processor)
+        results = list(scanner.run(options=options))
+
+    assert sum(res.processed_archives for _, res in results) == 6
+    assert state["peak"] == 2
+
+
+def _make_zip(path, names):
+    with zipfile.ZipFile(path, "w") as zf:
+        for name in names:
+            zf.writestr(name, b"data-" + name.encode())
+
+
+def test_inspect_archive_in_place(tmp_path, ext_config, mock_image_processor):
+    """测试不解压检查压缩包：杂项由成员列表判断，广告只读取尾部图片"""
+    mock_image_processor.analyze_data.return_value = ImageInfo(False, False)
+    mock_image_processor.has_ad_qrcode_data.side_effect = lambda data, name: (
+        "ad" in name
+    )
+
+    clean = tmp_path / "clean.cbz"
+    _make_zip(clean, ["01.jpg", "02.jpg", "10.jpg", "ComicInfo.xml"])
+    junk = tmp_path / "junk.cbz"
+    _make_zip(junk, ["01.jpg", "__MACOSX/._01.jpg"])
+    ads = tmp_path / "ads.cbz"
+    _make_zip(ads, ["book/01.jpg", "book/02.jpg", "book/zz_ad.jpg"])
+
+    scanner = Scanner(tmp_path, ext_config, mock_image_processor)
+
+    assert scanner._inspect_archive(clean, check_ads=False) == set()
+    assert scanner._inspect_archive(junk, check_ads=False) == {"__MACOSX/._01.jpg"}
+    assert scanner._inspect_archive(ads, check_ads=False) == set()
+
+    assert scanner._inspect_archive(clean, check_ads=True) == set()
+    # 自然排序后倒序检测，只读取了最后一张
+    checked = [c.args[1] for c in mock_image_processor.has_ad_qrcode_data.mock_calls]
+    assert checked == ["10.jpg"]
+
+    assert scanner._inspect_archive(ads, check_ads=True) == {"book/zz_ad.jpg"}
+
+    # 损坏的压缩包无法就地检查
+    broken = tmp_path / "broken.zip"
+    broken.write_bytes(b"not a zip")
+    with patch.object(scanner.archive_handler, "seven_zip", None):
+        assert scanner._inspect_archive(broken, check_ads=True) is None
+
+
+def test_clean_archive_skips_extraction(
+    scanner_setup, ext_config, mock_image_processor, archive_options
+):
+    """测试干净的压缩包不会被解压"""
+    _make_zip(scanner_setup / "clean.cbz", ["01.jpg", "02.jpg"])
+
+    scanner = Scanner(scanner_setup, ext_config, mock_image_processor)
+    with patch.object(scanner.archive_handler, "extract") as mock_extract:
+        results = list(scanner.run(options=archive_options))
+
+    mock_extract.assert_not_called()
+    assert sum(res.processed_archives for _, res in results) == 0
+
+
+def test_dirty_zip_stripped_without_extraction(
+    scanner_setup, ext_config, mock_image_processor, archive_options
+):
+    """测试 zip 压缩包直接移除杂项与广告成员，不解压也不重新压缩"""
+    mock_image_processor.analyze_data.return_value = ImageInfo(False, False)
+    mock_image_processor.has_ad_qrcode_data.side_effect = lambda data, name: (
+        "ad" in name
+    )
+    _make_zip(
+        scanner_setup / "dirty.zip",
+        ["book/01.jpg", "book/02.jpg", "book/zz_ad.jpg", "book/notes.txt"],
+    )
+
+    scanner = Scanner(scanner_setup, ext_config, mock_image_processor)
+    with (
+        patch.object(scanner.archive_handler, "extract") as mock_extract,
+        patch.object(scanner.archive_handler, "pack") as mock_pack,
+    ):
+        results = list(scanner.run(options={**archive_options, "enable_ad_scan": True}))
+
+    mock_extract.assert_not_called()
+    mock_pack.assert_not_called()
+    assert sum(res.processed_archives for _, res in results) == 1
+
+    output = Path(archive_options["archive_out_path"]) / "dirty.cbz"
+    with zipfile.ZipFile(output) as zf:
+        assert zf.namelist() == ["book/01.jpg", "book/02.jpg"]
+        assert zf.read("book/02.jpg") == b"data-book/02.jpg"
+
+
+def test_backslash_zip_members_use_original_names(
+    scanner_setup, ext_config, mock_image_processor, archive_options
+):
+    """测试成员名含反斜杠时按原始成员名读取与移除"""
+    mock_image_processor.analyze_data.return_value = ImageInfo(False, False)
+    mock_image_processor.has_ad_qrcode_data.side_effect = lambda data, name: (
+        "ad" in name
+    )
+    _make_zip(scanner_setup / "win.zip", ["book\\01.jpg", "book\\zz_ad.jpg"])
+
+    scanner = Scanner(scanner_setup, ext_config, mock_image_processor)
+    assert scanner._inspect_archive(scanner_setup / "win.zip", check_ads=True) == {
+        "book\\zz_ad.jpg"
+    }
+
+    results = list(scanner.run(options={**archive_options, "enable_ad_scan": True}))
+    assert sum(res.processed_archives for _, res in results) == 1
+    output = Path(archive_options["archive_out_path"]) / "win.cbz"
+    with zipfile.ZipFile(output) as zf:
+        assert zf.namelist() == ["book\\01.jpg"]
+
+
+def test_speculative_tail_ad_detection(tmp_path, ext_config, mock_image_processor):
+    """测试末尾 K 页并发推测检测：结果与逐页检测一致，提前停止后不再提交"""
+    root = tmp_path / "book"
+    root.mkdir()
+    names = [f"{i:02d}.jpg" for i in range(1, 21)] + ["98_ad.jpg", "99_ad.jpg"]
+    for name in names:
+        (root / name).touch()
+
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def has_ad(path):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+        return "ad" in path.name
+
+    mock_image_processor.has_ad_qrcode.side_effect = has_ad
+    scanner = Scanner(root, ext_config, mock_image_processor)
+
+    serial = list(scanner.run(options={"enable_ad_scan": True}))
+    serial_calls = mock_image_processor.has_ad_qrcode.call_count
+    assert serial_calls == 3
+    assert state["peak"] == 1
+
+    mock_image_processor.has_ad_qrcode.reset_mock()
+    options = {"enable_ad_scan": True, "ad_tail_pages": 4}
+    parallel = list(scanner.run(options=options))
+
+    assert parallel == serial
+    assert [p.name for p in parallel[0][1].ads] == ["98_ad.jpg", "99_ad.jpg"]
+    assert state["peak"] > 1
+    # 最多多检测 K - 1 页
+    assert mock_image_processor.has_ad_qrcode.call_count <= serial_calls + 3
+    assert scanner._tail_pool is None
@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from koma.core.walker import SERIAL_DIR_LIMIT, walk_tree
+
+
+def _make_tree(root):
+    for d in ["vol10", "vol2", "vol1", ".hidden", "vol1/ch2", "vol1/ch10", "out"]:
+        (root / d).mkdir(parents=True, exist_ok=True)
+    for f in ["vol1/10.jpg", "vol1/2.jpg", "vol1/1.jpg", ".hidden/a.jpg", "out/x.jpg"]:
+        (root / f).touch()
+
+
+def test_walk_natural_preorder(tmp_path):
+    """测试遍历顺序：自然排序的先序遍历"""
+    _make_tree(tmp_path)
+
+    for workers in (1, 4):
+        entries = list(walk_tree(tmp_path, max_workers=workers))
+        rel = [e.root.relative_to(tmp_path).as_posix() for e in entries]
+
+        assert rel == [".", "out", "vol1", "vol1/ch2", "vol1/ch10", "vol2", "vol10"]
+
+        vol1 = entries[2]
+        assert [f.name for f in vol1.files] == ["1.jpg", "2.jpg", "10.jpg"]
+        assert [d.name for d in vol1.dirs] == ["ch2", "ch10"]
+
+
+def test_walk_hidden_and_exclude(tmp_path):
+    """测试隐藏目录与排除目录的剪枝"""
+    _make_tree(tmp_path)
+
+    rel = [
+        e.root.relative_to(tmp_path).as_posix()
+        for e in walk_tree(tmp_path, exclude=tmp_path / "out")
+    ]
+    assert "out" not in rel
+    assert ".hidden" not in rel
+
+    rel_all = [
+        e.root.relative_to(tmp_path).as_posix()
+        for e in walk_tree(tmp_path, skip_hidden=False)
+    ]
+    assert ".hidden" in rel_all
+
+    # 根目录本身被排除时不产出任何结果
+    assert list(walk_tree(tmp_path, exclude=tmp_path)) == []
+
+
+def test_walk_caller_pruning(tmp_path):
+    """测试调用方通过修改 dirs 剪枝，以及提前中断遍历"""
+    _make_tree(tmp_path)
+
+    visited = []
+    for entry in walk_tree(tmp_path):
+        visited.append(entry.root.name)
+        entry.dirs[:] = [d for d in entry.dirs if d.name != "vol1"]
+
+    assert "vol1" not in visited
+    assert "ch2" not in visited
+
+    gen = walk_tree(tmp_path)
+    first = next(gen)
+    gen.close()
+    assert first.root == tmp_path
+
+
+def test_walk_missing_root(tmp_path):
+    assert list(walk_tree(tmp_path / "missing")) == []
+
+
+def test_walk_pool_usage(tmp_path):
+    """测试小目录树与单线程遍历不使用线程池，大目录树使用调用方提供的线程池"""
+    _make_tree(tmp_path)
+    pool = ThreadPoolExecutor(max_workers=2)
+    with pool, patch.object(pool, "submit", wraps=pool.submit) as submit:
+        list(walk_tree(tmp_path, executor=pool))
+        assert submit.call_count == 0
+
+        for i in range(SERIAL_DIR_LIMIT * 2):
+            (tmp_path / "many" / f"{i:03d}").mkdir(parents=True)
+        expected = list(walk_tree(tmp_path, max_workers=1))
+        assert submit.call_count == 0
+
+        entries = list(walk_tree(tmp_path, executor=pool))
+        assert submit.call_count > 0
+        assert [e.root for e in entries] == [e.root for e in expected]